@@ -23,7 +23,8 @@ class ChatBot():
 
     async def chat(self, parsed_messages: list[dict[str, str]]) -> dict[str, Any]:
         try:
-            response = self.agent.invoke({"messages": parsed_messages})
+            # ainvoke keeps the event loop free while the provider responds
+            response = await self.agent.ainvoke({"messages": parsed_messages})
             return response
         except Exception as e:
             logger.error(f"Unexpected error at chat method: {e}")
@@ -0,0 +1,137 @@
+"""
+Weighted fair scheduling of outbound LLM calls across tenants.
+
+At most LLM_GLOBAL_CONCURRENCY calls run at once per process. When that cap is
+reached, callers wait in per-tenant queues and free slots are handed out by
+start-time fair queueing: every tenant has a virtual clock that advances by
+1/weight per call, and the backlogged tenant with the smallest clock goes next.
+A tenant with weight 4 therefore gets ~4x the throughput of a weight-1 tenant
+during contention, and no tenant can starve the others by queueing more.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from config import settings
+from ..infrastructure import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerBusy(Exception):
+    """The tenant's queue is full or the wait exceeded LLM_QUEUE_TIMEOUT."""
+
+
+class _Tenant:
+    __slots__ = ("vtime", "weight", "waiters")
+
+    def __init__(self, vtime: float):
+        self.vtime = vtime
+        self.weight = 1.0
+        self.waiters: deque[asyncio.Future] = deque()
+
+
+class FairScheduler:
+    def __init__(self, capacity: int, *, max_queue_per_tenant: int, queue_timeout_s: float):
+        self.capacity = capacity
+        self.max_queue_per_tenant = max_queue_per_tenant
+        self.queue_timeout_s = queue_timeout_s
+        self._tenants: dict[str, _Tenant] = {}
+        self._in_flight = 0
+        self._queued = 0
+        # Start tag of the most recent dispatch; new or idle tenants resume from here
+        self._vclock = 0.0
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, *, weight: float = 1.0, label: str = "default") -> AsyncIterator[None]:
+        """Wait for a fair share of the global LLM concurrency, hold it for the block."""
+        queued_at = time.perf_counter()
+        await self._acquire(tenant, max(weight, 0.001))
+        metrics.observe("llm_queue_wait", time.perf_counter() - queued_at, tier=label)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _charge(self, t: _Tenant) -> None:
+        start = max(t.vtime, self._vclock)
+        self._vclock = start
+        t.vtime = start + 1.0 / t.weight
+
+    async def _acquire(self, tenant: str, weight: float) -> None:
+        t = self._tenants.get(tenant)
+        if t is None:
+            t = self._tenants[tenant] = _Tenant(self._vclock)
+        t.weight = weight
+
+        if self._in_flight < self.capacity and self._queued == 0:
+            self._in_flight += 1
+            self._set_in_flight_gauge()
+            self._charge(t)
+            return
+
+        if len(t.waiters) >= self.max_queue_per_tenant:
+            metrics.incr("llm_queue_rejected", reason="full")
+            raise SchedulerBusy("Too many queued chat requests")
+        if not t.waiters:
+            # Idle time doesn't bank credit
+            t.vtime = max(t.vtime, self._vclock)
+
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        t.waiters.append(fut)
+        self._queued += 1
+        metrics.gauge_set("llm_queue_depth", self._queued)
+        try:
+            await asyncio.wait_for(fut, timeout=self.queue_timeout_s)
+        except BaseException as e:
+            if fut.done() and not fut.cancelled():
+                # The slot was granted as we gave up: hand it to the next waiter
+                self._release()
+            else:
+                self._drop_waiter(tenant, fut)
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.incr("llm_queue_rejected", reason="timeout")
+                raise SchedulerBusy("Timed out waiting for an LLM slot") from None
+            raise
+
+    def _drop_waiter(self, tenant: str, fut: asyncio.Future) -> None:
+        t = self._tenants.get(tenant)
+        if t is not None and fut in t.waiters:
+            t.waiters.remove(fut)
+            self._queued -= 1
+            metrics.gauge_set("llm_queue_depth", self._queued)
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._dispatch()
+        self._set_in_flight_gauge()
+
+    def _dispatch(self) -> None:
+        while self._in_flight < self.capacity and self._queued:
+            name, t = min(
+                ((n, t) for n, t in self._tenants.items() if t.waiters),
+                key=lambda item: item[1].vtime
+            )
+            fut = t.waiters.popleft()
+            self._queued -= 1
+            if fut.done():
+                continue
+            fut.set_result(None)
+            self._in_flight += 1
+            self._charge(t)
+        metrics.gauge_set("llm_queue_depth", self._queued)
+        # Forget idle tenants that have no unused share left
+        for name in [n for n, t in self._tenants.items() if not t.waiters and t.vtime <= self._vclock]:
+            del self._tenants[name]
+
+    def _set_in_flight_gauge(self) -> None:
+        metrics.gauge_set("llm_in_flight", self._in_flight)
+
+
+scheduler = FairScheduler(
+    settings.LLM_GLOBAL_CONCURRENCY,
+    max_queue_per_tenant=settings.LLM_QUEUE_MAX_PER_TENANT,
+    queue_timeout_s=settings.LLM_QUEUE_TIMEOUT
+)
@@ -1,8 +1,14 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status, Path, Query
+from fastapi.responses import StreamingResponse
+from typing import Literal
+from config import settings
 from ..auth.dependencies import require_admin, verify_internal_key
 from ..clients.repository import crud_management
 from ..models import schemas
+from ..vectors import service as vector_service
+from ..infrastructure import metrics
+from ..database.pagination import decode_cursor, split_page, stream_ndjson
 import logging
 
 logger = logging.getLogger(__name__)
@@ -47,12 +53,29 @@ async def admin_create_client(
 @admin.get("/clients", status_code=status.HTTP_200_OK)
 async def admin_list_clients(
 	include_deleted: bool = Query(False, description="Include soft-deleted clients"),
+	limit: int = Query(100, ge=1, le=1000, description="Page size"),
+	cursor: str | None = Query(None, description="next_cursor of the previous page"),
+	format: Literal["json", "ndjson"] = Query("json", description="ndjson streams every client"),
 	_admin_user=Depends(require_admin)
 ):
-	rows = await crud.db_admin_list_clients(include_deleted=include_deleted)
+	if format == "ndjson":
+		async def fetch_page(after, batch):
+			return await crud.db_admin_list_clients(include_deleted=include_deleted, limit=batch, after=after)
+
+		return StreamingResponse(
+			stream_ndjson(fetch_page, batch_size=settings.LIST_STREAM_BATCH_SIZE),
+			media_type="application/x-ndjson"
+		)
+
+	try:
+		after = decode_cursor(cursor) if cursor else None
+	except ValueError:
+		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+	rows = await crud.db_admin_list_clients(include_deleted=include_deleted, limit=limit + 1, after=after)
 	if rows is None:
 		raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to list clients")
-	return {"message": "Clients fetched", "data": rows}
+	rows, next_cursor = split_page(rows, limit)
+	return {"message": "Clients fetched", "data": rows, "next_cursor": next_cursor}
 
 @admin.get("/clients/{client_id}", status_code=status.HTTP_200_OK)
 async def admin_get_client(
@@ -96,6 +119,33 @@ async def admin_delete_client(
 		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Client not found")
 	return None
 
+@admin.post("/vectors/search/diagnostics", status_code=status.HTTP_200_OK)
+async def admin_vector_search_diagnostics(
+	request: schemas.AdminVectorSearchDiagnosticsRequest,
+	_admin_user=Depends(require_admin)
+):
+	"""Run a tenant's semantic search with per-stage timings and the EXPLAIN (ANALYZE, BUFFERS) plan.
+
+	Timings (ms): embedding, pool_wait, query, planning, execution, total.
+	`hnsw_index_used` tells whether the planner picked the HNSW index for this query.
+	"""
+	report = await vector_service.semantic_search_diagnostics(
+		client_id=request.client_id,
+		query=request.query,
+		top_k=request.top_k,
+		entity_type=request.entity_type,
+		metadata_filter=request.metadata_filter,
+		exclude_entity_type=request.exclude_entity_type
+	)
+	if report is None:
+		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Diagnostics failed")
+	return {"message": "Search diagnostics", "data": report}
+
+@admin.get("/metrics", status_code=status.HTTP_200_OK)
+async def admin_metrics(_admin_user=Depends(require_admin)):
+	"""In-process counters, gauges and timers of the worker answering this request."""
+	return {"message": "Metrics fetched", "data": metrics.snapshot()}
+
 router = APIRouter()
 router.include_router(admin)
 router.include_router(internal)
\ No newline at end of file
@@ -1,14 +1,19 @@
-from fastapi import status, Path, APIRouter, Header, HTTPException, Depends
+from fastapi import status, Path, APIRouter, Header, HTTPException, Depends, Query, UploadFile, File
+from fastapi.responses import JSONResponse, StreamingResponse
 from .admin_routes import router as admin_router
 from ..models import schemas
 from ..database.init import init_db
+from ..infrastructure.redis_client import redis_client
 from ..chat.service import store_message
 from ..clients import service as client_service
 from ..characters import service as character_service
 from ..auth.dependencies import verify_api_key, require_admin, verify_internal_key
+from ..auth.limits import llm_slot
+from ..agents.scheduler import SchedulerBusy
+from ..clients.tiers import get_tier
 from ..clients.repository import crud_management
 from ..vectors import service as vector_service
-from typing import Any
+from typing import Any, Literal
 from uuid import UUID
 import sys
 import logging
@@ -73,6 +78,51 @@ async def create_characters(
         "data": resource
         }
 
+@router.post("/api/characters/bulk", status_code=status.HTTP_200_OK)
+async def bulk_characters(
+    request: schemas.CharacterBulkRequest,
+    user = Depends(verify_api_key)
+    ):
+    """
+    Batch endpoint for provisioning characters. Creates, updates and deletes (soft delete) up
+    to 1000 characters in a single database transaction, instead of one request per character.
+
+    Parameters:
+    -----------
+    request : CharacterBulkRequest
+        Object defined by schema CharacterBulkRequest with the lists `create` (ServiceRole
+        objects), `update` (ServiceRole objects with the character `id`) and `delete`
+        (character UUIDs). At least one item is required.
+
+    user : dict
+        Object that resulting from middleware verification of API key. If the API key is
+        verified, we return the data to the user to be accessed in doing CRUD (Create, Read,
+        Update, and Delete) operations.
+
+    Returns:
+    --------
+    results : dict
+        For each list, one result per item in request order with its `index`, `id` and HTTP
+        `status` (201/200/204 on success, 400 malformed id, 404 not found, 409 duplicate
+        update or delete, or an id both updated and deleted), plus the stored row in `data`
+        for creates and updates.
+    """
+    store_id: str = str(user["id"])
+
+    results: dict = await character_service.bulk_characters(request, store_id)
+    logger.info(f"Received bulk role request")
+
+    if results is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Bulk request failed, no changes were applied"
+            )
+
+    return {
+        "message": "Bulk request processed",
+        "data": results
+        }
+
 @router.delete("/api/characters/{uuid}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_characters(
     user = Depends(verify_api_key),
@@ -188,7 +238,12 @@ async def get_characters(
         }
 
 @router.get("/api/characters", status_code=status.HTTP_200_OK)
-async def get_all_characters(user = Depends(verify_api_key)):
+async def get_all_characters(
+    limit: int = Query(100, ge=1, le=1000, description="Page size"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson streams every character"),
+    user = Depends(verify_api_key)
+    ):
     """
     Getter endpoint for all characters objects under specific API key. Characters are an agent
     configuration system doing dynamic system prompt injection. In simpler words it gives a 
@@ -197,6 +252,16 @@ async def get_all_characters(user = Depends(verify_api_key)):
 
     Parameters:
     -----------
+    limit : int
+        Maximum number of characters in the page (oldest first).
+
+    cursor : str
+        Opaque cursor returned as `next_cursor` by the previous page. Omit it for the first page.
+
+    format : str
+        `json` (default) returns one page. `ndjson` streams every character, one JSON object per
+        line, ignoring `limit` and `cursor`.
+
     user : dict
         Object that resulting from middleware verification of API key. If the API key is
         verified, we return the data to the user to be accessed in doing CRUD (Create, Read,
@@ -205,19 +270,30 @@ async def get_all_characters(user = Depends(verify_api_key)):
     Returns:
     --------
     agent_roles : dict
-        Dictionary containing all roles from specific store_id.
+        Page of roles from specific store_id, and `next_cursor` (null on the last page).
 
     """
-    agent_roles: dict = await character_service.get_all_character(str(user["id"]))
-    
-    if agent_roles is None:
+    if format == "ndjson":
+        return StreamingResponse(
+            character_service.stream_characters(str(user["id"])),
+            media_type="application/x-ndjson"
+            )
+
+    try:
+        page = await character_service.get_character_page(str(user["id"]), limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    if page is None:
         raise HTTPException(status_code=404, detail="Resource not found")
-    
-    logger.info(f"Received role fetch request: {agent_roles}")
+
+    agent_roles, next_cursor = page
+    logger.debug(f"Received role fetch request: {len(agent_roles)} characters")
     
     return {
         "message": "Characters fetched",
-        "data": agent_roles
+        "data": agent_roles,
+        "next_cursor": next_cursor
         }
 
 @router.post("/api/chat", status_code=status.HTTP_201_CREATED)
@@ -249,7 +325,16 @@ async def chat(
     """
     
     store_id: str = str(user["id"])
-    prompt: dict[str, Any] = await store_message(request, store_id)
+    tier = await get_tier(user.get("subscription"))
+    try:
+        async with llm_slot(user):
+            prompt: dict[str, Any] = await store_message(request, store_id, tier=tier)
+    except SchedulerBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
 
     if prompt is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Character not set/found")
@@ -511,4 +596,55 @@ async def vectors_search(
         "data": rows
         }
 
+@router.get("/api/vectors/export", status_code=status.HTTP_200_OK)
+async def vectors_export(user = Depends(verify_api_key)):
+    """
+    Streams a tenant export as a zip archive: `meta.ndjson` (a header line with format, count,
+    dim and as_of, then one line per embedding) and `vectors.npy` (float32 matrix of shape
+    (count, EMBEDDING_DIM)) in the same row order. Both are read from one database snapshot.
+
+    Parameters:
+    -----------
+    user : dict
+        Object that resulting from middleware verification of API key. If the API key is
+        verified, we return the data to the user to be accessed in doing CRUD (Create, Read,
+        Update, and Delete) operations.
+    """
+    return StreamingResponse(
+        vector_service.export_archive(client_id=str(user["id"])),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="embeddings-export.zip"'}
+        )
+
+@router.post("/api/vectors/import", status_code=status.HTTP_201_CREATED)
+async def vectors_import(
+    archive: UploadFile = File(..., description="Zip archive from /api/vectors/export"),
+    user = Depends(verify_api_key)
+    ):
+    """
+    Bulk import of an export into the authenticated tenant using COPY. Rows are merged by
+    (entity_type, entity_id) the same way `/api/vectors/upsert` does.
+
+    Parameters:
+    -----------
+    archive : UploadFile
+        Zip archive with `vectors.npy` and `meta.ndjson`, as produced by `/api/vectors/export`.
+
+    user : dict
+        Object that resulting from middleware verification of API key. If the API key is
+        verified, we return the data to the user to be accessed in doing CRUD (Create, Read,
+        Update, and Delete) operations.
+    """
+    imported = await vector_service.import_embeddings(
+        client_id=str(user["id"]),
+        archive=archive.file
+    )
+    if imported is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to import vectors")
+
+    return {
+        "message": "Vectors imported",
+        "data": {"imported": imported}
+        }
+
 router.include_router(admin_router)
\ No newline at end of file
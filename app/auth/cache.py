@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Optional
+from ..infrastructure.redis_client import redis_client as r, client_cache
+from .keys import hash_api_key
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL = "auth:invalidate"
+INVALIDATE_ATTEMPTS = 3
+
+# digest -> (expires_at, record). Insertion order doubles as eviction order.
+_local: dict[str, tuple[float, dict[str, Any]]] = {}
+# client_id -> digests cached for it, so a client can be invalidated without knowing its key
+_by_client: dict[str, set[str]] = {}
+# client_id -> monotonic deadline until which records of that client are not cached here
+_tombstones: dict[str, float] = {}
+
+
+class InvalidationFailed(Exception):
+    """A client's cached records could not be dropped from Redis; the change must not commit."""
+
+
+def _digest(api_key: str) -> str:
+    # Never put raw API keys into Redis key names
+    return hash_api_key(api_key)
+
+def _key(digest: str) -> str:
+    return f"auth:key:{digest}"
+
+def _client_key(client_id: str) -> str:
+    return f"auth:client:{client_id}"
+
+def _tombstone_key(client_id: str) -> str:
+    return f"auth:tombstone:{client_id}"
+
+def _dump(record: dict[str, Any]) -> str:
+    return json.dumps({
+        "id": str(record["id"]),
+        "email": record["email"],
+        "is_admin": bool(record.get("is_admin", False)),
+        "subscription": record.get("subscription")
+    })
+
+def _load(raw: str, api_key: str) -> dict[str, Any]:
+    record = json.loads(raw)
+    record["id"] = uuid.UUID(record["id"])
+    record["api_key"] = api_key
+    return record
+
+def _local_put(digest: str, record: dict[str, Any]) -> None:
+    if digest not in _local and len(_local) >= settings.AUTH_CACHE_MAX_ENTRIES:
+        oldest = next(iter(_local))
+        _local_drop(oldest)
+    _local[digest] = (time.monotonic() + settings.AUTH_CACHE_LOCAL_TTL, record)
+    _by_client.setdefault(str(record["id"]), set()).add(digest)
+
+def _local_drop(digest: str) -> None:
+    entry = _local.pop(digest, None)
+    if entry is not None:
+        client_digests = _by_client.get(str(entry[1]["id"]))
+        if client_digests is not None:
+            client_digests.discard(digest)
+            if not client_digests:
+                _by_client.pop(str(entry[1]["id"]), None)
+
+def _local_drop_client(client_id: str) -> None:
+    now = time.monotonic()
+    if len(_tombstones) >= settings.AUTH_CACHE_MAX_ENTRIES:
+        for key in [k for k, until in _tombstones.items() if until <= now]:
+            del _tombstones[key]
+    _tombstones[client_id] = now + settings.AUTH_CACHE_TOMBSTONE_TTL
+    for digest in list(_by_client.get(client_id, ())):
+        _local_drop(digest)
+
+def _tombstoned(client_id: str) -> bool:
+    until = _tombstones.get(client_id)
+    return until is not None and until > time.monotonic()
+
+
+async def lookup(api_key: str) -> Optional[dict[str, Any]]:
+    """
+    Returns the cached client record for an API key, checking the in-process cache
+    first and Redis second. None means "not cached", not "invalid key".
+    """
+    digest = _digest(api_key)
+    entry = _local.get(digest)
+    if entry is not None:
+        if entry[0] > time.monotonic():
+            return dict(entry[1])
+        _local_drop(digest)
+    try:
+        raw = await client_cache.get(_key(digest))
+    except Exception as e:
+        logger.warning(f"Auth cache read failed, falling back to DB: {e}")
+        return None
+    if raw is None:
+        return None
+    record = _load(raw, api_key)
+    if not _tombstoned(str(record["id"])):
+        _local_put(digest, record)
+    return dict(record)
+
+async def store(api_key: str, record: dict[str, Any], *, read_at: float) -> None:
+    """
+    Cache a verified client record (id, email, api_key, is_admin). `read_at` is the
+    time.monotonic() taken before the record was read from the DB.
+
+    A lookup racing with invalidate_client() may have read the record before the change
+    and get here after the invalidation, so the client's tombstone is checked after the
+    write (invalidate_client sets it before deleting) and the write undone when it is
+    there. Records read longer ago than the tombstone lives are not cached at all.
+    """
+    client_id = str(record["id"])
+    if time.monotonic() - read_at >= settings.AUTH_CACHE_TOMBSTONE_TTL:
+        return
+    digest = _digest(api_key)
+    try:
+        client_key = _client_key(client_id)
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.set(_key(digest), _dump(record), ex=settings.AUTH_CACHE_REDIS_TTL)
+            pipe.sadd(client_key, digest)
+            pipe.expire(client_key, settings.AUTH_CACHE_REDIS_TTL)
+            await pipe.execute()
+        if await r.exists(_tombstone_key(client_id)):
+            await r.delete(_key(digest))
+            return
+    except Exception as e:
+        logger.warning(f"Auth cache write failed: {e}")
+    if not _tombstoned(client_id):
+        _local_put(digest, dict(record))
+
+async def invalidate_client(client_id: Any) -> None:
+    """
+    Drop every cached key of a client, here, in Redis, and (via pub/sub) in other processes,
+    and keep lookups that read the client before the change from caching it again.
+    Called by the clients repository inside the transaction of key regeneration, updates
+    and deletion: retried a few times, then InvalidationFailed rolls the change back.
+    """
+    client_id = str(client_id)
+    _local_drop_client(client_id)
+    client_key = _client_key(client_id)
+    for attempt in range(1, INVALIDATE_ATTEMPTS + 1):
+        try:
+            await r.set(_tombstone_key(client_id), 1, ex=settings.AUTH_CACHE_TOMBSTONE_TTL)
+            digests = await r.smembers(client_key)
+            async with r.pipeline(transaction=False) as pipe:
+                for digest in digests:
+                    pipe.delete(_key(digest))
+                pipe.delete(client_key)
+                await pipe.execute()
+            # Not pipelined: cluster pipelines only carry keyed commands
+            await r.publish(INVALIDATE_CHANNEL, client_id)
+            return
+        except Exception as e:
+            logger.error(f"Auth cache invalidation failed for client {client_id} (attempt {attempt}): {e}")
+            if attempt < INVALIDATE_ATTEMPTS:
+                await asyncio.sleep(0.05 * attempt)
+    raise InvalidationFailed(f"Could not invalidate cached API keys of client {client_id}")
+
+async def listen_for_invalidations() -> None:
+    """
+    Long-running task (started in the app lifespan) that applies invalidations
+    published by other processes to this process' local cache.
+    """
+    while True:
+        pubsub = r.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATE_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _local_drop_client(str(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Invalidations may have been missed while disconnected
+            logger.error(f"Auth cache invalidation listener failed: {e}")
+            clear_local()
+            await asyncio.sleep(1.0)
+        finally:
+            await pubsub.aclose()
+
+def clear_local() -> None:
+    _local.clear()
+    _by_client.clear()
+    _tombstones.clear()
@@ -1,22 +1,35 @@
-from fastapi import Header, HTTPException, status, Depends
+from fastapi import Header, HTTPException, Request, status, Depends
 from ..clients.repository import crud_management
+from . import cache as auth_cache
+from .limits import check_request, check_unverified
 # import bcrypt
 from config import settings
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 crud = crud_management()
 
-async def verify_api_key(x_api_key: str = Header(...)) -> dict:
+async def verify_api_key(request: Request, x_api_key: str = Header(...)) -> dict:
     """
     Dependency that verifies API key from header.
     Returns user data if valid, raises 401 if not.
+    Verified records are cached in-process and in Redis (see auth/cache.py);
+    the clients repository invalidates them on key regeneration, updates and deletion.
+    Also enforces the client's tier request limit (see auth/limits.py). A key that is not
+    cached yet is counted against the IP's anonymous limit before it is looked up.
     """
-
-    resource =  await crud.db_select_client_by_key(x_api_key)
+    resource = await auth_cache.lookup(x_api_key)
     if resource is None:
-        logger.error("Failure in API key authentication. No matching API key.")
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
+        await check_unverified(getattr(request.state, "client_ip", None))
+        read_at = time.monotonic()
+        resource =  await crud.db_select_client_by_key(x_api_key)
+        if resource is None:
+            logger.error("Failure in API key authentication. No matching API key.")
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
+        await auth_cache.store(x_api_key, resource, read_at=read_at)
+    # Per-client rate limit from the subscription tier (429 when exceeded)
+    await check_request(resource)
     return resource
 
 async def require_admin(user: dict = Depends(verify_api_key)) -> dict:
@@ -0,0 +1,14 @@
+import hashlib
+import secrets
+
+
+def generate_api_key() -> str:
+    """New client API key. Only its digest is stored; the plaintext is shown to the client once."""
+    return f"fn_{secrets.token_urlsafe(32)}"
+
+def hash_api_key(api_key: str) -> str:
+    """
+    SHA-256 hex digest used for clients.api_key_hash. Keys carry 256 bits of randomness,
+    so a fast unsalted hash is enough and keeps the lookup an indexed equality match.
+    """
+    return hashlib.sha256(api_key.encode()).hexdigest()
@@ -0,0 +1,87 @@
+"""
+Per-client limits resolved from the client's subscription tier.
+
+Request rate is checked in verify_api_key, so every authenticated endpoint is covered
+and tenants behind a shared NAT no longer throttle each other. Until a key is verified
+its requests count against the IP's anonymous window instead (check_unverified), so
+made-up keys get no more than anonymous traffic. Concurrent LLM calls are capped
+around the chat pipeline with llm_slot().
+"""
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+from fastapi import HTTPException, status
+from config import settings
+from ..clients.tiers import get_tier
+from ..infrastructure.middleware import ip_key, limiter as ip_limiter
+from ..infrastructure.rate_limit import ConcurrencyLimiter, HybridLimiter, RateLimitResult, SlidingWindowLimiter
+from ..infrastructure.redis_client import redis_client as r
+
+logger = logging.getLogger(__name__)
+
+request_limiter = HybridLimiter(
+    SlidingWindowLimiter(r, limit=settings.API_LIMIT, window_s=settings.API_WINDOW),
+    timeout_s=settings.RATE_LIMIT_REDIS_TIMEOUT,
+    cooldown_s=settings.RATE_LIMIT_REDIS_COOLDOWN,
+    local_share=settings.RATE_LIMIT_LOCAL_SHARE,
+    sync_interval_s=settings.RATE_LIMIT_SYNC_INTERVAL,
+    max_keys=settings.RATE_LIMIT_LOCAL_MAX_KEYS
+)
+llm_limiter = ConcurrencyLimiter(r, lease_s=settings.LLM_SLOT_LEASE_SECONDS)
+
+
+def _too_many(result: RateLimitResult) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests",
+        headers={"Retry-After": str(max(1, -(-result.retry_after_ms // 1000)))}
+    )
+
+async def check_request(user: dict[str, Any]) -> None:
+    """Count one request against the client's tier. Raises 429 when over the limit."""
+    tier = await get_tier(user.get("subscription"))
+    # HybridLimiter decides in process and syncs to Redis in the background, so this never blocks on Redis
+    result = await request_limiter.hit(
+        f"ratelimit:client:{user['id']}",
+        limit=tier.request_limit,
+        window_s=tier.window_seconds
+    )
+    if not result.allowed:
+        raise _too_many(result)
+
+async def check_unverified(ip: str | None) -> None:
+    """
+    Count a request whose API key is not verified yet (not in the auth cache) against
+    its IP's anonymous window, before the key is looked up. Raises 429 when over
+    API_LIMIT, so invalid keys cannot hammer the database either.
+    """
+    if ip is None:
+        return
+    result = await ip_limiter.hit(ip_key(ip), limit=settings.API_LIMIT)
+    if not result.allowed:
+        raise _too_many(result)
+
+@asynccontextmanager
+async def llm_slot(user: dict[str, Any]) -> AsyncIterator[None]:
+    """Hold one of the tier's concurrent LLM call slots. Raises 429 when all are taken."""
+    tier = await get_tier(user.get("subscription"))
+    key = f"llm:client:{user['id']}"
+    try:
+        token = await llm_limiter.acquire(key, cap=tier.max_concurrent_llm)
+    except Exception as e:
+        logger.error(f"Unexpected error with Redis: {e}")
+        yield
+        return
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many concurrent chat requests"
+        )
+    try:
+        yield
+    finally:
+        try:
+            await llm_limiter.release(key, token)
+        except Exception as e:
+            # The lease expires on its own after LLM_SLOT_LEASE_SECONDS
+            logger.error(f"Failed to release LLM slot: {e}")
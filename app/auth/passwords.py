@@ -0,0 +1,58 @@
+"""
+bcrypt off the event loop.
+
+Each hash/check costs ~100-300 ms of CPU at the default cost, which would otherwise
+block every in-flight request. Work runs on a bounded thread pool (bcrypt releases
+the GIL while hashing) and queue depth / wait / run times are exported as metrics.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from config import settings
+from ..infrastructure import metrics
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+    return _executor
+
+async def _run(op: str, fn, *args):
+    submitted = time.perf_counter()
+    metrics.gauge_add("bcrypt_queue_depth", 1)
+
+    def _job():
+        started = time.perf_counter()
+        metrics.gauge_add("bcrypt_queue_depth", -1)
+        metrics.observe("bcrypt_wait", started - submitted, op=op)
+        try:
+            return fn(*args)
+        finally:
+            metrics.observe("bcrypt_run", time.perf_counter() - started, op=op)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), _job)
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)).decode("utf-8")
+
+def _check(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+async def hash_password(password: str) -> str:
+    """bcrypt hash with cost BCRYPT_ROUNDS, computed on the bcrypt worker pool."""
+    return await _run("hash", _hash, password)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    """bcrypt check on the bcrypt worker pool. The cost is read from the stored hash."""
+    return await _run("check", _check, password, hashed)
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,56 @@
+"""
+Character TTL enforcement.
+
+Reads already hide characters past expires_at; the sweeper soft deletes them in
+batches so they leave the live indexes, and drops the conversation buffers that still
+hold their system prompt in Redis.
+"""
+import asyncio
+import logging
+from config import settings
+from ..chat.keys import archive_key, chat_key
+from ..infrastructure import metrics
+from ..infrastructure.redis_client import redis_client as r
+from .repository import crud_management
+
+logger = logging.getLogger(__name__)
+crud = crud_management()
+
+
+async def _drop_cached_prompts(rows: list[dict]) -> None:
+    try:
+        await r.delete(*(
+            key
+            for row in rows
+            for key in (chat_key(row["client_id"], row["id"]), archive_key(row["client_id"], row["id"]))
+        ))
+    except Exception as e:
+        # The buffers still expire on their own; the prompt lookup already ignores expired rows
+        logger.error(f"Failed to drop cached prompts of {len(rows)} expired characters: {e}")
+
+async def sweep_expired(batch_size: int) -> int:
+    """Expire characters until a batch comes back short. Returns how many were expired."""
+    total = 0
+    while True:
+        rows = await crud.db_expire_characters(batch_size)
+        if not rows:
+            break
+        await _drop_cached_prompts(rows)
+        total += len(rows)
+        metrics.incr("characters_expired", len(rows))
+        if len(rows) < batch_size:
+            break
+    if total:
+        logger.info(f"Expired {total} characters")
+    return total
+
+async def run_expiry_sweeper() -> None:
+    """Long-running task (started in the app lifespan)."""
+    while True:
+        try:
+            await sweep_expired(settings.CHARACTER_EXPIRY_BATCH_SIZE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Character expiry sweep failed: {e}")
+        await asyncio.sleep(settings.CHARACTER_EXPIRY_SWEEP_INTERVAL)
@@ -4,9 +4,43 @@ import uuid
 from ..models import schemas
 from fastapi import status
 from ..database.init import init_db
+from ..database import queries
+from ..database.replicas import mark_write, read_db
+from ..database.pagination import Keyset
+from ..database.pool import PoolAcquireTimeout
 
 logger = logging.getLogger(__name__)
 
+# Hot statements: the system prompt lookup runs at the start of every conversation
+SELECT_CHARACTER_ROLE = queries.register("characters.select_role", """
+    SELECT agent_role
+    FROM characters
+    WHERE id = $1
+        AND client_id = $2
+        AND deleted_at IS NULL
+        AND (expires_at IS NULL OR expires_at > now())
+""")
+# Keyset pages in creation order (idx_characters_client_created); LIMIT NULL means all rows
+SELECT_CHARACTERS = queries.register("characters.select_all", """
+    SELECT id, client_id, agent_role, ttl, created_at, expires_at, deleted_at
+    FROM characters
+    WHERE client_id = $1
+        AND deleted_at IS NULL
+        AND (expires_at IS NULL OR expires_at > now())
+    ORDER BY created_at, id
+    LIMIT $2
+""")
+SELECT_CHARACTERS_AFTER = queries.register("characters.select_all_after", """
+    SELECT id, client_id, agent_role, ttl, created_at, expires_at, deleted_at
+    FROM characters
+    WHERE client_id = $1
+        AND deleted_at IS NULL
+        AND (expires_at IS NULL OR expires_at > now())
+        AND (created_at, id) > ($2, $3)
+    ORDER BY created_at, id
+    LIMIT $4
+""")
+
 class crud_management():
     async def db_insertion_character(self, request: schemas.ServiceRole, client_id: str):
         """
@@ -19,15 +53,16 @@ class crud_management():
             async with pool.acquire() as conn:
                 row = await conn.fetchrow(
                     """
-                    INSERT INTO characters (client_id, agent_role, ttl)
-                    VALUES ($1, $2, $3)
-                    RETURNING id, client_id, agent_role, ttl, deleted_at
+                    INSERT INTO characters (client_id, agent_role, ttl, expires_at)
+                    VALUES ($1, $2, $3::int, now() + $3::int * INTERVAL '1 second')
+                    RETURNING id, client_id, agent_role, ttl, created_at, expires_at, deleted_at
                     """,
                     id, request.agent_role, request.TTL
                 )
             if row is None:
                 logger.warning('Character could not be created.')
                 return None
+            mark_write(id)
             return dict(row)
         except (ValueError, TypeError):
             logger.error('Invalid ID')
@@ -35,13 +70,16 @@ class crud_management():
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except PoolAcquireTimeout:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
     
     async def db_update_character(self, uuid_str: str, request: schemas.ServiceRole, client_id: str):
         """
-        Updates characters by (id, client_id) if not soft-deleted. Returns updated row dict.
+        Updates characters by (id, client_id) if not soft-deleted or expired. Writing the TTL
+        restarts it from now. Returns updated row dict.
         """
         logger.info('Updating character')
         try:
@@ -54,11 +92,13 @@ class crud_management():
                     """
                     UPDATE characters
                     SET agent_role = $1,
-                        ttl = $2
+                        ttl = $2,
+                        expires_at = now() + $2 * INTERVAL '1 second'
                     WHERE id = $3
                         AND client_id = $4
                         AND deleted_at IS NULL
-                    RETURNING id, client_id, agent_role, ttl, deleted_at
+                        AND (expires_at IS NULL OR expires_at > now())
+                    RETURNING id, client_id, agent_role, ttl, created_at, expires_at, deleted_at
                     """,
                     request.agent_role, request.TTL,
                     character_id, id
@@ -66,12 +106,15 @@ class crud_management():
             if row is None:
                 logger.warning('Update character failed (not found/deleted)')
                 return None
+            mark_write(id)
         except (ValueError, TypeError):
             logger.error("Invalid UUID for character id or store_id")
             return None
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except PoolAcquireTimeout:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
@@ -99,6 +142,7 @@ class crud_management():
             if deleted is None:
                 logger.warning('Character not deleted')
                 return status.HTTP_404_NOT_FOUND
+            mark_write(id)
             return status.HTTP_204_NO_CONTENT
         except (ValueError, TypeError):
             logger.error('Invalid ID')
@@ -106,10 +150,161 @@ class crud_management():
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except PoolAcquireTimeout:
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            return None
+
+    async def db_bulk_characters(
+        self,
+        client_id: str,
+        creates: list[schemas.ServiceRole],
+        updates: list[schemas.CharacterBulkUpdate],
+        deletes: list[str]
+    ):
+        """
+        Applies every create, update and delete in one transaction, one statement per kind
+        (unnest/ANY arrays, in that order). Returns per-item results as
+        {"create": [...], "update": [...], "delete": [...]}, each item holding its request
+        index and HTTP status (and the row for creates/updates). Items that are malformed, not
+        found, repeated within their list or both updated and deleted are reported without
+        affecting the others; a database error rolls the whole batch back and returns None.
+        """
+        logger.info(f'Bulk character request: {len(creates)} create, {len(updates)} update, {len(deletes)} delete')
+        results = {"create": [], "update": [], "delete": []}
+        try:
+            id = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(client_id)
+        except (ValueError, TypeError):
+            logger.error('Invalid ID')
+            return None
+
+        # Ids are assigned here so created rows can be matched back to their request items
+        new_ids = [uuid.uuid4() for _ in creates]
+
+        update_ids: dict[int, uuid.UUID] = {}
+        seen: set[uuid.UUID] = set()
+        for index, item in enumerate(updates):
+            try:
+                character_id = uuid.UUID(item.id)
+            except ValueError:
+                results["update"].append({"index": index, "id": item.id, "status": status.HTTP_400_BAD_REQUEST})
+                continue
+            if character_id in seen:
+                results["update"].append({"index": index, "id": item.id, "status": status.HTTP_409_CONFLICT})
+                continue
+            seen.add(character_id)
+            update_ids[index] = character_id
+
+        delete_ids: dict[int, uuid.UUID] = {}
+        seen = set()
+        for index, value in enumerate(deletes):
+            try:
+                character_id = uuid.UUID(value)
+            except ValueError:
+                results["delete"].append({"index": index, "id": value, "status": status.HTTP_400_BAD_REQUEST})
+                continue
+            if character_id in seen:
+                results["delete"].append({"index": index, "id": value, "status": status.HTTP_409_CONFLICT})
+                continue
+            seen.add(character_id)
+            delete_ids[index] = character_id
+
+        # Updating and deleting the same character in one batch is ambiguous: neither is applied
+        conflicts = set(update_ids.values()) & set(delete_ids.values())
+        for kind, ids in (("update", update_ids), ("delete", delete_ids)):
+            for index in [i for i, character_id in ids.items() if character_id in conflicts]:
+                results[kind].append({"index": index, "id": str(ids.pop(index)), "status": status.HTTP_409_CONFLICT})
+
+        try:
+            pool = await init_db()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    created, updated, deleted = [], [], []
+                    if creates:
+                        created = await conn.fetch(
+                            """
+                            INSERT INTO characters (id, client_id, agent_role, ttl, expires_at)
+                            SELECT u.id, $1, u.agent_role, u.ttl, now() + u.ttl * INTERVAL '1 second'
+                            FROM unnest($2::uuid[], $3::text[], $4::int[]) AS u(id, agent_role, ttl)
+                            RETURNING id, client_id, agent_role, ttl, created_at, expires_at, deleted_at
+                            """,
+                            id, new_ids, [c.agent_role for c in creates], [c.TTL for c in creates]
+                        )
+                    if update_ids:
+                        items = [updates[i] for i in update_ids]
+                        updated = await conn.fetch(
+                            """
+                            UPDATE characters AS c
+                            SET agent_role = u.agent_role,
+                                ttl = u.ttl,
+                                expires_at = now() + u.ttl * INTERVAL '1 second'
+                            FROM unnest($2::uuid[], $3::text[], $4::int[]) AS u(id, agent_role, ttl)
+                            WHERE c.id = u.id
+                                AND c.client_id = $1
+                                AND c.deleted_at IS NULL
+                                AND (c.expires_at IS NULL OR c.expires_at > now())
+                            RETURNING c.id, c.client_id, c.agent_role, c.ttl, c.created_at, c.expires_at, c.deleted_at
+                            """,
+                            id, list(update_ids.values()),
+                            [u.agent_role for u in items], [u.TTL for u in items]
+                        )
+                    if delete_ids:
+                        deleted = await conn.fetch(
+                            """
+                            UPDATE characters
+                            SET deleted_at = now()
+                            WHERE client_id = $1
+                                AND id = ANY($2::uuid[])
+                                AND deleted_at IS NULL
+                            RETURNING id
+                            """,
+                            id, list(delete_ids.values())
+                        )
+        except asyncpg.PostgresError as e:
+            logger.error(f"Database error: {e}")
+            return None
+        except PoolAcquireTimeout:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
 
+        if created or updated or deleted:
+            mark_write(id)
+
+        created_rows = {r["id"]: dict(r) for r in created}
+        for index, character_id in enumerate(new_ids):
+            row = created_rows.get(character_id)
+            results["create"].append({
+                "index": index,
+                "id": str(character_id),
+                "status": status.HTTP_201_CREATED if row else status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "data": row
+            })
+
+        updated_rows = {r["id"]: dict(r) for r in updated}
+        for index, character_id in update_ids.items():
+            row = updated_rows.get(character_id)
+            results["update"].append({
+                "index": index,
+                "id": str(character_id),
+                "status": status.HTTP_200_OK if row else status.HTTP_404_NOT_FOUND,
+                "data": row
+            })
+
+        deleted_ids = {r["id"] for r in deleted}
+        for index, character_id in delete_ids.items():
+            results["delete"].append({
+                "index": index,
+                "id": str(character_id),
+                "status": status.HTTP_204_NO_CONTENT if character_id in deleted_ids else status.HTTP_404_NOT_FOUND
+            })
+
+        for items in results.values():
+            items.sort(key=lambda item: item["index"])
+        return results
+
     async def db_select_character(self, uuid_str: str, client_id: str):
         """
         Returns (agent_role,) dict to keep your existing downstream code working.
@@ -118,17 +313,9 @@ class crud_management():
         try:
             character_id = uuid.UUID(uuid_str)
             id = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(client_id)
-            pool = await init_db()
+            pool = await read_db(scope=id)
             async with pool.acquire() as conn:
-                role = await conn.fetchval(
-                    """
-                    SELECT agent_role
-                    FROM characters
-                    WHERE id = $1
-                        AND client_id = $2
-                        AND deleted_at IS NULL
-                    """, character_id, id
-                )
+                role = await queries.fetchval(conn, SELECT_CHARACTER_ROLE, character_id, id)
             if role is None:
                 logger.warning('Character not found')
                 return None
@@ -139,28 +326,33 @@ class crud_management():
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except PoolAcquireTimeout:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
     
-    async def db_select_character_all(self, client_id: str):
+    async def db_select_character_all(
+        self,
+        client_id: str,
+        *,
+        limit: int | None = None,
+        after: Keyset | None = None
+    ):
         """
-        Returns dict like your old sqlite fetchall().
+        Returns the client's characters oldest first, as a list of dicts. With `limit`, at most
+        that many rows after the `after` keyset (created_at, id) of the previous page.
+        None when the client has no characters at all.
         """
         try:
             id = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(client_id)
-            pool = await init_db()
+            pool = await read_db(scope=id)
             async with pool.acquire() as conn:
-                rows = await conn.fetch(
-                    """
-                    SELECT id, client_id, agent_role, ttl, deleted_at
-                    FROM characters
-                    WHERE client_id = $1
-                        AND deleted_at IS NULL
-                    ORDER BY id
-                    """, id
-                )
-            if not rows:
+                if after is None:
+                    rows = await queries.fetch(conn, SELECT_CHARACTERS, id, limit)
+                else:
+                    rows = await queries.fetch(conn, SELECT_CHARACTERS_AFTER, id, after[0], after[1], limit)
+            if not rows and after is None:
                 logger.warning('No characters found for client')
                 return None
             return [dict(r) for r in rows]
@@ -170,6 +362,46 @@ class crud_management():
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except PoolAcquireTimeout:
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            return None
+
+    async def db_expire_characters(self, limit: int) -> list[dict] | None:
+        """
+        Soft deletes up to `limit` characters whose TTL ran out, oldest expiry first
+        (idx_characters_expires). SKIP LOCKED lets several workers sweep at once.
+        Returns the (id, client_id) of the expired rows.
+        """
+        try:
+            pool = await init_db()
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(
+                    """
+                    UPDATE characters
+                    SET deleted_at = now()
+                    WHERE id IN (
+                        SELECT id
+                        FROM characters
+                        WHERE deleted_at IS NULL
+                            AND expires_at <= now()
+                        ORDER BY expires_at
+                        LIMIT $1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, client_id
+                    """,
+                    limit
+                )
+            for client_id in {r["client_id"] for r in rows}:
+                mark_write(client_id)
+            return [dict(r) for r in rows]
+        except asyncpg.PostgresError as e:
+            logger.error(f"Database error: {e}")
+            return None
+        except PoolAcquireTimeout:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
@@ -1,3 +1,7 @@
+from typing import AsyncIterator
+from config import settings
+from ..database.pool import PoolAcquireTimeout
+from ..database.pagination import decode_cursor, split_page, stream_ndjson
 from ..models import schemas
 from .repository import crud_management
 
@@ -7,6 +11,8 @@ async def store_character(request: schemas.ServiceRole, store_id: str) -> dict |
     try:
         character = await crud.db_insertion_character(request, store_id)
         return character
+    except PoolAcquireTimeout:
+        raise
     except:
         return None
 
@@ -14,6 +20,8 @@ async def update_character(uuid: str, request: schemas.ServiceRole, store_id: st
     try:
         updated_character: dict = await crud.db_update_character(uuid, request, store_id)
         return updated_character
+    except PoolAcquireTimeout:
+        raise
     except:
         return None
 
@@ -21,6 +29,17 @@ async def delete_character(uuid: str, store_id: str) -> int | None:
     try:
         http_status = await crud.db_delete_character(uuid, store_id)
         return http_status
+    except PoolAcquireTimeout:
+        raise
+    except:
+        return None
+
+async def bulk_characters(request: schemas.CharacterBulkRequest, store_id: str) -> dict | None:
+    try:
+        results = await crud.db_bulk_characters(store_id, request.create, request.update, request.delete)
+        return results
+    except PoolAcquireTimeout:
+        raise
     except:
         return None
 
@@ -28,6 +47,8 @@ async def get_character(uuid: str, store_id) -> dict | None:
     try:
         agent_role = await crud.db_select_character(uuid, store_id)
         return agent_role
+    except PoolAcquireTimeout:
+        raise
     except:
         return None
 
@@ -35,5 +56,26 @@ async def get_all_character(store_id: str) -> dict | None:
     try:
         agent_role = await crud.db_select_character_all(store_id)
         return agent_role
+    except PoolAcquireTimeout:
+        raise
     except:
         return None
+
+async def get_character_page(store_id: str, *, limit: int, cursor: str | None = None) -> tuple[list[dict], str | None] | None:
+    """
+    One keyset page of characters and the cursor of the next one (None on the last page).
+    Raises ValueError for a malformed cursor.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    rows = await crud.db_select_character_all(store_id, limit=limit + 1, after=after)
+    if rows is None:
+        return None
+    return split_page(rows, limit)
+
+def stream_characters(store_id: str) -> AsyncIterator[bytes]:
+    """Every character of the client as NDJSON, fetched page by page."""
+    async def fetch_page(after, limit):
+        rows = await crud.db_select_character_all(store_id, limit=limit, after=after)
+        # None on the first page just means "no characters"
+        return [] if rows is None and after is None else rows
+    return stream_ndjson(fetch_page, batch_size=settings.LIST_STREAM_BATCH_SIZE)
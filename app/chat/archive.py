@@ -0,0 +1,207 @@
+"""
+Durable chat history: write-behind from Redis to Postgres (chat_messages, migration 0017).
+
+Redis holds a conversation only while it is live, CHAT_TTL_SECONDS after its last turn.
+Every turn queues the conversation; the archiver (a lifespan task in every process)
+claims conversations that have waited CHAT_ARCHIVE_DELAY seconds and copies their new
+messages to Postgres, many conversations per statement. When a user comes back after the
+buffer expired, the buffer is rebuilt from the character's current system prompt and the
+last CHAT_REHYDRATE_MAX_MESSAGES archived messages.
+
+Bookkeeping lives in a hash next to the buffer (keys.archive_key):
+  - offset: buffer entry i (entry 0 being the system prompt) is message number offset + i
+  - archived: highest message number already in Postgres
+Claims are leased for CHAT_ARCHIVE_LEASE seconds, so conversations claimed by a process
+that died are claimed again later; writing a message twice is a no-op. CHAT_ARCHIVE_DELAY
+plus CHAT_ARCHIVE_INTERVAL must stay well below CHAT_TTL_SECONDS, or a buffer can expire
+before its last messages are archived.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any
+from config import settings
+from ..infrastructure import metrics
+from ..infrastructure.redis_client import redis_binary as r
+from . import codec, keys
+from .repository import crud_management
+
+logger = logging.getLogger(__name__)
+crud = crud_management()
+
+# KEYS[1] = pending zset (score = since when the conversation has unarchived messages)
+# KEYS[2] = in-flight zset (score = lease expiry)
+# ARGV[1] = now, ARGV[2] = claim what is pending since before this, ARGV[3] = lease expiry, ARGV[4] = max claims
+# Returns the claimed members. Expired leases go back to pending first, due at once.
+CLAIM_LUA = """
+for _, member in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])) do
+    redis.call('ZREM', KEYS[2], member)
+    redis.call('ZADD', KEYS[1], 'NX', 0, member)
+end
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[2], 'LIMIT', 0, ARGV[4])
+for _, member in ipairs(due) do
+    redis.call('ZREM', KEYS[1], member)
+    redis.call('ZADD', KEYS[2], ARGV[3], member)
+end
+return due
+"""
+
+# KEYS[1] = buffer, KEYS[2] = bookkeeping hash
+# Returns {number of the first entry, entries...} for the entries not archived yet, {0} without a buffer
+READ_UNARCHIVED_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {0}
+end
+local offset = tonumber(redis.call('HGET', KEYS[2], 'offset') or '0')
+local archived = tonumber(redis.call('HGET', KEYS[2], 'archived') or '0')
+local first = math.max(1, archived - offset + 1)
+local entries = redis.call('LRANGE', KEYS[1], first, -1)
+table.insert(entries, 1, offset + first)
+return entries
+"""
+
+# KEYS[1] = buffer, KEYS[2] = bookkeeping hash; ARGV[1] = highest message number now archived
+# The hash never outlives the buffer
+MARK_ARCHIVED_LUA = """
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl == -2 then
+    return 0
+end
+if tonumber(ARGV[1]) > tonumber(redis.call('HGET', KEYS[2], 'archived') or '0') then
+    redis.call('HSET', KEYS[2], 'archived', ARGV[1])
+end
+if ttl > 0 then
+    redis.call('PEXPIRE', KEYS[2], ttl)
+end
+return 1
+"""
+
+_claim = r.register_script(CLAIM_LUA)
+_read_unarchived = r.register_script(READ_UNARCHIVED_LUA)
+_mark_archived = r.register_script(MARK_ARCHIVED_LUA)
+
+
+def _member(store_id: Any, character_id: Any) -> str:
+    return f"{store_id}:{character_id}"
+
+def _conversation_keys(store_id: Any, character_id: Any) -> list[str]:
+    return [keys.chat_key(store_id, character_id), keys.archive_key(store_id, character_id)]
+
+
+async def start_buffer(store_id: Any, character_id: Any, system_prompt: str) -> int:
+    """
+    Puts the system prompt in front of a new buffer and, when the conversation was
+    archived before, its last archived messages right after it. Returns how many
+    messages were restored.
+    """
+    chat_key = keys.chat_key(store_id, character_id)
+    system_entry = codec.encode_entry("system", system_prompt)
+    if not settings.CHAT_ARCHIVE_ENABLED:
+        await r.lpush(chat_key, system_entry)
+        return 0
+    try:
+        history = await crud.db_select_archived_tail(store_id, character_id, settings.CHAT_REHYDRATE_MAX_MESSAGES)
+        if history is None:
+            raise RuntimeError(f"Chat archive unavailable for conversation {_member(store_id, character_id)}")
+    except Exception:
+        # Without the archived message numbers new messages could not be archived;
+        # drop the half-started buffer so the next attempt starts over
+        await r.delete(chat_key)
+        raise
+    entries = [system_entry] + [codec.encode_entry(m["role"], m["content"]) for m in history]
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.lpush(chat_key, *reversed(entries))
+        if history:
+            pipe.hset(
+                keys.archive_key(store_id, character_id),
+                mapping={"offset": history[0]["seq"] - 1, "archived": history[-1]["seq"]}
+            )
+        await pipe.execute()
+    if history:
+        metrics.incr("chat_conversations_rehydrated")
+        logger.info(f"Rehydrated {len(history)} archived messages for conversation {_member(store_id, character_id)}")
+    return len(history)
+
+async def touch(store_id: Any, character_id: Any) -> None:
+    """After a turn: queue the conversation for archiving and keep its bookkeeping as long as the buffer."""
+    if not settings.CHAT_ARCHIVE_ENABLED:
+        return
+    try:
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.expire(keys.archive_key(store_id, character_id), settings.CHAT_TTL_SECONDS)
+            pipe.zadd(keys.ARCHIVE_PENDING, {_member(store_id, character_id): time.time()}, nx=True)
+            await pipe.execute()
+    except Exception as e:
+        # The next turn queues it again
+        logger.error(f"Failed to queue conversation {_member(store_id, character_id)} for archiving: {e}")
+
+
+def _rows(store_id: str, character_id: str, unarchived: list) -> list[tuple]:
+    """chat_messages rows of the entries returned by READ_UNARCHIVED_LUA."""
+    try:
+        ids = (uuid.UUID(store_id), uuid.UUID(character_id))
+    except ValueError:
+        logger.error(f"Skipping malformed chat archive member {_member(store_id, character_id)}")
+        return []
+    first = int(unarchived[0])
+    rows = []
+    for i, raw in enumerate(unarchived[1:]):
+        try:
+            entry = codec.decode_entry(raw)
+        except Exception as e:
+            logger.error(f"Skipping undecodable chat entry {first + i} of {_member(store_id, character_id)}: {e}")
+            continue
+        rows.append((*ids, first + i, entry["role"], entry["content"]))
+    return rows
+
+async def archive_pending(batch_size: int) -> int:
+    """
+    One archiver pass over up to `batch_size` due conversations. Returns how many were
+    archived; on failure they stay claimed and are retried when their lease runs out.
+    """
+    now = time.time()
+    members = await _claim(
+        keys=[keys.ARCHIVE_PENDING, keys.ARCHIVE_INFLIGHT],
+        args=[now, now - settings.CHAT_ARCHIVE_DELAY, now + settings.CHAT_ARCHIVE_LEASE, batch_size]
+    )
+    if not members:
+        return 0
+    conversations = [member.decode().split(":", 1) for member in members]
+    unarchived = await asyncio.gather(*(
+        _read_unarchived(keys=_conversation_keys(store_id, character_id))
+        for store_id, character_id in conversations
+    ))
+    rows, archived_up_to = [], []
+    for (store_id, character_id), tail in zip(conversations, unarchived):
+        if len(tail) > 1:
+            rows.extend(_rows(store_id, character_id, tail))
+            archived_up_to.append((store_id, character_id, int(tail[0]) + len(tail) - 2))
+    inserted = await crud.db_archive_messages(rows)
+    if inserted is None:
+        logger.error(f"Failed to archive {len(rows)} chat messages of {len(members)} conversations, retrying later")
+        return 0
+    await asyncio.gather(*(
+        _mark_archived(keys=_conversation_keys(store_id, character_id), args=[seq])
+        for store_id, character_id, seq in archived_up_to
+    ))
+    await r.zrem(keys.ARCHIVE_INFLIGHT, *members)
+    if inserted:
+        metrics.incr("chat_messages_archived", inserted)
+    return len(members)
+
+async def run_archiver() -> None:
+    """Long-running task (started in the app lifespan). Returns at once with CHAT_ARCHIVE_ENABLED off."""
+    if not settings.CHAT_ARCHIVE_ENABLED:
+        return
+    while True:
+        try:
+            archived = await archive_pending(settings.CHAT_ARCHIVE_BATCH_SIZE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Chat archive pass failed: {e}")
+            archived = 0
+        # A full batch means more may be due: go on without waiting
+        if archived < settings.CHAT_ARCHIVE_BATCH_SIZE:
+            await asyncio.sleep(settings.CHAT_ARCHIVE_INTERVAL)
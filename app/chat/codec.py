@@ -0,0 +1,53 @@
+"""
+Encoding of chat history entries (the Redis lists at keys.chat_key()).
+
+Legacy entries are JSON objects {"role": ..., "content": ...}. Version 1 entries are
+one version byte (0x01) followed by a msgpack array [role, content]:
+  - role is a small int for the roles in ROLE_CODES, the role string otherwise
+  - content is a str, or bin holding zstd-compressed UTF-8 when the text is at least
+    CHAT_HISTORY_COMPRESS_MIN_BYTES long and compressing it actually saves space
+
+decode_entry() reads both, so conversations started before the switch (or written by
+processes with CHAT_HISTORY_FORMAT=json, e.g. during a rolling deploy) keep working.
+A JSON text never starts with 0x01, so the first byte tells the formats apart.
+"""
+from typing import Any
+import ormsgpack
+import zstandard
+from config import settings
+from ..infrastructure import json_codec
+
+FORMATS = ("msgpack", "json")
+V1 = 0x01
+ROLE_CODES = {"system": 0, "user": 1, "assistant": 2, "tool": 3}
+_ROLES = {code: role for role, code in ROLE_CODES.items()}
+
+# Not thread-safe; only used from the event loop
+_compressor = zstandard.ZstdCompressor(level=settings.CHAT_HISTORY_ZSTD_LEVEL)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def _pack_content(content: str) -> str | bytes:
+    min_bytes = settings.CHAT_HISTORY_COMPRESS_MIN_BYTES
+    if min_bytes <= 0 or len(content) < min_bytes:
+        return content
+    raw = content.encode("utf-8")
+    compressed = _compressor.compress(raw)
+    return compressed if len(compressed) < len(raw) else content
+
+def encode_entry(role: str, content: str, *, format: str | None = None) -> bytes:
+    format = format or settings.CHAT_HISTORY_FORMAT
+    if format == "json":
+        return json_codec.dumpb({"role": role, "content": content})
+    if format != "msgpack":
+        raise ValueError(f"Unknown chat history format {format!r} (expected one of {', '.join(FORMATS)})")
+    return bytes((V1,)) + ormsgpack.packb([ROLE_CODES.get(role, role), _pack_content(content)])
+
+def decode_entry(raw: bytes | str) -> dict[str, Any]:
+    if isinstance(raw, (bytes, bytearray)) and raw[:1] == b"\x01":
+        role, content = ormsgpack.unpackb(raw[1:])
+        if isinstance(content, bytes):
+            content = _decompressor.decompress(content).decode("utf-8")
+        return {"role": _ROLES.get(role, role), "content": content}
+    # Legacy JSON entry
+    return json_codec.loads(raw)
@@ -0,0 +1,26 @@
+"""
+Redis keys of chat state.
+
+Every key of one conversation carries the same hash tag (the part in braces), so in
+REDIS_MODE=cluster they live in one slot and can be used together in one transaction
+or script. The tag is per conversation rather than per store so a busy store is still
+spread over the whole cluster.
+"""
+from typing import Any
+
+
+def conversation_tag(store_id: Any, character_id: Any) -> str:
+    return f"{{{store_id}:{character_id}}}"
+
+def chat_key(store_id: Any, character_id: Any) -> str:
+    """Conversation buffer of a character; its first entry is the character's system prompt."""
+    return f"chat:{conversation_tag(store_id, character_id)}"
+
+def archive_key(store_id: Any, character_id: Any) -> str:
+    """Archive bookkeeping of a conversation buffer (app/chat/archive.py), next to it in the cluster."""
+    return f"chat:{conversation_tag(store_id, character_id)}:archive"
+
+# Conversations waiting to be archived and those being archived; members are
+# "<store_id>:<character_id>". Both share one tag so a script can move members between them.
+ARCHIVE_PENDING = "chat_archive:{queue}:pending"
+ARCHIVE_INFLIGHT = "chat_archive:{queue}:inflight"
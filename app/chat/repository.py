@@ -0,0 +1,82 @@
+import asyncpg
+import logging
+import uuid
+from typing import Any
+from ..database.init import init_db
+from ..database import queries
+from ..database.pool import PoolAcquireTimeout
+
+logger = logging.getLogger(__name__)
+
+# Runs whenever a conversation whose Redis buffer expired is resumed (primary key, backwards)
+SELECT_ARCHIVED_TAIL = queries.register("chat.select_archived_tail", """
+    SELECT seq, role, content
+    FROM chat_messages
+    WHERE client_id = $1
+        AND character_id = $2
+    ORDER BY seq DESC
+    LIMIT $3
+""")
+
+class crud_management():
+    async def db_archive_messages(self, rows: list[tuple[uuid.UUID, uuid.UUID, int, str, str]]) -> int | None:
+        """
+        Inserts (client_id, character_id, seq, role, content) rows in one statement.
+        Rows already archived are skipped, so a batch can safely be written twice.
+        Returns how many rows were new, or None on failure.
+        """
+        if not rows:
+            return 0
+        client_ids, character_ids, seqs, roles, contents = (list(col) for col in zip(*rows))
+        try:
+            pool = await init_db()
+            async with pool.acquire() as conn:
+                inserted = await conn.fetchval(
+                    """
+                    WITH inserted AS (
+                        INSERT INTO chat_messages (client_id, character_id, seq, role, content)
+                        SELECT * FROM unnest($1::uuid[], $2::uuid[], $3::int[], $4::text[], $5::text[])
+                        ON CONFLICT (client_id, character_id, seq) DO NOTHING
+                        RETURNING 1
+                    )
+                    SELECT count(*) FROM inserted
+                    """,
+                    client_ids, character_ids, seqs, roles, contents
+                )
+            return inserted
+        except asyncpg.PostgresError as e:
+            logger.error(f"Database error: {e}")
+            return None
+        except PoolAcquireTimeout:
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            return None
+
+    async def db_select_archived_tail(self, client_id: Any, character_id: Any, limit: int) -> list[dict] | None:
+        """
+        The last `limit` archived messages of a conversation, oldest first, as
+        {seq, role, content}. Returns [] for a conversation with no archive, None on failure.
+        """
+        try:
+            client_id = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(str(client_id))
+            character_id = character_id if isinstance(character_id, uuid.UUID) else uuid.UUID(str(character_id))
+        except ValueError:
+            logger.error('Invalid ID')
+            return None
+        try:
+            # Always the primary: the archive is written by whichever process claimed the
+            # conversation, outside this process' read-your-writes window, and a lagging
+            # replica would hand out seq numbers that are already taken
+            pool = await init_db()
+            async with pool.acquire() as conn:
+                rows = await queries.fetch(conn, SELECT_ARCHIVED_TAIL, client_id, character_id, limit)
+            return [dict(r) for r in reversed(rows)]
+        except asyncpg.PostgresError as e:
+            logger.error(f"Database error: {e}")
+            return None
+        except PoolAcquireTimeout:
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            return None
@@ -1,12 +1,15 @@
 from __future__ import annotations
-import json
 import logging
 from typing import Any, Optional
 from fastapi import HTTPException
 from config import settings
 from ..agents.chatbot_agent import ChatBot
-from ..infrastructure.redis_client import redis_client as r
+from ..agents.scheduler import SchedulerBusy, scheduler
+from ..clients.tiers import DEFAULT_TIER, Tier
+from ..database.pool import PoolAcquireTimeout
+from ..infrastructure.redis_client import redis_binary as r
 from ..models.schemas import Completions
+from . import archive, codec, keys
 from .memory import build_vector_context, store_chat_turn
 
 logger = logging.getLogger(__name__)
@@ -93,11 +96,11 @@ def _extract_assistant_text(response: Any) -> Optional[str]:
     return None
 
 
-async def store_message(request: Completions, store_id: str):
+async def store_message(request: Completions, store_id: str, tier: Tier = DEFAULT_TIER):
     try:
-        chat_key = f"chat:{store_id}:{request.uuid}"
+        chat_key = keys.chat_key(store_id, request.uuid)
         # 1) Store incoming message in Redis
-        await r.rpush(chat_key, json.dumps({"role": request.role, "content": request.content}))
+        await r.rpush(chat_key, codec.encode_entry(request.role, request.content))
         # 2) If first message in conversation, inject system prompt once
         count_llen = await r.llen(chat_key)
         chatbot = ChatBot()
@@ -106,13 +109,14 @@ async def store_message(request: Completions, store_id: str):
             logger.info(f"system_prompt fetched for {request.uuid}: {bool(system_prompt)}")
             if system_prompt is None:
                 return None
-            # Prepend system prompt to the conversation
-            await r.lpush(chat_key, json.dumps({"role": "system", "content": system_prompt}))
+            # Prepend system prompt to the conversation, and its archived history if it is resumed
+            await archive.start_buffer(store_id, request.uuid, system_prompt)
         # 3) Load conversation from Redis
-        messages: list[str] = await r.lrange(chat_key, 0, -1)
-        parsed: list[dict[str, str]] = [json.loads(msg) for msg in messages]
-        logger.info(f"count_llen: {count_llen}")
-        logger.debug(f"Parsed payload: {parsed}")
+        messages: list[bytes] = await r.lrange(chat_key, 0, -1)
+        parsed: list[dict[str, str]] = [codec.decode_entry(msg) for msg in messages]
+        # Logged on every chat turn: sampled, and the payload is only rendered if DEBUG is on
+        logger.info(f"count_llen: {count_llen}", extra={"sample_rate": settings.LOG_SAMPLE_RATE})
+        logger.debug("Parsed payload: %s", parsed, extra={"sample_rate": settings.LOG_SAMPLE_RATE})
         # 4) Retrieve vector memory (ephemeral injection, not stored in Redis)
         parsed_for_llm = parsed[:]
         if request.role == "user":
@@ -124,12 +128,13 @@ async def store_message(request: Completions, store_id: str):
             if retrieved:
                 insert_at = 1 if parsed_for_llm and parsed_for_llm[0].get("role") == "system" else 0
                 parsed_for_llm.insert(insert_at, {"role": "system", "content": retrieved})
-        # 5) Call the model
-        response: dict[str, Any] = await chatbot.chat(parsed_for_llm)
+        # 5) Call the model, waiting for this tenant's fair share of LLM slots
+        async with scheduler.slot(store_id, weight=tier.llm_weight, label=tier.name):
+            response: dict[str, Any] = await chatbot.chat(parsed_for_llm)
         # 6) Extract assistant reply and store it in Redis
         assistant_text = _extract_assistant_text(response)
         if assistant_text:
-            await r.rpush(chat_key, json.dumps({"role": "assistant", "content": assistant_text}))
+            await r.rpush(chat_key, codec.encode_entry("assistant", assistant_text))
         # 7) Store long-term memory in pgvector
         # Store the incoming user turn (if applicable) and the assistant reply.
         if request.role == "user":
@@ -146,9 +151,12 @@ async def store_message(request: Completions, store_id: str):
                 role="assistant",
                 content=assistant_text,
             )
-        # 8) TTL for Redis chat buffer
-        await r.expire(chat_key, 1200)
+        # 8) TTL for Redis chat buffer; the turn is archived to Postgres behind the scenes
+        await r.expire(chat_key, settings.CHAT_TTL_SECONDS)
+        await archive.touch(store_id, request.uuid)
         return response
+    except (SchedulerBusy, PoolAcquireTimeout):
+        raise
     except HTTPException as e:
         logger.error(f"Network error caught: {e}")
         return None
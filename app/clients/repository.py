@@ -1,16 +1,30 @@
 import asyncpg
 import uuid
 import logging
-import secrets
-import bcrypt
 from asyncpg.exceptions import UniqueViolationError
 from pathlib import Path
 from fastapi import status
 from ..database.init import init_db
+from ..database import queries
+from ..database.replicas import ADMIN_SCOPE, mark_write, read_db
+from ..database.pagination import Keyset
+from ..database.pool import PoolAcquireTimeout
+from ..auth import cache as auth_cache
+from ..auth.keys import generate_api_key, hash_api_key
+from ..auth.passwords import hash_password, verify_password
 
 logger = logging.getLogger(__name__)
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 
+# Runs on every request without a cached API key (verify_api_key)
+SELECT_CLIENT_BY_KEY = queries.register("clients.select_by_key", """
+    SELECT id, email, COALESCE(is_admin, FALSE) AS is_admin, subscription
+    FROM clients
+    WHERE api_key_hash = $1
+        AND deleted_at IS NULL
+        AND is_active = TRUE
+""")
+
 class crud_management:
     async def db_any_admin_exits(self) -> bool:
         """True if at least one active (not deleted) admin exists."""
@@ -31,37 +45,64 @@ class crud_management:
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return False
+        except PoolAcquireTimeout:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return False
 
+    async def db_select_tiers(self) -> list[dict] | None:
+        """All rows of subscription_tiers. Cached by clients/tiers.py."""
+        try:
+            pool = await init_db()
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(
+                    """
+                    SELECT name, request_limit, window_seconds, max_concurrent_llm, llm_weight
+                    FROM subscription_tiers
+                    """
+                )
+            return [dict(r) for r in rows]
+        except asyncpg.PostgresError as e:
+            logger.error(f"Database error: {e}")
+            return None
+        except PoolAcquireTimeout:
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            return None
+
     async def db_create_admin(self, email: str, password: str):
         """
         Inserts a new client (active) that is admin and returns a dict-like row (keeps your existing calling style).
         """
         try:
-            hashed_pw: str = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode("utf-8")
-            api_key: str = f"fn_{secrets.token_urlsafe(32)}"
+            hashed_pw: str = await hash_password(password)
+            api_key: str = generate_api_key()
             pool = await init_db()
             async with pool.acquire() as conn:
                 row = await conn.fetchrow(
                     """
-                    INSERT INTO clients (email, password, api_key, is_admin)
+                    INSERT INTO clients (email, password, api_key_hash, is_admin)
                     VALUES ($1, $2, $3, TRUE)
-                    RETURNING id, email, api_key, created_at, deleted_at, is_active, subscription, store_name, phone, is_admin
+                    RETURNING id, email, created_at, deleted_at, is_active, subscription, store_name, phone, is_admin
                     """,
-                    email, hashed_pw, api_key
+                    email, hashed_pw, hash_api_key(api_key)
                 )
                 if row is None:
                     logger.warning('Failed to create client (admin) resource')
                     return None
-                return dict(row)
+                mark_write(ADMIN_SCOPE)
+                # Only the digest is stored: this is the one time the plaintext key is returned
+                return {**dict(row), "api_key": api_key}
         except UniqueViolationError:
             logger.warning(f"Email already exists (active client): {email}")
             return None
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except PoolAcquireTimeout:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
@@ -83,23 +124,25 @@ class crud_management:
         Backwards compatible with old calls: db_insert_client(email, password)
         """
         try:
-            hashed_pw: str = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode("utf-8")
-            api_key: str = f"fn_{secrets.token_urlsafe(32)}"
+            hashed_pw: str = await hash_password(password)
+            api_key: str = generate_api_key()
             pool = await init_db()
             async with pool.acquire() as conn:
                 row = await conn.fetchrow(
                     """
-                    INSERT INTO clients (email, password, api_key, is_active, subscription, store_name, phone, is_admin)
+                    INSERT INTO clients (email, password, api_key_hash, is_active, subscription, store_name, phone, is_admin)
                     VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-                    RETURNING id, email, api_key, created_at, deleted_at, is_active, subscription, store_name, phone, is_admin
+                    RETURNING id, email, created_at, deleted_at, is_active, subscription, store_name, phone, is_admin
                     """,
-                    email, hashed_pw, api_key, is_active,
+                    email, hashed_pw, hash_api_key(api_key), is_active,
                     subscription, strore_name, phone, is_admin
                 )
             if row is None:
                 logger.warning('Failed to create client resource')
                 return None
-            return dict(row)
+            mark_write(ADMIN_SCOPE)
+            # Only the digest is stored: this is the one time the plaintext key is returned
+            return {**dict(row), "api_key": api_key}
         except UniqueViolationError:
             # Our partial unique index on (email) WHERE deleted_at IS NULL triggers this.
             logger.warning(f"Email already exists (active client): {email}")
@@ -107,6 +150,8 @@ class crud_management:
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except PoolAcquireTimeout:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
@@ -133,72 +178,89 @@ class crud_management:
                 logger.warning('No matching email (or client inactive/deleted)')
                 return None
             stored_pw = row['password']
-            if not bcrypt.checkpw(password.encode(), stored_pw.encode()):
+            if not await verify_password(password, stored_pw):
                 logger.warning('Invalid credentials')
                 return None
             return (row['id'], row['password'])
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except PoolAcquireTimeout:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
     
     async def db_select_client_by_key(self, api_key: str):
         """
-        Used by verify_api_key dependency. Returns (id, email, api_key, is_admin) dict.
+        Used by verify_api_key dependency. Returns (id, email, api_key, is_admin, subscription) dict.
+        Looks the key up by its SHA-256 digest (idx_clients_api_key_hash_active).
+        Always read from the primary: a revoked key must stop working at once, and the
+        auth cache already keeps most of this traffic off the database.
         """
         try:
             pool = await init_db()
             async with pool.acquire() as conn:
-                row = await conn.fetchrow(
-                    """
-                    SELECT id, email, api_key, COALESCE(is_admin, FALSE) AS is_admin
-                    FROM clients
-                    WHERE api_key = $1
-                        AND deleted_at IS NULL
-                        AND is_active = TRUE
-                    """, api_key
-                )
+                row = await queries.fetchrow(conn, SELECT_CLIENT_BY_KEY, hash_api_key(api_key))
             if row is None:
                 logger.warning('No matching API key (or client inactive/deleted)')
                 return None
-            return dict(row) if row else None
+            return {
+                "id": row["id"],
+                "email": row["email"],
+                "api_key": api_key,
+                "is_admin": row["is_admin"],
+                "subscription": row["subscription"]
+            }
             # return (row['id'], row['email'], row['api_key'], row['is_admin'])
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except PoolAcquireTimeout:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
 
-    async def db_admin_list_clients(self, *, include_deleted: bool = False) -> list[dict] | None:
+    async def db_admin_list_clients(
+        self,
+        *,
+        include_deleted: bool = False,
+        limit: int | None = None,
+        after: Keyset | None = None
+        ) -> list[dict] | None:
+        """Newest first. With `after`, only clients older than that (created_at, id) keyset."""
+        conditions, args = [], []
+        if not include_deleted:
+            conditions.append("deleted_at IS NULL")
+        if after is not None:
+            args.extend(after)
+            conditions.append(f"(created_at, id) < (${len(args) - 1}, ${len(args)})")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        page = ""
+        if limit is not None:
+            args.append(limit)
+            page = f"LIMIT ${len(args)}"
         try:
-            pool = await init_db()
+            pool = await read_db(scope=ADMIN_SCOPE)
             async with pool.acquire() as conn:
-                if include_deleted:
-                    rows = await conn.fetch(
-                        """
-                        SELECT id, email, api_key, is_active, subscription, store_name, phone,
-                            COALESCE(is_admin, FALSE) AS is_admin
-                        FROM clients
-                        ORDER BY created_at DESC
-                        """
-                    )
-                else:
-                    rows = await conn.fetch(
-                        """
-                        SELECT id, email, api_key, is_active, subscription, store_name, phone,
-                            COALESCE(is_admin, FALSE) AS is_admin
-                        FROM clients
-                        WHERE deleted_at IS NULL
-                        ORDER BY created_at DESC
-                        """
-                    )
+                rows = await conn.fetch(
+                    f"""
+                    SELECT id, email, is_active, subscription, store_name, phone,
+                        COALESCE(is_admin, FALSE) AS is_admin, created_at
+                    FROM clients
+                    {where}
+                    ORDER BY created_at DESC, id DESC
+                    {page}
+                    """,
+                    *args
+                )
                 return [dict(r) for r in rows]
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except PoolAcquireTimeout:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
@@ -206,11 +268,11 @@ class crud_management:
     async def db_admin_get_client(self, client_id: str) -> dict | None:
         try:
             id_ = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(client_id)
-            pool = await init_db()
+            pool = await read_db(scope=ADMIN_SCOPE)
             async with pool.acquire() as conn:
                 row = await conn.fetchrow(
                     """
-                    SELECT id, email, api_key, created_at, deleted_at, is_active, subscription, store_name, phone,
+                    SELECT id, email, created_at, deleted_at, is_active, subscription, store_name, phone,
                         COALESCE(is_admin, FALSE) AS is_admin
                     FROM clients
                     WHERE id = $1
@@ -223,6 +285,8 @@ class crud_management:
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except PoolAcquireTimeout:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None  
@@ -246,25 +310,32 @@ class crud_management:
             id_ = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(client_id)
             hashed_pw: str | None = None
             if password is not None:
-                hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode("utf-8")
+                hashed_pw = await hash_password(password)
             pool = await init_db()
             async with pool.acquire() as conn:
-                row = await conn.fetchrow(
-                    """
-                    UPDATE clients
-                    SET email        = COALESCE($1, email),
-                        password     = COALESCE($2, password),
-                        is_admin     = COALESCE($3, is_admin),
-                        is_active    = COALESCE($4, is_active),
-                        subscription = COALESCE($5, subscription),
-                        store_name   = COALESCE($6, store_name),
-                        phone        = COALESCE($7, phone)
-                    WHERE id = $8
-                        AND deleted_at IS NULL
-                    RETURNING id, email, api_key, created_at, is_active, subscription, store_name, phone,
-                        COALESCE(is_admin, FALSE) AS is_admin
-                    """, email, hashed_pw, is_admin, is_active, subscription, strore_name, phone, id_
-                )
+                async with conn.transaction():
+                    row = await conn.fetchrow(
+                        """
+                        UPDATE clients
+                        SET email        = COALESCE($1, email),
+                            password     = COALESCE($2, password),
+                            is_admin     = COALESCE($3, is_admin),
+                            is_active    = COALESCE($4, is_active),
+                            subscription = COALESCE($5, subscription),
+                            store_name   = COALESCE($6, store_name),
+                            phone        = COALESCE($7, phone)
+                        WHERE id = $8
+                            AND deleted_at IS NULL
+                        RETURNING id, email, created_at, is_active, subscription, store_name, phone,
+                            COALESCE(is_admin, FALSE) AS is_admin
+                        """, email, hashed_pw, is_admin, is_active, subscription, strore_name, phone, id_
+                    )
+                    if row is not None:
+                        # Inside the transaction: the change rolls back if the cache can't be invalidated
+                        await auth_cache.invalidate_client(id_)
+            if row is not None:
+                # is_active/is_admin/email changes must reach verify_api_key immediately
+                mark_write(ADMIN_SCOPE)
             return dict(row) if row else None
         except UniqueViolationError:
             logger.warning(f"Email already exists (active client): {email}")
@@ -275,6 +346,8 @@ class crud_management:
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except (PoolAcquireTimeout, auth_cache.InvalidationFailed):
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
@@ -288,19 +361,23 @@ class crud_management:
             id = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(client_id)
             pool = await init_db()
             async with pool.acquire() as conn:
-                deleted = await conn.fetchval(
-                    """
-                    UPDATE clients
-                    SET deleted_at = now(),
-                        is_active = FALSE
-                    WHERE id = $1
-                      AND deleted_at IS NULL
-                    RETURNING id
-                    """, id
-                )
+                async with conn.transaction():
+                    deleted = await conn.fetchval(
+                        """
+                        UPDATE clients
+                        SET deleted_at = now(),
+                            is_active = FALSE
+                        WHERE id = $1
+                          AND deleted_at IS NULL
+                        RETURNING id
+                        """, id
+                    )
+                    if deleted is not None:
+                        await auth_cache.invalidate_client(id)
             if deleted is None:
                 logger.warning('Client not deleted (not found or already deleted)')
                 return None
+            mark_write(ADMIN_SCOPE)
             return status.HTTP_204_NO_CONTENT
         except (ValueError, TypeError):
             logger.error('Invalid UUID for store_id')
@@ -308,6 +385,8 @@ class crud_management:
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except (PoolAcquireTimeout, auth_cache.InvalidationFailed):
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
@@ -319,39 +398,43 @@ class crud_management:
         logger.info('Updating client account')
         try:
             id = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(client_id)
+            # Hash before taking a connection so the pool isn't held during bcrypt
+            hashed_pw: str | None = await hash_password(password) if password is not None else None
             pool = await init_db()
             async with pool.acquire() as conn:
-                if password is None and email is not None:
-                    row = await conn.fetchrow(
-                        """
-                        UPDATE clients
-                        SET email = $1
-                        WHERE id = $2
-                            AND deleted_at IS NULL
-                        RETURNING id, email, api_key, created_at, deleted_at, is_active, subscription, store_name, phone,
-                            COALESCE(is_admin, FALSE) AS is_admin
-                        """,
-                        email, id
-                    )
-                elif email is None and password is not None:
-                    hashed_pw: str = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode("utf-8")
-                    row = await conn.fetchrow(
-                        """
-                        UPDATE clients
-                        SET password = $1
-                        WHERE id = $2
-                            AND deleted_at IS NULL
-                        RETURNING id, email, api_key, created_at, deleted_at, is_active, subscription, store_name, phone,
-                            COALESCE(is_admin, FALSE) AS is_admin
-                        """,
-                        hashed_pw, id 
-                    )
-                else:
-                    return None
+                async with conn.transaction():
+                    if password is None and email is not None:
+                        row = await conn.fetchrow(
+                            """
+                            UPDATE clients
+                            SET email = $1
+                            WHERE id = $2
+                                AND deleted_at IS NULL
+                            RETURNING id, email, created_at, deleted_at, is_active, subscription, store_name, phone,
+                                COALESCE(is_admin, FALSE) AS is_admin
+                            """,
+                            email, id
+                        )
+                    elif email is None and password is not None:
+                        row = await conn.fetchrow(
+                            """
+                            UPDATE clients
+                            SET password = $1
+                            WHERE id = $2
+                                AND deleted_at IS NULL
+                            RETURNING id, email, created_at, deleted_at, is_active, subscription, store_name, phone,
+                                COALESCE(is_admin, FALSE) AS is_admin
+                            """,
+                            hashed_pw, id 
+                        )
+                    else:
+                        return None
+                    if row is not None:
+                        await auth_cache.invalidate_client(id)
             if row is None:
                 logger.warning("Update client failed (not found or deleted)")
                 return None
-
+            mark_write(ADMIN_SCOPE)
             return dict(row)
 
         except UniqueViolationError:
@@ -363,6 +446,8 @@ class crud_management:
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except (PoolAcquireTimeout, auth_cache.InvalidationFailed):
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
@@ -373,30 +458,37 @@ class crud_management:
         """
         try:
             id = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(client_id)
-            new_key: str = f"fn_{secrets.token_urlsafe(32)}"
+            new_key: str = generate_api_key()
             pool = await init_db()
             async with pool.acquire() as conn:
-                updated = await conn.fetchval(
-                    """
-                    UPDATE clients
-                    SET api_key = $1
-                    WHERE id = $2
-                      AND deleted_at IS NULL
-                      AND is_active = TRUE
-                    RETURNING api_key
-                    """,
-                    new_key, id
-                )
+                async with conn.transaction():
+                    updated = await conn.fetchval(
+                        """
+                        UPDATE clients
+                        SET api_key_hash = $1,
+                            api_key = NULL
+                        WHERE id = $2
+                          AND deleted_at IS NULL
+                          AND is_active = TRUE
+                        RETURNING id
+                        """,
+                        hash_api_key(new_key), id
+                    )
+                    if updated is not None:
+                        await auth_cache.invalidate_client(id)
             if updated is None:
                 logger.warning('Failed to regenerate key (not found/inactive/deleted)')
                 return None
-            return updated
+            mark_write(ADMIN_SCOPE)
+            return new_key
         except (ValueError, TypeError):
             logger.error("Invalid UUID for store_id")
             return None
         except asyncpg.PostgresError as e:
             logger.error(f"Database error: {e}")
             return None
+        except (PoolAcquireTimeout, auth_cache.InvalidationFailed):
+            raise
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return None
\ No newline at end of file
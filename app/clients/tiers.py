@@ -0,0 +1,56 @@
+"""
+Subscription tiers (clients.subscription -> limits), cached in-process.
+
+The subscription_tiers table is small and rarely changes, so it is re-read at most
+every TIER_CACHE_TTL seconds instead of once per request.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from config import settings
+from .repository import crud_management
+
+logger = logging.getLogger(__name__)
+crud = crud_management()
+
+
+@dataclass(frozen=True)
+class Tier:
+    name: str
+    request_limit: int
+    window_seconds: int
+    max_concurrent_llm: int
+    # Share of the global LLM concurrency under contention (see agents/scheduler.py)
+    llm_weight: int = 1
+
+# Used when the table can't be read or a client has an unknown subscription
+DEFAULT_TIER = Tier("free", request_limit=300, window_seconds=60, max_concurrent_llm=2)
+
+_tiers: dict[str, Tier] = {}
+_loaded_at: float = float("-inf")
+_lock = asyncio.Lock()
+
+
+async def _refresh() -> None:
+    global _tiers, _loaded_at
+    async with _lock:
+        if time.monotonic() - _loaded_at < settings.TIER_CACHE_TTL:
+            return  # another request refreshed while we waited
+        rows = await crud.db_select_tiers()
+        # On failure keep serving the previous table and retry after the TTL
+        _loaded_at = time.monotonic()
+        if rows is None:
+            logger.error("Could not load subscription tiers, keeping cached values")
+            return
+        _tiers = {row["name"]: Tier(**row) for row in rows}
+
+async def get_tier(name: str | None) -> Tier:
+    if time.monotonic() - _loaded_at >= settings.TIER_CACHE_TTL:
+        await _refresh()
+    return _tiers.get(name or "free") or _tiers.get("free") or DEFAULT_TIER
+
+def clear() -> None:
+    global _tiers, _loaded_at
+    _tiers = {}
+    _loaded_at = float("-inf")
@@ -1,103 +1,137 @@
 import asyncio
 import logging
-import json
-from pathlib import Path
 import asyncpg
 from pgvector.asyncpg import register_vector
 from config import settings
+from ..infrastructure import json_codec
+from .pool import InstrumentedPool
+from . import migrate, queries
 
 logger = logging.getLogger(__name__)
 
-SCHEMA_PATH = Path(__file__).with_name('schema.sql')
-SCHEMA_VERSION = 6
+# Named pools per workload class, so slow vector searches can't starve auth and CRUD
+OLTP = "oltp"
+VECTOR = "vector"
+_pools: dict[str, InstrumentedPool] = {}
+_schema_ready = False
+_lock = asyncio.Lock()
 
-_pool: asyncpg.Pool | None = None
+def _pool_options(name: str) -> dict:
+    if name == VECTOR:
+        return {
+            "min_size": settings.DB_VECTOR_POOL_MIN_SIZE,
+            "max_size": settings.DB_VECTOR_POOL_MAX_SIZE,
+            "statement_timeout_ms": settings.DB_VECTOR_STATEMENT_TIMEOUT_MS,
+        }
+    if name == OLTP:
+        return {
+            "min_size": settings.DB_POOL_MIN_SIZE,
+            "max_size": settings.DB_POOL_MAX_SIZE,
+            "statement_timeout_ms": settings.DB_STATEMENT_TIMEOUT_MS,
+        }
+    raise ValueError(f"Unknown pool: {name}")
 
 async def _init_conn(conn: asyncpg.Connection) -> None:
     await conn.execute('CREATE EXTENSION IF NOT EXISTS vector;')
+    await _init_replica_conn(conn)
+
+async def _init_replica_conn(conn: asyncpg.Connection) -> None:
+    # Standbys are read-only: the extension comes from the primary through replication
     # asyncpg defaults json/jsonb to str. These codecs allow passing dict/list directly.
     await conn.set_type_codec(
         "json",
-        encoder=json.dumps,
-        decoder=json.loads,
+        encoder=json_codec.dumps,
+        decoder=json_codec.loads,
         schema="pg_catalog",
         format="text",
     )
     await conn.set_type_codec(
         "jsonb",
-        encoder=json.dumps,
-        decoder=json.loads,
+        encoder=json_codec.dumps,
+        decoder=json_codec.loads,
         schema="pg_catalog",
         format="text",
     )
     await register_vector(conn)
+    # On a fresh database the tables don't exist yet; statements are then prepared on first use
+    if _schema_ready:
+        await queries.prepare_all(conn)
 
-def _split_sql_statements(sql: str) -> list[str]:
-    """
-    Very simple splitter for a schema file (no functions/procs with $$ blocks).
-    Good enough for your current schema.sql.
-    """
-    lines = []
-    for line in sql.splitlines():
-        stripped = line.strip()
-        if not stripped or stripped.startswith('--'):
-            continue
-        lines.append(line)
-    cleaned = '\n'.join(lines)
-
-    statements = []
-    for stmt in cleaned.split(';'):
-        stmt = stmt.strip()
-        if stmt:
-            statements.append(stmt + ';')
-    return statements
-
-async def _create_pool_with_retry(dsn: str, attempts: int = 30, delay_s: float = 1.0) -> asyncpg.Pool:
+async def _create_pool_with_retry(
+    dsn: str,
+    name: str,
+    attempts: int = 30,
+    delay_s: float = 1.0,
+    *,
+    replica: str | None = None
+) -> InstrumentedPool:
+    """Creates the `name` pool on `dsn`. Pass `replica` (a label) for read-only standby pools."""
+    options = _pool_options(name)
+    label = f"{name}@{replica}" if replica else name
     last_err: Exception | None = None
     for i in range(attempts):
         try:
-            return await asyncpg.create_pool(dsn=dsn, min_size=1, max_size=10, init=_init_conn)
+            pool = await asyncpg.create_pool(
+                dsn=dsn,
+                min_size=options["min_size"],
+                max_size=options["max_size"],
+                statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+                max_inactive_connection_lifetime=settings.DB_MAX_INACTIVE_LIFETIME,
+                server_settings={
+                    "application_name": f"fastwrap-{label}",
+                    "statement_timeout": str(options["statement_timeout_ms"]),
+                },
+                init=_init_replica_conn if replica else _init_conn,
+                connection_class=queries.RegistryConnection
+            )
+            return InstrumentedPool(pool, name=label, acquire_timeout_s=settings.DB_POOL_ACQUIRE_TIMEOUT)
         except Exception as e:
             last_err = e
-            logger.warning(f"Postgres not ready yet ({i+1}/{attempts}): {e}")
+            logger.warning(f"Postgres ({label}) not ready yet ({i+1}/{attempts}): {e}")
             await asyncio.sleep(delay_s)
     raise RuntimeError(f"Could not connect to Postgres after {attempts} attempts: {last_err}")
 
-async def _ensure_schema(pool: asyncpg.Pool) -> None:
-    sql_text = SCHEMA_PATH.read_text(encoding="utf-8")
-    statements = _split_sql_statements(sql_text)
+async def _ensure_schema(pool: InstrumentedPool) -> None:
+    """Applies pending migrations (see migrate.py); only one process does so at a time."""
+    await migrate.migrate(pool)
 
-    async with pool.acquire() as conn:
-        reg = await conn.fetchval("SELECT to_regclass('public.app_schema')")
-        if reg is not None:
-            current = await conn.fetchval("SELECT MAX(version) FROM app_schema")
-            if current is not None and int(current) >= SCHEMA_VERSION:
-                logger.info(f"Schema already applied (version {current}). Skipping.")
-                return
-
-        logger.info("Applying schema.sql ...")
-        async with conn.transaction():
-            for stmt in statements:
-                await conn.execute(stmt)
-
-    logger.info("Schema applied successfully.")
-
-async def init_db() -> asyncpg.Pool:
+async def init_db(name: str = OLTP) -> InstrumentedPool:
     """
-    Called once at startup.
-    Creates a pool and applies schema.sql once (via app_schema marker).
+    Returns the named pool ("oltp" for auth/CRUD, "vector" for embeddings), creating it
+    on first use. The first pool created also applies pending schema migrations.
     """
-    global _pool
-    if _pool is not None:
-        return _pool
-    if not getattr(settings, 'DATABASE_URL', None):
-        raise RuntimeError('DATABASE_URL is missing. Set it in .env/docker-compose')
-    _pool = await _create_pool_with_retry(settings.DATABASE_URL)
-    await _ensure_schema(_pool)
-    return _pool
+    global _schema_ready
+    pool = _pools.get(name)
+    if pool is not None:
+        return pool
+    async with _lock:
+        # Another caller may have created it while we waited for the lock
+        pool = _pools.get(name)
+        if pool is not None:
+            return pool
+        if not getattr(settings, 'DATABASE_URL', None):
+            raise RuntimeError('DATABASE_URL is missing. Set it in .env/docker-compose')
+        pool = await _create_pool_with_retry(settings.DATABASE_URL, name)
+        if not _schema_ready:
+            try:
+                await _ensure_schema(pool)
+            except Exception:
+                await pool.close()
+                raise
+            _schema_ready = True
+        _pools[name] = pool
+        return pool
+
+async def open_pools() -> None:
+    """Called at startup: creates every pool, and with it its min_size connections (asyncpg opens them eagerly)."""
+    for name in (OLTP, VECTOR):
+        await init_db(name)
 
 async def close_db() -> None:
-    global _pool
-    if _pool is not None:
-        await _pool.close()
-        _pool = None
\ No newline at end of file
+    global _schema_ready
+    async with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        _schema_ready = False
+    for pool in pools:
+        await pool.close()
@@ -0,0 +1,149 @@
+"""
+Versioned schema migrations.
+
+schema.sql is the baseline (version 9, idempotent). Every later change is one file in
+migrations/ named NNNN_description.sql, applied once in version order and recorded
+in app_schema. Startup only compares MAX(app_schema.version) with the newest file; the
+SQL is read only when something is pending.
+
+Only one process migrates at a time: the runner holds a Postgres advisory lock, and
+processes that waited for it re-check the version before doing anything. Waiting
+processes poll with pg_try_advisory_lock rather than block in pg_advisory_lock: a
+blocked statement keeps its snapshot open, and CREATE INDEX CONCURRENTLY in the runner
+waits for every open snapshot, so the two would deadlock.
+
+A migration runs in a single transaction unless its first line is
+
+    -- migrate: no-transaction
+
+in which case its statements (separated by ';' at the end of a line, no $$ bodies) run
+one by one outside a transaction, as CREATE/DROP INDEX CONCURRENTLY requires. Such a
+migration is recorded only after its last statement succeeds, so every statement must
+be safe to re-run. A failed CREATE INDEX CONCURRENTLY leaves an INVALID index that
+IF NOT EXISTS would keep, so precede it with DROP INDEX CONCURRENTLY IF EXISTS.
+"""
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+BASELINE_PATH = Path(__file__).with_name("schema.sql")
+BASELINE_VERSION = 9
+MIGRATIONS_DIR = Path(__file__).with_name("migrations")
+NO_TRANSACTION = "-- migrate: no-transaction"
+# Any constant shared by every process; "fw" "mi" in ASCII
+LOCK_KEY = 0x66776D69
+# Seconds between attempts to take the lock while another process migrates
+LOCK_RETRY_INTERVAL = 0.5
+
+_FILENAME = re.compile(r"^(\d{4})_(\w+)\.sql$")
+_STATEMENT_END = re.compile(r";[ \t]*$", re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: Path
+
+    def read(self) -> str:
+        return self.path.read_text(encoding="utf-8")
+
+
+def discover(directory: Path | None = None) -> list[Migration]:
+    """All migration files, sorted by version. Raises ValueError on bad or duplicate versions."""
+    directory = directory or MIGRATIONS_DIR
+    migrations: dict[int, Migration] = {}
+    for path in sorted(directory.glob("*.sql")):
+        match = _FILENAME.match(path.name)
+        if match is None:
+            raise ValueError(f"Bad migration file name: {path.name} (expected NNNN_description.sql)")
+        version = int(match.group(1))
+        if version <= BASELINE_VERSION:
+            raise ValueError(f"{path.name}: versions up to {BASELINE_VERSION} belong to schema.sql")
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {path.name}")
+        migrations[version] = Migration(version, match.group(2), path)
+    return [migrations[v] for v in sorted(migrations)]
+
+
+def latest_version(migrations: list[Migration]) -> int:
+    return migrations[-1].version if migrations else BASELINE_VERSION
+
+
+def split_statements(sql: str) -> list[str]:
+    """Statements of a no-transaction migration: comment lines dropped, split on trailing ';'."""
+    body = "\n".join(
+        line for line in sql.splitlines()
+        if line.strip() and not line.strip().startswith("--")
+    )
+    return [stmt.strip() for stmt in _STATEMENT_END.split(body) if stmt.strip()]
+
+
+async def current_version(conn: Any) -> int:
+    if await conn.fetchval("SELECT to_regclass('public.app_schema')") is None:
+        return 0
+    return int(await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM app_schema"))
+
+
+async def _apply(conn: Any, migration: Migration) -> None:
+    sql = migration.read()
+    logger.info(f"Applying migration {migration.version} ({migration.name}) ...")
+    record = "INSERT INTO app_schema(version, name) VALUES ($1, $2) ON CONFLICT (version) DO NOTHING"
+    if sql.lstrip().startswith(NO_TRANSACTION):
+        for stmt in split_statements(sql):
+            await conn.execute(stmt)
+        await conn.execute(record, migration.version, migration.name)
+    else:
+        async with conn.transaction():
+            # Simple query protocol: the whole file at once, $$ bodies included
+            await conn.execute(sql)
+            await conn.execute(record, migration.version, migration.name)
+
+
+async def _lock(conn: Any) -> None:
+    """Take the migration lock, with no statement left open while waiting for it."""
+    waiting = False
+    while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", LOCK_KEY):
+        if not waiting:
+            logger.info("Another process is migrating, waiting for it ...")
+            waiting = True
+        await asyncio.sleep(LOCK_RETRY_INTERVAL)
+
+
+async def migrate(pool: Any, directory: Path | None = None) -> int:
+    """Bring the database to the newest version. Returns the resulting version."""
+    migrations = discover(directory)
+    target = latest_version(migrations)
+
+    async with pool.acquire() as conn:
+        current = await current_version(conn)
+        if current >= target:
+            logger.info(f"Schema up to date (version {current}).")
+            return current
+
+        # Index builds may exceed the pool's timeout
+        await conn.execute("SET statement_timeout = 0")
+        await _lock(conn)
+        try:
+            # Another process may have migrated while we waited for the lock
+            current = await current_version(conn)
+            if current < BASELINE_VERSION:
+                logger.info("Applying baseline schema.sql ...")
+                async with conn.transaction():
+                    await conn.execute(BASELINE_PATH.read_text(encoding="utf-8"))
+                current = BASELINE_VERSION
+            for migration in migrations:
+                if migration.version > current:
+                    await _apply(conn, migration)
+                    current = migration.version
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", LOCK_KEY)
+            await conn.execute("RESET statement_timeout")
+
+    logger.info(f"Schema migrated to version {current}.")
+    return current
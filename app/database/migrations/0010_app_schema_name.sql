@@ -0,0 +1,4 @@
+-- Record which migration file produced each version
+ALTER TABLE app_schema ADD COLUMN IF NOT EXISTS name TEXT;
+
+UPDATE app_schema SET name = 'schema.sql' WHERE name IS NULL;
@@ -0,0 +1,3 @@
+-- Keyset pagination orders characters by (created_at, id).
+-- now() is evaluated once, so existing rows share the migration time and id breaks the tie.
+ALTER TABLE characters ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
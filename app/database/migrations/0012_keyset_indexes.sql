@@ -0,0 +1,9 @@
+-- migrate: no-transaction
+-- Indexes behind keyset pagination of GET /api/characters and /admin/clients
+DROP INDEX CONCURRENTLY IF EXISTS idx_characters_client_created;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_characters_client_created
+    ON characters (client_id, created_at, id)
+    WHERE deleted_at IS NULL;
+DROP INDEX CONCURRENTLY IF EXISTS idx_clients_created;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_created
+    ON clients (created_at, id);
@@ -0,0 +1,7 @@
+-- characters.ttl (seconds) becomes an absolute expiry, set whenever ttl is written.
+-- Rows that predate created_at count their TTL from when 0011 ran.
+ALTER TABLE characters ADD COLUMN IF NOT EXISTS expires_at TIMESTAMPTZ;
+UPDATE characters
+SET expires_at = created_at + ttl * INTERVAL '1 second'
+WHERE ttl IS NOT NULL
+    AND expires_at IS NULL;
@@ -0,0 +1,6 @@
+-- migrate: no-transaction
+-- Expiry sweeper: only live characters with a TTL are indexed
+DROP INDEX CONCURRENTLY IF EXISTS idx_characters_expires;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_characters_expires
+    ON characters (expires_at)
+    WHERE deleted_at IS NULL AND expires_at IS NOT NULL;
@@ -0,0 +1,30 @@
+-- Destination of the purge job in PURGE_MODE=archive (see app/database/purge.py).
+-- Rows are kept as JSONB so later column changes never break archiving.
+CREATE TABLE IF NOT EXISTS clients_archive (
+    id          UUID PRIMARY KEY,
+    client_id   UUID NOT NULL,
+    deleted_at  TIMESTAMPTZ,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    data        JSONB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS characters_archive (
+    id          UUID PRIMARY KEY,
+    client_id   UUID NOT NULL,
+    deleted_at  TIMESTAMPTZ,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    data        JSONB NOT NULL
+);
+
+-- Without the vector itself: it can be recomputed from content
+CREATE TABLE IF NOT EXISTS embeddings_archive (
+    id          UUID PRIMARY KEY,
+    client_id   UUID NOT NULL,
+    deleted_at  TIMESTAMPTZ,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    data        JSONB NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_clients_archive_archived_at ON clients_archive (archived_at);
+CREATE INDEX IF NOT EXISTS idx_characters_archive_client_id ON characters_archive (client_id);
+CREATE INDEX IF NOT EXISTS idx_embeddings_archive_client_id ON embeddings_archive (client_id);
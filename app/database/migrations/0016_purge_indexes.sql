@@ -0,0 +1,17 @@
+-- migrate: no-transaction
+-- Purge job: find rows soft deleted before the cutoff, and the embeddings that belong to them.
+-- embeddings.client_id also backs the ON DELETE CASCADE from clients.
+DROP INDEX CONCURRENTLY IF EXISTS idx_clients_deleted_at;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clients_deleted_at
+    ON clients (deleted_at)
+    WHERE deleted_at IS NOT NULL;
+DROP INDEX CONCURRENTLY IF EXISTS idx_characters_deleted_at;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_characters_deleted_at
+    ON characters (deleted_at)
+    WHERE deleted_at IS NOT NULL;
+DROP INDEX CONCURRENTLY IF EXISTS idx_embeddings_client_id;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_embeddings_client_id
+    ON embeddings (client_id);
+DROP INDEX CONCURRENTLY IF EXISTS idx_embeddings_character_id;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_embeddings_character_id
+    ON embeddings ((metadata->>'character_id'));
@@ -0,0 +1,24 @@
+-- Durable chat history (app/chat/archive.py). Redis only holds live conversations;
+-- their messages are written behind here and read back when a conversation resumes.
+-- seq numbers a conversation's messages from 1, so replaying a batch is a no-op.
+-- Hash partitioned by client: every partition and its primary key index stay small,
+-- and a conversation lookup touches one partition.
+CREATE TABLE IF NOT EXISTS chat_messages (
+    client_id    UUID NOT NULL,
+    character_id UUID NOT NULL,
+    seq          INTEGER NOT NULL,
+    role         TEXT NOT NULL,
+    content      TEXT NOT NULL,
+    archived_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (client_id, character_id, seq)
+) PARTITION BY HASH (client_id);
+
+DO $$
+BEGIN
+    FOR i IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS chat_messages_p%s PARTITION OF chat_messages FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            lpad(i::text, 2, '0'), i
+        );
+    END LOOP;
+END $$;
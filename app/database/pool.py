@@ -0,0 +1,94 @@
+"""
+asyncpg pool wrapper that makes acquire() waits visible.
+
+Repositories keep using `async with pool.acquire() as conn`. On top of asyncpg the
+wrapper applies the acquire timeout from Settings and records how long callers waited
+and how many connections are busy, so saturation shows up in /admin/metrics instead
+of only as latency.
+"""
+import asyncio
+import logging
+import time
+from typing import Any
+import asyncpg
+from ..infrastructure import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PoolAcquireTimeout(Exception):
+    """No connection became free within the pool's acquire timeout."""
+
+
+class _Acquire:
+    __slots__ = ("_pool", "_conn")
+
+    def __init__(self, pool: "InstrumentedPool"):
+        self._pool = pool
+        self._conn: asyncpg.Connection | None = None
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        self._conn = await self._pool._acquire()
+        return self._conn
+
+    async def __aexit__(self, *exc: Any) -> None:
+        conn, self._conn = self._conn, None
+        await self._pool._release(conn)
+
+
+class InstrumentedPool:
+    def __init__(self, pool: asyncpg.Pool, *, name: str, acquire_timeout_s: float):
+        self.pool = pool
+        self.name = name
+        self.acquire_timeout_s = acquire_timeout_s
+        self._in_use = 0
+        self._waiting = 0
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    def acquire(self) -> _Acquire:
+        return _Acquire(self)
+
+    async def _acquire(self) -> asyncpg.Connection:
+        started = time.perf_counter()
+        self._waiting += 1
+        self._publish()
+        try:
+            conn = await self.pool.acquire(timeout=self.acquire_timeout_s)
+        except BaseException as e:
+            self._waiting -= 1
+            self._publish()
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.incr("db_pool_acquire_timeouts", pool=self.name)
+                logger.error(f"Timed out after {self.acquire_timeout_s}s waiting for a '{self.name}' connection")
+                raise PoolAcquireTimeout(f"no '{self.name}' connection available") from None
+            raise
+        finally:
+            metrics.observe("db_pool_wait", time.perf_counter() - started, pool=self.name)
+        self._waiting -= 1
+        self._in_use += 1
+        self._publish()
+        return conn
+
+    async def _release(self, conn: asyncpg.Connection) -> None:
+        self._in_use -= 1
+        try:
+            await self.pool.release(conn)
+        finally:
+            self._publish()
+
+    def _publish(self) -> None:
+        max_size = self.pool.get_max_size()
+        metrics.gauge_set("db_pool_in_use", self._in_use, pool=self.name)
+        metrics.gauge_set("db_pool_waiting", self._waiting, pool=self.name)
+        metrics.gauge_set("db_pool_size", self.pool.get_size(), pool=self.name)
+        metrics.gauge_set("db_pool_saturation", self._in_use / max_size if max_size else 0.0, pool=self.name)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    def __getattr__(self, attr: str) -> Any:
+        # Everything else (get_size, expire_connections, ...) is plain asyncpg
+        return getattr(self.pool, attr)
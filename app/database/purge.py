@@ -0,0 +1,194 @@
+"""
+Archival and hard purge of soft-deleted rows.
+
+Clients and characters soft deleted more than PURGE_RETENTION_DAYS ago leave the live
+tables, either into clients_archive/characters_archive/embeddings_archive
+(PURGE_MODE=archive) or for good (PURGE_MODE=delete). PURGE_MODE=off disables the job.
+
+Children go before their parents so no statement depends on a cascade:
+the embeddings of a character (entity_id or metadata.character_id) before the
+character, and the embeddings and characters of a client before the client
+(characters -> clients is ON DELETE RESTRICT). With PURGE_MODE=delete their archived
+chat history (chat_messages) is deleted first as well; archive mode keeps it, since it
+is an archive already. Every statement moves at most
+PURGE_BATCH_SIZE rows in its own short transaction, so an interrupted pass simply
+continues with the next one. One process purges at a time (advisory lock).
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from config import settings
+from ..infrastructure import metrics
+from .init import init_db
+
+logger = logging.getLogger(__name__)
+
+MODES = ("archive", "delete")
+# Any constant shared by every process; "fw" "pu" in ASCII
+LOCK_KEY = 0x66777075
+
+# Archived JSON of each table; credentials and vectors are not kept
+_ARCHIVED_ROW = {
+    "clients": "to_jsonb(gone) - 'password' - 'api_key' - 'api_key_hash'",
+    "characters": "to_jsonb(gone)",
+    "embeddings": "to_jsonb(gone) - 'embedding'",
+}
+# Columns identifying a row, for tables without an id
+_ROW_KEYS = {"chat_messages": ("client_id", "character_id", "seq")}
+
+
+def move_sql(table: str, where: str, *, archive: bool) -> str:
+    """
+    One batch: delete up to $1 rows of `table` matching `where` (which uses $2...) and,
+    when archiving, copy them to {table}_archive in the same statement. Returns the count.
+    """
+    archived = (
+        f""",
+        archived AS (
+            INSERT INTO {table}_archive (id, client_id, deleted_at, data)
+            SELECT id, {'id' if table == 'clients' else 'client_id'}, deleted_at, {_ARCHIVED_ROW[table]}
+            FROM gone
+        )"""
+        if archive else ""
+    )
+    row_key = _ROW_KEYS.get(table, ("id",))
+    return f"""
+        WITH doomed AS (
+            SELECT {', '.join(row_key)} FROM {table}
+            WHERE {where}
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        ),
+        gone AS (
+            DELETE FROM {table} AS t
+            USING doomed
+            WHERE {' AND '.join(f't.{column} = doomed.{column}' for column in row_key)}
+            RETURNING t.*
+        ){archived}
+        SELECT count(*) FROM gone
+    """
+
+
+class Purger:
+    def __init__(self, conn: Any, *, mode: str, batch_size: int):
+        self.conn = conn
+        self.archive = mode == "archive"
+        self.mode = mode
+        self.batch_size = batch_size
+
+    async def _drain(self, table: str, where: str, *args: Any) -> int:
+        """Move matching rows batch by batch until none are left."""
+        sql = move_sql(table, where, archive=self.archive)
+        total = 0
+        while True:
+            async with self.conn.transaction():
+                moved = await self.conn.fetchval(sql, self.batch_size, *args)
+            total += moved
+            if moved:
+                metrics.incr("rows_purged", moved, table=table, mode=self.mode)
+            if moved < self.batch_size:
+                return total
+
+    async def characters(self, cutoff: datetime) -> int:
+        """Characters soft deleted before `cutoff`, with their embeddings (and chats). Returns how many."""
+        total = 0
+        while True:
+            rows = await self.conn.fetch(
+                """
+                SELECT id, client_id
+                FROM characters
+                WHERE deleted_at < $1
+                ORDER BY deleted_at
+                LIMIT $2
+                """,
+                cutoff, self.batch_size
+            )
+            if not rows:
+                return total
+            ids = [r["id"] for r in rows]
+            if not self.archive:
+                await self._drain(
+                    "chat_messages",
+                    "client_id = ANY($2::uuid[]) AND character_id = ANY($3::uuid[])",
+                    list({r["client_id"] for r in rows}), ids
+                )
+            await self._drain(
+                "embeddings",
+                "client_id = ANY($2::uuid[]) AND (entity_id = ANY($3::uuid[]) OR metadata->>'character_id' = ANY($4::text[]))",
+                list({r["client_id"] for r in rows}), ids, [str(i) for i in ids]
+            )
+            total += await self._drain("characters", "id = ANY($2::uuid[])", ids)
+            if len(rows) < self.batch_size:
+                return total
+
+    async def clients(self, cutoff: datetime) -> int:
+        """Clients soft deleted before `cutoff`, with all their characters, embeddings (and chats)."""
+        total = 0
+        while True:
+            ids = [
+                r["id"] for r in await self.conn.fetch(
+                    """
+                    SELECT id
+                    FROM clients
+                    WHERE deleted_at < $1
+                    ORDER BY deleted_at
+                    LIMIT $2
+                    """,
+                    cutoff, self.batch_size
+                )
+            ]
+            if not ids:
+                return total
+            if not self.archive:
+                await self._drain("chat_messages", "client_id = ANY($2::uuid[])", ids)
+            await self._drain("embeddings", "client_id = ANY($2::uuid[])", ids)
+            await self._drain("characters", "client_id = ANY($2::uuid[])", ids)
+            total += await self._drain("clients", "id = ANY($2::uuid[])", ids)
+            if len(ids) < self.batch_size:
+                return total
+
+
+async def purge_soft_deleted(*, mode: str, retention_days: int, batch_size: int) -> dict[str, int] | None:
+    """
+    One purge pass. Returns the number of characters and clients purged, or None when
+    another process holds the purge lock.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown purge mode {mode!r} (expected one of {', '.join(MODES)})")
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    pool = await init_db()
+    async with pool.acquire() as conn:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", LOCK_KEY):
+            return None
+        try:
+            purger = Purger(conn, mode=mode, batch_size=batch_size)
+            result = {
+                "characters": await purger.characters(cutoff),
+                "clients": await purger.clients(cutoff),
+            }
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", LOCK_KEY)
+    if any(result.values()):
+        logger.info(f"Purged soft-deleted rows older than {retention_days} days ({mode}): {result}")
+    return result
+
+async def run_purge() -> None:
+    """Long-running task (started in the app lifespan). Returns at once with PURGE_MODE=off."""
+    if settings.PURGE_MODE == "off":
+        return
+    while True:
+        try:
+            await purge_soft_deleted(
+                mode=settings.PURGE_MODE,
+                retention_days=settings.PURGE_RETENTION_DAYS,
+                batch_size=settings.PURGE_BATCH_SIZE
+            )
+        except asyncio.CancelledError:
+            raise
+        except ValueError as e:
+            logger.error(f"Purge job disabled: {e}")
+            return
+        except Exception as e:
+            logger.error(f"Purge of soft-deleted rows failed: {e}")
+        await asyncio.sleep(settings.PURGE_INTERVAL)
@@ -0,0 +1,68 @@
+"""
+Registry of hot repository statements, prepared once per connection.
+
+Repositories register their frequent queries by name at import time. Pool connections
+are RegistryConnection instances: the pool's init hook loads every registered statement
+(once the schema exists) into the connection's asyncpg statement cache, which
+fetch/fetchrow/fetchval below go through, so Postgres parses and plans each statement
+once per connection. The cache outlives pool acquisitions, unlike PreparedStatement
+handles, which asyncpg invalidates whenever the connection is released.
+
+When a schema change invalidates a cached statement, asyncpg prepares it again and
+retries once, but only outside a transaction: inside one the error has already aborted
+the transaction, so it is raised instead.
+Every call is timed as db_query{query=<name>} in /admin/metrics.
+"""
+import logging
+import time
+from typing import Any
+import asyncpg
+from ..infrastructure import metrics
+
+logger = logging.getLogger(__name__)
+
+QUERIES: dict[str, str] = {}
+
+
+def register(name: str, sql: str) -> str:
+    """Add a statement to the registry and return its name (use it as a module constant)."""
+    if QUERIES.get(name, sql) != sql:
+        raise ValueError(f"Query {name} is already registered with different SQL")
+    QUERIES[name] = sql
+    return name
+
+
+class RegistryConnection(asyncpg.Connection):
+    """asyncpg connection that can load statements into its statement cache ahead of use."""
+    async def prepare_cached(self, sql: str) -> None:
+        # Same cache (DB_STATEMENT_CACHE_SIZE) as fetch/fetchrow/fetchval use for `sql`
+        await self._prepare(sql, use_cache=True)
+
+
+async def prepare_all(conn: RegistryConnection) -> None:
+    """Pool init hook: prepare every registered statement on a new connection."""
+    for name, sql in QUERIES.items():
+        try:
+            await conn.prepare_cached(sql)
+            metrics.incr("db_statements_prepared", query=name)
+        except asyncpg.PostgresError as e:
+            # Prepared on first use instead
+            logger.warning(f"Could not prepare {name}: {e}")
+
+
+async def _run(conn: Any, method: str, name: str, args: tuple) -> Any:
+    started = time.perf_counter()
+    try:
+        return await getattr(conn, method)(QUERIES[name], *args)
+    finally:
+        metrics.observe("db_query", time.perf_counter() - started, query=name)
+
+
+async def fetch(conn: Any, name: str, *args: Any) -> list[asyncpg.Record]:
+    return await _run(conn, "fetch", name, args)
+
+async def fetchrow(conn: Any, name: str, *args: Any) -> asyncpg.Record | None:
+    return await _run(conn, "fetchrow", name, args)
+
+async def fetchval(conn: Any, name: str, *args: Any) -> Any:
+    return await _run(conn, "fetchval", name, args)
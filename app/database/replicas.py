@@ -0,0 +1,165 @@
+"""
+Read routing to Postgres streaming replicas.
+
+Read-only repository methods ask read_db() for a pool instead of init_db(). With
+DATABASE_REPLICA_URLS set, that is the pool of the least busy healthy replica;
+otherwise, or when no replica is healthy, it is the primary. A background task
+(run_health_checks, started in the app lifespan) marks replicas unhealthy when they
+are unreachable, not streaming from the primary, or lag more than
+DB_REPLICA_MAX_LAG_SECONDS behind.
+
+Read-your-writes: repositories call mark_write(scope) after changing a client's data,
+and reads for that scope go to the primary for DB_READ_YOUR_WRITES_SECONDS. The window
+is per process; wrap a block in primary_reads() to force primary reads explicitly.
+"""
+import asyncio
+import contextvars
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+from config import settings
+from ..infrastructure import metrics
+from .init import OLTP, _create_pool_with_retry, init_db
+from .pool import InstrumentedPool
+
+logger = logging.getLogger(__name__)
+
+# Scope used by admin-wide writes/listings (not tied to a single client)
+ADMIN_SCOPE = "admin"
+
+# Lag is 0 when the replica has replayed everything it received, so an idle primary
+# doesn't look like lag; NULL on a server that is not a standby. A standby whose WAL
+# receiver is not streaming has also replayed everything it received and would look
+# caught up while falling behind, so `streaming` is checked as well (reading the
+# receiver status needs pg_read_all_stats).
+LAG_SQL = """
+    SELECT
+        NOT pg_is_in_recovery()
+            OR EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') AS streaming,
+        CASE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END AS lag
+"""
+
+
+class _Replica:
+    def __init__(self, index: int, dsn: str):
+        self.label = f"replica{index}"
+        self.dsn = dsn
+        self.healthy = False  # until the first health check passes
+        self.lag_s: float | None = None
+        self.pools: dict[str, InstrumentedPool] = {}
+        self._lock = asyncio.Lock()
+
+    async def pool(self, name: str) -> InstrumentedPool:
+        pool = self.pools.get(name)
+        if pool is not None:
+            return pool
+        async with self._lock:
+            pool = self.pools.get(name)
+            if pool is None:
+                pool = await _create_pool_with_retry(self.dsn, name, attempts=1, delay_s=0, replica=self.label)
+                self.pools[name] = pool
+            return pool
+
+    def in_use(self, name: str) -> int:
+        pool = self.pools.get(name)
+        return pool.in_use if pool is not None else 0
+
+    async def close(self) -> None:
+        pools, self.pools = list(self.pools.values()), {}
+        for pool in pools:
+            await pool.close()
+
+
+def _parse_dsns(value: str) -> list[str]:
+    return [dsn.strip() for dsn in value.split(",") if dsn.strip()]
+
+_replicas: list[_Replica] = [_Replica(i, dsn) for i, dsn in enumerate(_parse_dsns(settings.DATABASE_REPLICA_URLS))]
+_rotation = itertools.count()
+# scope -> monotonic deadline until which its reads go to the primary
+_recent_writes: dict[str, float] = {}
+_force_primary: contextvars.ContextVar[bool] = contextvars.ContextVar("force_primary", default=False)
+
+
+def mark_write(scope: Any) -> None:
+    """Send reads for `scope` (usually a client id) to the primary for a while."""
+    now = time.monotonic()
+    if len(_recent_writes) >= 10000:
+        for key in [k for k, until in _recent_writes.items() if until <= now]:
+            del _recent_writes[key]
+    _recent_writes[str(scope)] = now + settings.DB_READ_YOUR_WRITES_SECONDS
+
+def _recently_written(scope: Any) -> bool:
+    if scope is None:
+        return False
+    until = _recent_writes.get(str(scope))
+    return until is not None and until > time.monotonic()
+
+@contextmanager
+def primary_reads() -> Iterator[None]:
+    """Every read_db() call inside the block returns the primary pool."""
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+async def read_db(name: str = OLTP, *, scope: Any = None) -> InstrumentedPool:
+    """Pool for a read-only query: a healthy replica when possible, the primary otherwise."""
+    if _replicas and not _force_primary.get() and not _recently_written(scope):
+        healthy = [r for r in _replicas if r.healthy]
+        if healthy:
+            # Least busy replica; rotating the start spreads ties round-robin
+            start = next(_rotation) % len(healthy)
+            candidates = healthy[start:] + healthy[:start]
+            replica = min(candidates, key=lambda r: r.in_use(name))
+            try:
+                pool = await replica.pool(name)
+                metrics.incr("db_reads", target="replica")
+                return pool
+            except Exception as e:
+                replica.healthy = False
+                logger.error(f"Replica {replica.label} unavailable, reading from primary: {e}")
+    metrics.incr("db_reads", target="primary")
+    return await init_db(name)
+
+
+async def _check(replica: _Replica) -> None:
+    try:
+        pool = await replica.pool(OLTP)
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(LAG_SQL, timeout=settings.DB_POOL_ACQUIRE_TIMEOUT)
+        replica.lag_s = float(row["lag"]) if row["lag"] is not None else 0.0
+        healthy = row["streaming"] and replica.lag_s <= settings.DB_REPLICA_MAX_LAG_SECONDS
+        if not row["streaming"]:
+            logger.warning(f"{replica.label} is not streaming from the primary")
+    except Exception as e:
+        logger.warning(f"Health check failed for {replica.label}: {e}")
+        healthy = False
+    if healthy != replica.healthy:
+        logger.warning(f"{replica.label} is now {'healthy' if healthy else 'unhealthy'} (lag {replica.lag_s})")
+    replica.healthy = healthy
+    metrics.gauge_set("db_replica_healthy", int(healthy), replica=replica.label)
+    if replica.lag_s is not None:
+        metrics.gauge_set("db_replica_lag_seconds", replica.lag_s, replica=replica.label)
+
+async def check_replicas() -> None:
+    await asyncio.gather(*(_check(replica) for replica in _replicas))
+
+async def run_health_checks() -> None:
+    """Long-running task (started in the app lifespan). Returns at once without replicas."""
+    if not _replicas:
+        return
+    while True:
+        await check_replicas()
+        await asyncio.sleep(settings.DB_REPLICA_HEALTH_INTERVAL)
+
+async def close_replicas() -> None:
+    for replica in _replicas:
+        replica.healthy = False
+        await replica.close()
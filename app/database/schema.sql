@@ -1,3 +1,6 @@
+-- Baseline schema (version 9), applied as a whole to databases older than that.
+-- Do not change it: schema changes go in app/database/migrations/ (see migrate.py).
+
 
 CREATE EXTENSION IF NOT EXISTS pgcrypto;
 CREATE EXTENSION IF NOT EXISTS vector;
@@ -12,7 +15,8 @@ CREATE TABLE IF NOT EXISTS clients (
     id              UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     email           TEXT NOT NULL,
     password        TEXT NOT NULL,
-    api_key         TEXT NOT NULL,
+    api_key         TEXT,
+    api_key_hash    TEXT,
     created_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
     deleted_at      TIMESTAMPTZ,
     is_active       BOOLEAN NOT NULL DEFAULT TRUE,
@@ -29,6 +33,27 @@ CREATE UNIQUE INDEX IF NOT EXISTS idx_clients_email_active
 ON clients (email)
 WHERE deleted_at IS NULL;
 
+-- v7: API keys are looked up by SHA-256 digest; plaintext keys are no longer stored
+ALTER TABLE clients
+ADD COLUMN IF NOT EXISTS api_key_hash TEXT;
+
+ALTER TABLE clients
+ALTER COLUMN api_key DROP NOT NULL;
+
+UPDATE clients
+SET api_key_hash = encode(digest(api_key, 'sha256'), 'hex')
+WHERE api_key_hash IS NULL
+  AND api_key IS NOT NULL;
+
+UPDATE clients
+SET api_key = NULL
+WHERE api_key IS NOT NULL
+  AND api_key_hash IS NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_clients_api_key_hash_active
+ON clients (api_key_hash)
+WHERE deleted_at IS NULL;
+
 CREATE TABLE IF NOT EXISTS characters (
     id          UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     client_id   UUID NOT NULL REFERENCES clients(id) ON DELETE RESTRICT,
@@ -61,5 +86,30 @@ CREATE INDEX IF NOT EXISTS idx_embeddings_embedding_hnsw
     USING hnsw (embedding vector_cosine_ops)
     WHERE deleted_at IS NULL;
 
-INSERT INTO app_schema(version) VALUES (6)
+-- v8: per-subscription limits (cached in-process by app/clients/tiers.py)
+CREATE TABLE IF NOT EXISTS subscription_tiers (
+    name                TEXT PRIMARY KEY,
+    request_limit       INTEGER NOT NULL,
+    window_seconds      INTEGER NOT NULL,
+    max_concurrent_llm  INTEGER NOT NULL
+);
+
+INSERT INTO subscription_tiers (name, request_limit, window_seconds, max_concurrent_llm)
+VALUES ('free', 300, 60, 2),
+       ('pro', 1200, 60, 10),
+       ('enterprise', 6000, 60, 50)
+ON CONFLICT (name) DO NOTHING;
+
+-- v9: weight of each tier in the fair LLM scheduler
+ALTER TABLE subscription_tiers ADD COLUMN IF NOT EXISTS llm_weight INTEGER;
+
+UPDATE subscription_tiers
+SET llm_weight = CASE name WHEN 'pro' THEN 4 WHEN 'enterprise' THEN 10 ELSE 1 END
+WHERE llm_weight IS NULL;
+
+ALTER TABLE subscription_tiers
+    ALTER COLUMN llm_weight SET DEFAULT 1,
+    ALTER COLUMN llm_weight SET NOT NULL;
+
+INSERT INTO app_schema(version) VALUES (9)
 ON CONFLICT (version) DO NOTHING;
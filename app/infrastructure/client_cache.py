@@ -0,0 +1,148 @@
+"""
+Opt-in client-side caching of hot, read-mostly Redis keys (REDIS_CLIENT_CACHE).
+
+Values of keys under the configured prefixes are kept in process memory after the
+first read, so repeated reads cost no round trip. Redis keeps them coherent through
+server-assisted tracking: a dedicated connection turns on CLIENT TRACKING in BCAST
+mode for the prefixes, redirected to a pub/sub connection subscribed to
+__redis__:invalidate, so any write to such a key from any process (SET, DEL, EXPIRE,
+expiry, eviction, FLUSHALL) drops it here.
+
+Both dedicated connections speak RESP2: redis-py's asyncio client has no hook for RESP3
+invalidation pushes, while a RESP2 redirect target receives them as ordinary pub/sub
+messages. Reads go straight to Redis whenever tracking is not confirmed (disabled,
+starting up, reconnecting), the cache is emptied whenever the listener loses Redis,
+and the tracking state is re-checked every VERIFY_INTERVAL seconds. Entries also expire
+after `ttl` seconds, which bounds staleness if everything else fails.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Iterable, Optional
+from redis.asyncio import Redis
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+VERIFY_INTERVAL = 1.0
+
+
+class ClientCache:
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        connect: Callable[[], Awaitable[Redis]],
+        enabled: bool,
+        prefixes: Iterable[str],
+        max_keys: int,
+        ttl: float
+    ):
+        self.redis = redis
+        self.connect = connect
+        self.enabled = enabled
+        self.prefixes = tuple(prefixes)
+        self.max_keys = max_keys
+        self.ttl = ttl
+        # key -> (expires_at, value). Insertion order doubles as eviction order.
+        self._values: dict[str, tuple[float, Any]] = {}
+        self._active = False
+        # Bumped by every invalidation so a GET that was in flight meanwhile is not cached
+        self._generation = 0
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    def _cacheable(self, key: str) -> bool:
+        return self._active and key.startswith(self.prefixes)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """GET through the cache; a plain Redis GET for other keys or while tracking is off."""
+        if not self._cacheable(key):
+            return await self.redis.get(key)
+        entry = self._values.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                metrics.incr("redis_client_cache", result="hit")
+                return entry[1]
+            del self._values[key]
+        metrics.incr("redis_client_cache", result="miss")
+        generation = self._generation
+        value = await self.redis.get(key)
+        if self._active and generation == self._generation:
+            self._put(key, value)
+        return value
+
+    def _put(self, key: str, value: Any) -> None:
+        self._values.pop(key, None)
+        while len(self._values) >= self.max_keys:
+            del self._values[next(iter(self._values))]
+        self._values[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, keys: Optional[Iterable[str]]) -> None:
+        """Drop `keys`, or everything for None (what Redis sends on FLUSHALL/FLUSHDB)."""
+        self._generation += 1
+        if keys is None:
+            self._values.clear()
+            return
+        for key in keys:
+            self._values.pop(key, None)
+
+    def _deactivate(self) -> None:
+        self._active = False
+        self._generation += 1
+        self._values.clear()
+
+    async def run(self) -> None:
+        """Long-running task (started in the app lifespan). Returns at once when disabled."""
+        if not self.enabled or not self.prefixes:
+            return
+        while True:
+            try:
+                await self._track()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis client cache stopped, reading through until it reconnects: {e}")
+            finally:
+                self._deactivate()
+            await asyncio.sleep(1.0)
+
+    async def _track(self) -> None:
+        listener, tracker = await self.connect(), await self.connect()
+        pubsub = listener.pubsub()
+        try:
+            await pubsub.connect()
+            await pubsub.connection.send_command("CLIENT", "ID")
+            listener_id = int(await pubsub.connection.read_response())
+            await pubsub.subscribe(INVALIDATE_CHANNEL)
+            prefixes = [arg for prefix in self.prefixes for arg in ("PREFIX", prefix)]
+            await tracker.execute_command("CLIENT", "TRACKING", "ON", "REDIRECT", listener_id, "BCAST", *prefixes)
+            self._values.clear()
+            self._active = True
+            logger.info(f"Redis client cache tracking {', '.join(self.prefixes)}")
+            next_check = time.monotonic() + VERIFY_INTERVAL
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=VERIFY_INTERVAL)
+                if message is not None and message["type"] == "message":
+                    self.invalidate(message["data"])
+                if time.monotonic() >= next_check:
+                    await self._verify(tracker, listener_id)
+                    next_check = time.monotonic() + VERIFY_INTERVAL
+        finally:
+            await pubsub.aclose()
+            await tracker.aclose()
+            await listener.aclose()
+
+    async def _verify(self, tracker: Redis, listener_id: int) -> None:
+        """
+        Raises if Redis no longer sends us invalidations, e.g. because the tracker or the
+        listener was reconnected behind our back.
+        """
+        reply = await tracker.execute_command("CLIENT", "TRACKINGINFO")
+        info = dict(zip(reply[::2], reply[1::2]))
+        flags = set(info.get("flags") or ())
+        if "on" not in flags or "broken_redirect" in flags or int(info.get("redirect", -1)) != listener_id:
+            raise ConnectionError(f"tracking no longer active ({info})")
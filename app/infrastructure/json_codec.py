@@ -0,0 +1,74 @@
+"""
+JSON encoding for the hot paths: chat history entries in Redis, json/jsonb columns
+(asyncpg codecs, see database/init.py) and HTTP responses (FastJSONResponse).
+
+JSON_BACKEND selects the implementation: "orjson" (default, several times faster) or
+"stdlib" (the json module). Both write compact UTF-8 JSON, convert datetimes, UUIDs,
+Decimals and numpy values the same way, and read what the other one wrote.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable
+from uuid import UUID
+import orjson
+from fastapi.responses import JSONResponse
+from config import settings
+
+BACKENDS = ("orjson", "stdlib")
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if hasattr(value, "tolist"):  # numpy arrays and scalars
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _orjson_dumpb(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+def _orjson_dumps(obj: Any) -> str:
+    return _orjson_dumpb(obj).decode("utf-8")
+
+def _stdlib_dumps(obj: Any) -> str:
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":"))
+
+def _stdlib_dumpb(obj: Any) -> bytes:
+    return _stdlib_dumps(obj).encode("utf-8")
+
+
+_dumps: Callable[[Any], str]
+_dumpb: Callable[[Any], bytes]
+_loads: Callable[[str | bytes], Any]
+
+def use_backend(name: str) -> None:
+    """Switch the implementation at runtime (also used by tests and benchmarks)."""
+    global _dumps, _dumpb, _loads
+    if name == "orjson":
+        _dumps, _dumpb, _loads = _orjson_dumps, _orjson_dumpb, orjson.loads
+    elif name == "stdlib":
+        _dumps, _dumpb, _loads = _stdlib_dumps, _stdlib_dumpb, json.loads
+    else:
+        raise ValueError(f"Unknown JSON backend {name!r} (expected one of {', '.join(BACKENDS)})")
+
+use_backend(settings.JSON_BACKEND)
+
+
+def dumps(obj: Any) -> str:
+    return _dumps(obj)
+
+def dumpb(obj: Any) -> bytes:
+    return _dumpb(obj)
+
+def loads(data: str | bytes) -> Any:
+    return _loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class of the app: JSONResponse rendered with the selected backend."""
+    def render(self, content: Any) -> bytes:
+        return dumpb(content)
@@ -0,0 +1,116 @@
+"""
+Non-blocking logging pipeline.
+
+Loggers only put records on an in-memory queue (QueueHandler). A QueueListener thread
+formats them and writes to stderr and the log file, so neither JSON encoding nor disk
+I/O runs on the event loop. High-volume messages can be sampled at the call site with
+`extra={"sample_rate": ...}`; levels can be set per module with LOG_LEVELS.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from config import settings
+from . import metrics
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sample_rate"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, any `extra` fields and the traceback."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a record with probability record.sample_rate (records without one are always kept)."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        if rate is None or rate >= 1:
+            return True
+        return rate > 0 and random.random() < rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Drops records when the queue is full instead of blocking the caller,
+    and leaves formatting to the listener thread.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render %-args now (they may be mutated later), but nothing else
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.incr("log_records_dropped")
+
+
+def parse_levels(spec: str) -> dict[str, str]:
+    """'app.chat=DEBUG,uvicorn.access=WARNING' -> {'app.chat': 'DEBUG', 'uvicorn.access': 'WARNING'}"""
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(log_dir: str) -> logging.handlers.QueueListener | None:
+    """
+    Route the root logger through a queue to stderr and `log_dir`/logfile.log.
+    Safe to call more than once: returns None if the root logger is already configured.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+
+    os.makedirs(log_dir, exist_ok=True)
+    if settings.LOG_FORMAT == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler(os.path.join(log_dir, "logfile.log"))
+    console_handler = logging.StreamHandler(sys.stderr)
+    file_handler.setFormatter(formatter)
+    console_handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    # Sample before enqueueing so dropped records cost nothing downstream
+    queue_handler.addFilter(SamplingFilter())
+
+    root.setLevel(settings.LOG_LEVEL.upper())
+    root.addHandler(queue_handler)
+    for name, level in parse_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(listener.stop)
+    return listener
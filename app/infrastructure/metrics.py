@@ -0,0 +1,66 @@
+"""
+Tiny in-process metrics registry (counters, gauges and timers).
+
+Thread-safe so worker pools can record from their threads. Values are per process
+and exposed through GET /admin/metrics.
+"""
+import threading
+from typing import Any
+
+_lock = threading.Lock()
+_counters: dict[str, float] = {}
+_gauges: dict[str, float] = {}
+# name -> [count, sum_seconds, max_seconds]
+_timers: dict[str, list[float]] = {}
+
+
+def _name(name: str, labels: dict[str, Any]) -> str:
+    if not labels:
+        return name
+    inner = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+    return f"{name}{{{inner}}}"
+
+def incr(name: str, value: float = 1, **labels: Any) -> None:
+    key = _name(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def gauge_add(name: str, delta: float, **labels: Any) -> None:
+    key = _name(name, labels)
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + delta
+
+def gauge_set(name: str, value: float, **labels: Any) -> None:
+    key = _name(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+def observe(name: str, seconds: float, **labels: Any) -> None:
+    key = _name(name, labels)
+    with _lock:
+        timer = _timers.setdefault(key, [0, 0.0, 0.0])
+        timer[0] += 1
+        timer[1] += seconds
+        timer[2] = max(timer[2], seconds)
+
+def snapshot() -> dict[str, Any]:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "timers_ms": {
+                k: {
+                    "count": int(c),
+                    "avg": round(s / c * 1000, 3) if c else 0.0,
+                    "max": round(m * 1000, 3),
+                    "total": round(s * 1000, 3),
+                }
+                for k, (c, s, m) in _timers.items()
+            },
+        }
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _timers.clear()
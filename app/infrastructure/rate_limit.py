@@ -0,0 +1,319 @@
+"""
+Sliding-window-log rate limiter evaluated atomically in Redis.
+
+One EVALSHA per request: expired entries are trimmed, the window is counted and,
+if there is room, the hit is recorded. Unlike the old fixed window (INCR + EXPIRE)
+this never lets 2x the limit through at a window boundary.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import time
+from dataclasses import dataclass
+from redis.asyncio import Redis
+from redis.asyncio.cluster import RedisCluster
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = limiter key
+# ARGV[1] = limit, ARGV[2] = window (microseconds), ARGV[3] = unique member for this hit
+# Returns {allowed (0/1), remaining, retry_after_ms}
+SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+if count >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    local retry = window
+    if oldest[2] then
+        retry = tonumber(oldest[2]) + window - now
+    end
+    return {0, 0, math.ceil(retry / 1000)}
+end
+redis.call('ZADD', key, now, ARGV[3])
+redis.call('PEXPIRE', key, math.ceil(window / 1000))
+return {1, limit - count - 1, 0}
+"""
+
+# Adds hits that were already admitted in process and reports the shared window.
+# KEYS[1] = limiter key; ARGV[1] = window (microseconds), ARGV[2] = hits, ARGV[3] = member prefix,
+# ARGV[4] = how long ago the hits were admitted (microseconds; hits already out of the window are dropped)
+# Returns {hits in the window, ms until its oldest hit leaves it}
+SLIDING_WINDOW_RECORD_LUA = """
+local key = KEYS[1]
+local window = tonumber(ARGV[1])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local stamp = now - tonumber(ARGV[4])
+if stamp > now - window then
+    for i = 1, tonumber(ARGV[2]) do
+        redis.call('ZADD', key, stamp, ARGV[3] .. i)
+    end
+    redis.call('PEXPIRE', key, math.ceil(window / 1000))
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+local expires = 0
+if oldest[2] then
+    expires = tonumber(oldest[2]) + window - now
+end
+return {redis.call('ZCARD', key), math.ceil(expires / 1000)}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    remaining: int
+    retry_after_ms: int
+
+
+class SlidingWindowLimiter:
+    def __init__(self, redis: Redis, *, limit: int, window_s: float):
+        self.limit = limit
+        self.window_s = window_s
+        self.redis = redis
+        self._script = redis.register_script(SLIDING_WINDOW_LUA)
+        self._record = redis.register_script(SLIDING_WINDOW_RECORD_LUA)
+        # Members only need to be unique within one key's window
+        self._prefix = f"{os.getpid()}-{os.urandom(4).hex()}-"
+        self._seq = itertools.count()
+
+    async def hit(self, key: str, *, limit: int | None = None, window_s: float | None = None) -> RateLimitResult:
+        """Record one request against `key` and report whether it is allowed."""
+        limit = self.limit if limit is None else limit
+        window_us = int((self.window_s if window_s is None else window_s) * 1_000_000)
+        allowed, remaining, retry_ms = await self._script(
+            keys=[key],
+            args=[limit, window_us, f"{self._prefix}{next(self._seq)}"]
+        )
+        return RateLimitResult(bool(allowed), int(remaining), int(retry_ms))
+
+    async def record(
+        self, key: str, hits: int, *, window_s: float | None = None, age_ms: int = 0, client=None
+    ):
+        """
+        Add `hits` requests admitted `age_ms` ago to `key` without checking the limit and
+        return (hits in the window, ms until the oldest leaves it). Pass a pipeline as
+        `client` to queue the call instead; the pair is then in the pipeline's results.
+        """
+        window_us = int((self.window_s if window_s is None else window_s) * 1_000_000)
+        return await self._record(
+            keys=[key],
+            args=[window_us, hits, f"{self._prefix}{next(self._seq)}-", age_ms * 1000],
+            client=client
+        )
+
+
+class LocalTokenBuckets:
+    """
+    Approximate per-key token buckets (capacity `limit`, refilled at limit/window per second).
+    Only sees this process' traffic, so it is the fallback, not the source of truth.
+    """
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # key -> [tokens, last_refill]; insertion order doubles as eviction order
+        self._buckets: dict[str, list[float]] = {}
+
+    def take(self, key: str, limit: int, window_s: float) -> RateLimitResult:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.pop(next(iter(self._buckets)))
+            bucket = self._buckets[key] = [float(limit), now]
+        rate = limit / window_s
+        bucket[0] = min(float(limit), bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if bucket[0] < 1.0:
+            return RateLimitResult(False, 0, int((1.0 - bucket[0]) / rate * 1000))
+        bucket[0] -= 1.0
+        return RateLimitResult(True, int(bucket[0]), 0)
+
+
+class HybridLimiter:
+    """
+    In-process admission backed by a Redis sliding window that is synced in the background.
+
+    hit() never waits on Redis. A request is admitted by the local token bucket of its key
+    unless the shared window, as last reported by Redis, is already full. Admitted hits are
+    queued and flush() replays them to Redis in one pipelined round trip, which returns each
+    key's shared count. A flush is started by hit() whenever none is in flight, so hits
+    arriving meanwhile batch up; run_sync() retries on a timer once Redis is back. When a
+    flush fails or takes longer than `timeout_s`, Redis is skipped for `cooldown_s` and the
+    local buckets alone decide, so a slow or dead Redis never adds latency to requests.
+
+    Between syncs other processes' hits are not seen: with P processes a key may briefly
+    exceed its limit by up to P-1 in-flight batches, bounded by `local_share` of the limit
+    per process (set it to 1/P for a strict cap).
+    """
+    def __init__(
+        self,
+        remote: SlidingWindowLimiter,
+        *,
+        timeout_s: float,
+        cooldown_s: float,
+        local_share: float = 1.0,
+        sync_interval_s: float = 1.0,
+        max_keys: int = 100_000
+    ):
+        self.remote = remote
+        self.limit = remote.limit
+        self.window_s = remote.window_s
+        self.timeout_s = timeout_s
+        self.cooldown_s = cooldown_s
+        # Fraction of the global limit one process may admit alone (e.g. 1/replicas)
+        self.local_share = local_share
+        self.sync_interval_s = sync_interval_s
+        self.max_keys = max_keys
+        self._local = LocalTokenBuckets(max_keys)
+        self._remote_down_until = 0.0
+        # (key, window_s) -> hits admitted here and not yet sent / sent but not yet counted
+        self._pending: dict[tuple[str, float], int] = {}
+        self._inflight: dict[tuple[str, float], int] = {}
+        # (key, window_s) -> monotonic time of its oldest hit not yet counted by Redis
+        self._unsynced_since: dict[tuple[str, float], float] = {}
+        # (key, window_s) -> [hits in the shared window at the last sync, monotonic time its oldest hit leaves]
+        self._shared: dict[tuple[str, float], list[float]] = {}
+        self._flushing: asyncio.Task | None = None
+
+    async def hit(self, key: str, *, limit: int | None = None, window_s: float | None = None) -> RateLimitResult:
+        limit = self.limit if limit is None else limit
+        window_s = self.window_s if window_s is None else window_s
+        pending_key = (key, window_s)
+        now = time.monotonic()
+        since = self._unsynced_since.get(pending_key)
+        if since is not None and now - since >= window_s:
+            # Not counted by Redis for a whole window (it is down): these hits have left it
+            self._pending.pop(pending_key, None)
+            self._inflight.pop(pending_key, None)
+            del self._unsynced_since[pending_key]
+            used = 0
+        else:
+            used = self._pending.get(pending_key, 0) + self._inflight.get(pending_key, 0)
+        shared = self._shared.get(pending_key)
+        if shared is not None and shared[1] <= now:
+            # Its oldest hit left the window: the count is stale until the next sync
+            del self._shared[pending_key]
+            shared = None
+        if shared is None:
+            # Hits admitted here but not yet counted by Redis still fill the window
+            if used >= limit:
+                return RateLimitResult(False, 0, max(1, int(window_s * 1000 / limit)))
+        elif shared[0] + used >= limit:
+            metrics.incr("rate_limit_shared_denials")
+            return RateLimitResult(False, 0, max(1, int((shared[1] - now) * 1000)))
+        local = self._local.take(key, max(1, int(limit * self.local_share)), window_s)
+        if local.allowed:
+            self._pending[pending_key] = min(limit, self._pending.get(pending_key, 0) + 1)
+            self._unsynced_since.setdefault(pending_key, now)
+            if shared is not None:
+                local.remaining = max(0, min(local.remaining, int(limit - shared[0] - used - 1)))
+            self._schedule_flush()
+        return local
+
+    def _schedule_flush(self) -> None:
+        if time.monotonic() < self._remote_down_until:
+            return
+        task = self._flushing
+        # A task left behind by another event loop (tests) never finishes here
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            self._flushing = asyncio.create_task(self.flush())
+
+    def _remember(self, pending_key: tuple[str, float], count: int, expires_ms: int) -> None:
+        if pending_key not in self._shared and len(self._shared) >= self.max_keys:
+            self._shared.pop(next(iter(self._shared)))
+        self._shared[pending_key] = [count, time.monotonic() + expires_ms / 1000]
+
+    async def flush(self) -> None:
+        """Replay locally admitted hits to Redis in a single pipelined round trip (concurrent calls on a cluster)."""
+        if not self._pending or time.monotonic() < self._remote_down_until:
+            return
+        batch, self._pending = self._pending, {}
+        now = time.monotonic()
+        # Each batch is stamped with the time of its oldest hit, so a late sync never moves hits forward
+        ages = {pending_key: int((now - self._unsynced_since.get(pending_key, now)) * 1000) for pending_key in batch}
+        for pending_key, hits in batch.items():
+            self._inflight[pending_key] = self._inflight.get(pending_key, 0) + hits
+        try:
+            if isinstance(self.remote.redis, RedisCluster):
+                # Cluster pipelines cannot carry scripts; send the calls concurrently instead
+                results = await asyncio.wait_for(
+                    asyncio.gather(*(
+                        self.remote.record(key, hits, window_s=window_s, age_ms=ages[key, window_s])
+                        for (key, window_s), hits in batch.items()
+                    )),
+                    timeout=self.timeout_s
+                )
+            else:
+                async with self.remote.redis.pipeline(transaction=False) as pipe:
+                    for (key, window_s), hits in batch.items():
+                        await self.remote.record(key, hits, window_s=window_s, age_ms=ages[key, window_s], client=pipe)
+                    results = await asyncio.wait_for(pipe.execute(), timeout=self.timeout_s)
+            for pending_key, (count, expires_ms) in zip(batch, results):
+                self._remember(pending_key, int(count), int(expires_ms))
+            metrics.incr("rate_limit_synced_hits", sum(batch.values()))
+        except Exception as e:
+            # Hits are best-effort: drop them rather than grow without bound during an outage
+            self._remote_down_until = time.monotonic() + self.cooldown_s
+            metrics.incr("rate_limit_remote_errors")
+            logger.error(f"Failed to sync local rate limit hits to Redis: {e!r}")
+        finally:
+            for pending_key, hits in batch.items():
+                left = self._inflight.get(pending_key, 0) - hits
+                if left > 0:
+                    self._inflight[pending_key] = left
+                else:
+                    self._inflight.pop(pending_key, None)
+                    if pending_key not in self._pending:
+                        self._unsynced_since.pop(pending_key, None)
+
+    async def run_sync(self) -> None:
+        """Long-running task (started in the app lifespan) that calls flush() periodically."""
+        while True:
+            await asyncio.sleep(self.sync_interval_s)
+            await self.flush()
+
+
+# Concurrency cap with leases, so a crashed worker can't hold a slot forever.
+# KEYS[1] = holders zset (score = lease expiry, microseconds)
+# ARGV[1] = cap, ARGV[2] = lease (microseconds), ARGV[3] = unique holder id
+# Returns 1 if the slot was acquired, else 0
+CONCURRENCY_ACQUIRE_LUA = """
+local key = KEYS[1]
+local cap = tonumber(ARGV[1])
+local lease = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now)
+if redis.call('ZCARD', key) >= cap then
+    return 0
+end
+redis.call('ZADD', key, now + lease, ARGV[3])
+redis.call('PEXPIRE', key, math.ceil(lease / 1000))
+return 1
+"""
+
+
+class ConcurrencyLimiter:
+    def __init__(self, redis: Redis, *, lease_s: float):
+        self.lease_s = lease_s
+        self._redis = redis
+        self._acquire = redis.register_script(CONCURRENCY_ACQUIRE_LUA)
+        self._prefix = f"{os.getpid()}-{os.urandom(4).hex()}-"
+        self._seq = itertools.count()
+
+    async def acquire(self, key: str, *, cap: int) -> str | None:
+        """Take one of `cap` slots on `key`. Returns a holder token for release(), or None if full."""
+        token = f"{self._prefix}{next(self._seq)}"
+        acquired = await self._acquire(keys=[key], args=[cap, int(self.lease_s * 1_000_000), token])
+        return token if acquired else None
+
+    async def release(self, key: str, token: str) -> None:
+        await self._redis.zrem(key, token)
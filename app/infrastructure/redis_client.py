@@ -1,10 +1,130 @@
-from redis.asyncio import Redis
+"""
+Redis clients shared by the app.
+
+REDIS_MODE selects the deployment:
+  - standalone: one server at REDIS_HOST:REDIS_PORT
+  - sentinel: the master named REDIS_SENTINEL_MASTER, discovered through the sentinels
+    in REDIS_NODES and followed across failovers
+  - cluster: a Redis Cluster reached through the seed nodes in REDIS_NODES. Commands are
+    routed by key slot, so keys used together share a hash tag (see chat/keys.py)
+
+Each client owns bounded connection pools (REDIS_MAX_CONNECTIONS, per node in cluster
+mode; standalone callers wait up to REDIS_POOL_TIMEOUT for a free connection instead of
+opening more), socket and connect timeouts, a PING on connections idle longer than
+REDIS_HEALTH_CHECK_INTERVAL, and retries with jittered exponential backoff on
+connection errors and timeouts.
+"""
+from typing import Any, Optional
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.cluster import ClusterNode, RedisCluster
+from redis.asyncio.retry import Retry
+from redis.asyncio.sentinel import Sentinel
+from redis.backoff import ExponentialWithJitterBackoff
+from redis.exceptions import ConnectionError, TimeoutError
 from config import settings
+from .client_cache import ClientCache
+
+MODES = ("standalone", "sentinel", "cluster")
+
+RedisBackend = Redis | RedisCluster
+
+_sentinel: Optional[Sentinel] = None
+
+
+def nodes() -> list[tuple[str, int]]:
+    """Seed nodes (cluster) or sentinels (sentinel) from REDIS_NODES, "host:port,host:port"."""
+    parsed = []
+    for node in settings.REDIS_NODES.split(","):
+        if node.strip():
+            host, _, port = node.strip().rpartition(":")
+            parsed.append((host, int(port)))
+    return parsed or [(settings.REDIS_HOST, settings.REDIS_PORT)]
+
+def connection_kwargs(**overrides: Any) -> dict[str, Any]:
+    """Connection settings shared by every client, for building extra dedicated connections."""
+    kwargs = {
+        "username": settings.REDIS_USER,
+        "password": settings.REDIS_USER_PW,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT,
+        "socket_keepalive": True,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+        "retry": Retry(
+            ExponentialWithJitterBackoff(cap=settings.REDIS_RETRY_BACKOFF_CAP, base=settings.REDIS_RETRY_BACKOFF_BASE),
+            settings.REDIS_RETRY_ATTEMPTS,
+            supported_errors=(ConnectionError, TimeoutError)
+        ),
+    }
+    kwargs.update(overrides)
+    return kwargs
+
+def sentinel() -> Sentinel:
+    global _sentinel
+    if _sentinel is None:
+        _sentinel = Sentinel(
+            nodes(),
+            sentinel_kwargs={
+                "password": settings.REDIS_SENTINEL_PW,
+                "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+                "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT,
+            },
+            **connection_kwargs()
+        )
+    return _sentinel
+
+def create_client(*, decode_responses: bool) -> RedisBackend:
+    mode = settings.REDIS_MODE
+    if mode == "cluster":
+        return RedisCluster(
+            startup_nodes=[ClusterNode(host, port) for host, port in nodes()],
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            **connection_kwargs(decode_responses=decode_responses)
+        )
+    if mode == "sentinel":
+        return sentinel().master_for(
+            settings.REDIS_SENTINEL_MASTER,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            decode_responses=decode_responses
+        )
+    if mode != "standalone":
+        raise ValueError(f"Unknown REDIS_MODE {mode!r} (expected one of {', '.join(MODES)})")
+    pool = BlockingConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        **connection_kwargs(decode_responses=decode_responses)
+    )
+    return Redis(connection_pool=pool)
+
+async def node_client(**overrides: Any) -> Redis:
+    """
+    A client bound to a single server (the standalone server or the current Sentinel
+    master), for connection state that must stay on one server such as client tracking.
+    Not available in cluster mode.
+    """
+    if settings.REDIS_MODE == "cluster":
+        raise ValueError("No single Redis server with REDIS_MODE=cluster")
+    if settings.REDIS_MODE == "sentinel":
+        host, port = await sentinel().discover_master(settings.REDIS_SENTINEL_MASTER)
+    else:
+        host, port = settings.REDIS_HOST, settings.REDIS_PORT
+    return Redis(host=host, port=port, **connection_kwargs(**overrides))
+
+
+redis_client: RedisBackend = create_client(decode_responses=True)
+
+# Chat history entries are binary (app/chat/codec.py), so they are read back as raw bytes
+redis_binary: RedisBackend = create_client(decode_responses=False)
 
-redis_client: Redis = Redis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    username=settings.REDIS_USER,
-    password=settings.REDIS_USER_PW,
-    decode_responses=True
-    )
\ No newline at end of file
+# Hot read-mostly keys (cached auth records) served from process memory when
+# REDIS_CLIENT_CACHE is on; see client_cache.py. Tracking is per server, so the cache
+# stays off in cluster mode.
+client_cache = ClientCache(
+    redis_client,
+    connect=lambda: node_client(decode_responses=True, protocol=2, single_connection_client=True),
+    enabled=settings.REDIS_CLIENT_CACHE and settings.REDIS_MODE != "cluster",
+    prefixes=[p.strip() for p in settings.REDIS_CLIENT_CACHE_PREFIXES.split(",") if p.strip()],
+    max_keys=settings.REDIS_CLIENT_CACHE_MAX_KEYS,
+    ttl=settings.REDIS_CLIENT_CACHE_TTL
+)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr, field_validator
+from pydantic import BaseModel, Field, EmailStr, field_validator, model_validator
 from typing import Optional
 from dataclasses import dataclass
 import string
@@ -7,6 +7,23 @@ class ServiceRole(BaseModel):
     agent_role: str = Field(..., min_length=1, description="The role of the agent.")
     TTL: Optional[int] = Field(None, gt=0, description="Time to live in seconds. Optional parameter")
 
+class CharacterBulkUpdate(ServiceRole):
+    id: str = Field(..., min_length=36, description="UUID of the character to update.")
+
+class CharacterBulkRequest(BaseModel):
+    create: list[ServiceRole] = Field(default_factory=list, description="Characters to create.")
+    update: list[CharacterBulkUpdate] = Field(default_factory=list, description="Characters to update, by id.")
+    delete: list[str] = Field(default_factory=list, description="UUIDs of characters to soft delete.")
+
+    @model_validator(mode="after")
+    def batch_size(self):
+        total = len(self.create) + len(self.update) + len(self.delete)
+        if total == 0:
+            raise ValueError('At least one create, update or delete item is required')
+        if total > 1000:
+            raise ValueError('At most 1000 items per request')
+        return self
+
 class Completions(BaseModel):
     uuid: str = Field(..., min_length=36, description="Unique user ID.")
     role: str = Field(..., min_length=1, description="Role to differentiate between chatbot and user.")
@@ -75,6 +92,11 @@ class VectorSearchRequest(BaseModel):
     top_k: int = Field(5, ge=1, le=50, description="Number of results to return")
     entity_type: Optional[str] = Field(None, description="Optional filter by entity_type")
 
+class AdminVectorSearchDiagnosticsRequest(VectorSearchRequest):
+    client_id: str = Field(..., min_length=36, description="Tenant (client) UUID whose embeddings are searched")
+    metadata_filter: Optional[dict] = Field(None, description="Optional JSONB containment filter")
+    exclude_entity_type: Optional[str] = Field(None, description="Optional entity_type to exclude")
+
 class AdminClientCreateRequest(AuthRequest):
     is_admin: bool = False
     is_active: bool = True
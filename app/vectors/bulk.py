@@ -0,0 +1,185 @@
+"""Binary bulk format for moving a tenant's embeddings between clusters.
+
+An export is a zip archive of two files that share the same row order:
+  - meta.ndjson   : one header line followed by one JSON object per vector row
+  - vectors.npy   : float32 matrix of shape (count, dim), standard NumPy .npy v1.0
+
+Both are produced and consumed incrementally, so neither side needs the whole
+dataset in memory.
+"""
+from __future__ import annotations
+import ast
+import json
+import uuid
+import zipfile
+from datetime import datetime
+from typing import Any, BinaryIO, Optional
+import numpy as np
+from pgvector import Vector
+
+FORMAT_NAME = "fastwrap.embeddings"
+FORMAT_VERSION = 1
+NPY_DTYPE = np.dtype("<f4")
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+ARCHIVE_META = "meta.ndjson"
+ARCHIVE_VECTORS = "vectors.npy"
+
+
+class ArchiveWriter:
+    """
+    Writes the export archive as a stream: members are written one after the other and
+    drain() returns the archive bytes produced so far. The writer is the zip file's
+    output, which has no tell()/seek(), so zipfile emits sizes after each member.
+    """
+    def __init__(self, date_time: datetime):
+        self._date_time = date_time.timetuple()[:6]
+        self._chunks: list[bytes] = []
+        self._zip = zipfile.ZipFile(self, "w")
+        self._member: Any = None
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def start(self, name: str, *, compress: bool) -> None:
+        info = zipfile.ZipInfo(name, date_time=self._date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        # Sizes are unknown up front: always leave room for zip64 sizes
+        self._member = self._zip.open(info, "w", force_zip64=True)
+
+    def add(self, data: bytes) -> None:
+        self._member.write(data)
+
+    def end(self) -> None:
+        self._member.close()
+        self._member = None
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def open_archive(f: BinaryIO) -> tuple[zipfile.ZipFile, BinaryIO, BinaryIO]:
+    """Opens an export archive and returns it with its (vectors, meta) members."""
+    archive = zipfile.ZipFile(f)
+    try:
+        return archive, archive.open(ARCHIVE_VECTORS), archive.open(ARCHIVE_META)
+    except KeyError as e:
+        archive.close()
+        raise ValueError(f"export archive is missing {e}") from None
+
+
+def npy_header(count: int, dim: int) -> bytes:
+    """
+    Build a .npy v1.0 header for a (count, dim) float32 matrix so rows can be
+    streamed after it without building the array first.
+    """
+    header = repr({"descr": NPY_DTYPE.str, "fortran_order": False, "shape": (int(count), int(dim))})
+    # magic(8) + header length(2) + header + "\n" must be a multiple of 64
+    pad = 64 - (len(_NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header = header + " " * (pad % 64) + "\n"
+    return _NPY_MAGIC + len(header).to_bytes(2, "little") + header.encode("latin1")
+
+
+def read_npy_header(f: BinaryIO) -> tuple[int, int]:
+    """Parse a .npy header and return (count, dim). Only 2-D little-endian float32 is accepted."""
+    magic = f.read(len(_NPY_MAGIC))
+    if magic != _NPY_MAGIC:
+        raise ValueError("vectors file is not a .npy v1.0 file")
+    header_len = int.from_bytes(f.read(2), "little")
+    header = ast.literal_eval(f.read(header_len).decode("latin1"))
+    if np.dtype(header.get("descr")) != NPY_DTYPE or header.get("fortran_order"):
+        raise ValueError(f"vectors must be C-ordered {NPY_DTYPE.str}")
+    shape = header.get("shape")
+    if not isinstance(shape, tuple) or len(shape) != 2:
+        raise ValueError("vectors must be a 2-D matrix")
+    return int(shape[0]), int(shape[1])
+
+
+def read_npy_rows(f: BinaryIO, dim: int, max_rows: int) -> np.ndarray:
+    """Read up to max_rows rows of the matrix body."""
+    row_bytes = dim * NPY_DTYPE.itemsize
+    data = f.read(row_bytes * max_rows)
+    if len(data) % row_bytes:
+        raise ValueError("vectors file is truncated")
+    return np.frombuffer(data, dtype=NPY_DTYPE).reshape(-1, dim)
+
+
+def encode_vector(embedding: Any) -> bytes:
+    # pgvector's asyncpg codec decodes columns to pgvector.Vector
+    if isinstance(embedding, Vector):
+        embedding = embedding.to_numpy()
+    return np.asarray(embedding, dtype=NPY_DTYPE).tobytes()
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def meta_header(*, count: int, dim: int, as_of: datetime) -> bytes:
+    header = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "count": int(count),
+        "dim": int(dim),
+        "as_of": as_of.isoformat(),
+    }
+    return (json.dumps(header) + "\n").encode("utf-8")
+
+
+def encode_meta_line(row: dict[str, Any]) -> bytes:
+    line = {
+        "entity_type": row["entity_type"],
+        "entity_id": row["entity_id"],
+        "content": row["content"],
+        "metadata": row["metadata"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+    return (json.dumps(line, default=_json_default) + "\n").encode("utf-8")
+
+
+def parse_meta_header(line: bytes) -> dict[str, Any]:
+    header = json.loads(line)
+    if header.get("format") != FORMAT_NAME or header.get("version") != FORMAT_VERSION:
+        raise ValueError("meta file has an unknown header")
+    return header
+
+
+def read_meta_lines(f: BinaryIO, max_rows: int) -> list[dict[str, Any]]:
+    """Read up to max_rows non-empty NDJSON lines."""
+    rows: list[dict[str, Any]] = []
+    while len(rows) < max_rows:
+        line = f.readline()
+        if not line:
+            break
+        if line.strip():
+            rows.append(json.loads(line))
+    return rows
+
+
+def _parse_ts(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def to_import_record(meta: dict[str, Any], vector: np.ndarray) -> tuple:
+    """Row tuple matching VectorRepo.IMPORT_COLUMNS."""
+    metadata = meta.get("metadata")
+    return (
+        meta["entity_type"],
+        uuid.UUID(str(meta["entity_id"])),
+        meta["content"],
+        vector,
+        json.dumps(metadata) if metadata is not None else None,
+        _parse_ts(meta.get("created_at")),
+        _parse_ts(meta.get("updated_at")),
+    )
@@ -1,16 +1,66 @@
+import json
 import logging
+import time
 import uuid
-from typing import Any, Optional
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Optional
 import asyncpg
 from pgvector import Vector
-from ..database.init import init_db
+from ..database.init import VECTOR, init_db
+from ..database import queries
+from ..database.replicas import mark_write, read_db
 
 logger = logging.getLogger(__name__)
 
+HNSW_INDEX_NAME = "idx_embeddings_embedding_hnsw"
+
+# Shared by search() and explain_search() so diagnostics always explain the real query.
+SEARCH_SQL = """
+    SELECT
+        id, client_id, entity_type, entity_id, content, metadata,
+        (embedding <=> $1) AS distance,
+        created_at, updated_at
+    FROM embeddings
+    WHERE client_id = $2
+      AND deleted_at IS NULL
+      AND ($3::text IS NULL OR entity_type = $3)
+      AND ($4::jsonb IS NULL OR metadata @> $4::jsonb)
+      AND ($5::text IS NULL OR entity_type <> $5)
+    ORDER BY embedding <=> $1
+    LIMIT $6
+"""
+SEARCH = queries.register("vectors.search", SEARCH_SQL)
+
+UPSERT = queries.register("vectors.upsert", """
+    INSERT INTO embeddings (client_id, entity_type, entity_id, content, embedding, metadata)
+    VALUES ($1, $2, $3, $4, $5, $6::jsonb)
+    ON CONFLICT (client_id, entity_type, entity_id) WHERE deleted_at IS NULL
+    DO UPDATE SET
+        content = EXCLUDED.content,
+        embedding = EXCLUDED.embedding,
+        metadata = EXCLUDED.metadata,
+        updated_at = now(),
+        deleted_at = NULL
+    RETURNING id, client_id, entity_type, entity_id, content, metadata, created_at, updated_at
+""")
+
+def _plan_indexes(node: dict[str, Any]) -> list[str]:
+    """Collect every index name referenced by an EXPLAIN (FORMAT JSON) plan tree."""
+    found: list[str] = []
+    if node.get("Index Name"):
+        found.append(node["Index Name"])
+    for child in node.get("Plans", []):
+        found.extend(_plan_indexes(child))
+    return found
+
 
 class VectorRepo:
     """Minimal pgvector-backed repository."""
 
+    # Column order of the records fed to copy_embeddings (see vectors/bulk.py).
+    IMPORT_COLUMNS = ["entity_type", "entity_id", "content", "embedding", "metadata", "created_at", "updated_at"]
+
     async def upsert_embedding(
         self,
         client_id: str,
@@ -24,21 +74,11 @@ class VectorRepo:
         try:
             cid = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(client_id)
             eid = entity_id if isinstance(entity_id, uuid.UUID) else uuid.UUID(entity_id)
-            pool = await init_db()
+            pool = await init_db(VECTOR)
             async with pool.acquire() as conn:
-                row = await conn.fetchrow(
-                    """
-                    INSERT INTO embeddings (client_id, entity_type, entity_id, content, embedding, metadata)
-                    VALUES ($1, $2, $3, $4, $5, $6::jsonb)
-                    ON CONFLICT (client_id, entity_type, entity_id) WHERE deleted_at IS NULL
-                    DO UPDATE SET
-                        content = EXCLUDED.content,
-                        embedding = EXCLUDED.embedding,
-                        metadata = EXCLUDED.metadata,
-                        updated_at = now(),
-                        deleted_at = NULL
-                    RETURNING id, client_id, entity_type, entity_id, content, metadata, created_at, updated_at
-                    """,
+                row = await queries.fetchrow(
+                    conn,
+                    UPSERT,
                     cid,
                     entity_type,
                     eid,
@@ -66,23 +106,11 @@ class VectorRepo:
     ) -> list[dict[str, Any]]:
         try:
             cid = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(client_id)
-            pool = await init_db()
+            pool = await read_db(VECTOR, scope=cid)
             async with pool.acquire() as conn:
-                rows = await conn.fetch(
-                    """
-                    SELECT
-                        id, client_id, entity_type, entity_id, content, metadata,
-                        (embedding <=> $1) AS distance,
-                        created_at, updated_at
-                    FROM embeddings
-                    WHERE client_id = $2
-                      AND deleted_at IS NULL
-                      AND ($3::text IS NULL OR entity_type = $3)
-                      AND ($4::jsonb IS NULL OR metadata @> $4::jsonb)
-                      AND ($5::text IS NULL OR entity_type <> $5)
-                    ORDER BY embedding <=> $1
-                    LIMIT $6
-                    """,
+                rows = await queries.fetch(
+                    conn,
+                    SEARCH,
                     Vector(query_embed),
                     cid,
                     entity_type,
@@ -97,3 +125,173 @@ class VectorRepo:
         except asyncpg.PostgresError:
             logger.exception("Database error in VectorRepo.search")
             return []
+
+    async def explain_search(
+        self,
+        client_id: str,
+        *,
+        query_embed: list[float],
+        top_k: int = 5,
+        entity_type: Optional[str] = None,
+        metadata_filter: Optional[dict[str, Any]] = None,
+        exclude_entity_type: Optional[str] = None
+    ) -> Optional[dict[str, Any]]:
+        """
+        Diagnostics for search(): EXPLAIN (ANALYZE, BUFFERS) of the same statement and arguments.
+        The explained run is the first one, so its buffers and timings are what a cold query
+        costs; the results are fetched afterwards and not timed. Timings are in milliseconds,
+        and `query` includes the EXPLAIN instrumentation overhead.
+
+        The plan is a custom plan for these arguments. search() goes through asyncpg's
+        prepared statements, which Postgres may switch to a generic plan after a few runs,
+        so a live query can still pick a different plan.
+        """
+        try:
+            cid = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(client_id)
+            args = (
+                Vector(query_embed),
+                cid,
+                entity_type,
+                metadata_filter,
+                exclude_entity_type,
+                int(top_k)
+            )
+            pool = await read_db(VECTOR, scope=cid)
+            started = time.perf_counter()
+            async with pool.acquire() as conn:
+                acquired = time.perf_counter()
+                explained = await conn.fetchval(
+                    f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {SEARCH_SQL}", *args
+                )
+                queried = time.perf_counter()
+                rows = await conn.fetch(SEARCH_SQL, *args)
+            # Without a registered json codec for EXPLAIN output asyncpg may hand back text
+            plan = json.loads(explained) if isinstance(explained, str) else explained
+            root = plan[0]
+            indexes = _plan_indexes(root["Plan"])
+            return {
+                "results": [dict(r) for r in rows],
+                "timings_ms": {
+                    "pool_wait": round((acquired - started) * 1000, 3),
+                    "query": round((queried - acquired) * 1000, 3),
+                    "planning": root.get("Planning Time"),
+                    "execution": root.get("Execution Time"),
+                },
+                "indexes_used": indexes,
+                "hnsw_index_used": HNSW_INDEX_NAME in indexes,
+                "plan": plan,
+            }
+        except (ValueError, TypeError):
+            logger.exception("Invalid UUID passed to VectorRepo.explain_search")
+            return None
+        except asyncpg.PostgresError:
+            logger.exception("Database error in VectorRepo.explain_search")
+            return None
+
+    @asynccontextmanager
+    async def export_snapshot(
+        self,
+        client_id: str,
+        *,
+        prefetch: int = 500
+    ) -> AsyncIterator[tuple[int, datetime, Callable[[], Any]]]:
+        """
+        Yields (count, as_of, rows) for the tenant's active embeddings. Everything runs in one
+        read-only REPEATABLE READ transaction: the count and every cursor returned by rows()
+        see the same snapshot, ordered by id, fetched `prefetch` rows at a time. as_of is
+        the transaction's start time.
+        """
+        cid = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(client_id)
+        pool = await init_db(VECTOR)
+        async with pool.acquire() as conn:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                row = await conn.fetchrow(
+                    """
+                    SELECT count(*) AS count, now() AS as_of
+                    FROM embeddings
+                    WHERE client_id = $1
+                      AND deleted_at IS NULL
+                    """,
+                    cid
+                )
+
+                def rows():
+                    return conn.cursor(
+                        """
+                        SELECT entity_type, entity_id, content, embedding, metadata, created_at, updated_at
+                        FROM embeddings
+                        WHERE client_id = $1
+                          AND deleted_at IS NULL
+                        ORDER BY id
+                        """,
+                        cid,
+                        prefetch=prefetch
+                    )
+
+                yield int(row["count"]), row["as_of"], rows
+
+    async def copy_embeddings(
+        self,
+        client_id: str,
+        *,
+        records: AsyncIterable[tuple]
+    ) -> Optional[int]:
+        """
+        Bulk import with COPY. Records (see IMPORT_COLUMNS) are streamed into a temp table
+        via copy_records_to_table and then merged with the same upsert rules as upsert_embedding.
+        Returns the number of rows written, or None on failure (nothing is committed).
+        """
+        try:
+            cid = client_id if isinstance(client_id, uuid.UUID) else uuid.UUID(client_id)
+            pool = await init_db(VECTOR)
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    # One COPY of the whole upload plus one indexed insert: a large tenant
+                    # takes longer than the vector pool's statement_timeout
+                    await conn.execute("SET LOCAL statement_timeout = 0")
+                    await conn.execute(
+                        """
+                        CREATE TEMP TABLE embeddings_import (
+                            entity_type TEXT NOT NULL,
+                            entity_id   UUID NOT NULL,
+                            content     TEXT NOT NULL,
+                            embedding   vector NOT NULL,
+                            metadata    TEXT,
+                            created_at  TIMESTAMPTZ,
+                            updated_at  TIMESTAMPTZ
+                        ) ON COMMIT DROP
+                        """
+                    )
+                    await conn.copy_records_to_table(
+                        "embeddings_import",
+                        records=records,
+                        columns=self.IMPORT_COLUMNS
+                    )
+                    result = await conn.execute(
+                        """
+                        INSERT INTO embeddings (client_id, entity_type, entity_id, content, embedding, metadata, created_at, updated_at)
+                        SELECT DISTINCT ON (entity_type, entity_id)
+                            $1, entity_type, entity_id, content, embedding, metadata::jsonb,
+                            COALESCE(created_at, now()), COALESCE(updated_at, now())
+                        FROM embeddings_import
+                        ORDER BY entity_type, entity_id, updated_at DESC NULLS LAST
+                        ON CONFLICT (client_id, entity_type, entity_id) WHERE deleted_at IS NULL
+                        DO UPDATE SET
+                            content = EXCLUDED.content,
+                            embedding = EXCLUDED.embedding,
+                            metadata = EXCLUDED.metadata,
+                            updated_at = now(),
+                            deleted_at = NULL
+                        """,
+                        cid
+                    )
+            # Chat turns (upsert_embedding) may lag on replicas, but an import should be visible at once
+            mark_write(cid)
+            # asyncpg returns the command tag, e.g. "INSERT 0 1234"
+            return int(result.split()[-1])
+        except (ValueError, TypeError, KeyError):
+            logger.exception("Invalid data passed to VectorRepo.copy_embeddings")
+            return None
+        except asyncpg.PostgresError:
+            logger.exception("Database error in VectorRepo.copy_embeddings")
+            return None
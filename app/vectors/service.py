@@ -1,7 +1,13 @@
+import asyncio
 import logging
-from typing import Any, Optional
+import time
+import zipfile
+from typing import Any, AsyncIterator, BinaryIO, Optional
+from config import settings
+from . import bulk
 from .embeddings import embed_text
 from .repository import VectorRepo
+from ..database.pool import PoolAcquireTimeout
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +30,8 @@ async def upsert_text_snippet(
             embedding=embed, 
             metadata=metadata
         )
+    except PoolAcquireTimeout:
+        raise
     except Exception as e:
         logger.error(f"Failed to upsert snippet: {e}")
         return None
@@ -47,6 +55,121 @@ async def semantic_search(*,
             metadata_filter=metadata_filter,
             exclude_entity_type=exclude_entity_type
         )
+    except PoolAcquireTimeout:
+        raise
     except Exception as e:
         logger.error(f"Semantic search failed: {e}")
-        return []
\ No newline at end of file
+        return []
+
+async def semantic_search_diagnostics(*,
+    client_id: str,
+    query: str,
+    top_k: int = 5,
+    entity_type: Optional[str] = None,
+    metadata_filter: Optional[dict[str, Any]] = None,
+    exclude_entity_type: Optional[str] = None
+) -> Optional[dict[str, Any]]:
+    """semantic_search with per-stage timings and the query plan. Admin-only; see admin_routes."""
+    try:
+        started = time.perf_counter()
+        query_embed = await embed_text(query)
+        embedded = time.perf_counter()
+        repo = VectorRepo()
+        report = await repo.explain_search(
+            client_id,
+            query_embed=query_embed,
+            top_k=top_k,
+            entity_type=entity_type,
+            metadata_filter=metadata_filter,
+            exclude_entity_type=exclude_entity_type
+        )
+        if report is None:
+            return None
+        report["timings_ms"]["embedding"] = round((embedded - started) * 1000, 3)
+        report["timings_ms"]["total"] = round((time.perf_counter() - started) * 1000, 3)
+        return report
+    except PoolAcquireTimeout:
+        raise
+    except Exception as e:
+        logger.error(f"Semantic search diagnostics failed: {e}")
+        return None
+
+async def export_archive(*, client_id: str) -> AsyncIterator[bytes]:
+    """
+    Stream a tenant export (see bulk.py): meta.ndjson and then vectors.npy, both read from
+    the same snapshot so they describe the same rows in the same order.
+    """
+    batch_size = settings.VECTOR_BULK_BATCH_SIZE
+    repo = VectorRepo()
+    async with repo.export_snapshot(client_id, prefetch=batch_size) as (count, as_of, rows):
+        archive = bulk.ArchiveWriter(as_of)
+
+        archive.start(bulk.ARCHIVE_META, compress=True)
+        archive.add(bulk.meta_header(count=count, dim=settings.EMBEDDING_DIM, as_of=as_of))
+        chunk: list[bytes] = []
+        async for row in rows():
+            chunk.append(bulk.encode_meta_line(row))
+            if len(chunk) >= batch_size:
+                archive.add(b"".join(chunk))
+                chunk.clear()
+                yield archive.drain()
+        if chunk:
+            archive.add(b"".join(chunk))
+        archive.end()
+        yield archive.drain()
+
+        archive.start(bulk.ARCHIVE_VECTORS, compress=False)
+        archive.add(bulk.npy_header(count, settings.EMBEDDING_DIM))
+        chunk.clear()
+        async for row in rows():
+            chunk.append(bulk.encode_vector(row["embedding"]))
+            if len(chunk) >= batch_size:
+                archive.add(b"".join(chunk))
+                chunk.clear()
+                yield archive.drain()
+        if chunk:
+            archive.add(b"".join(chunk))
+        archive.end()
+        archive.close()
+        yield archive.drain()
+
+async def _import_records(vectors: BinaryIO, meta: BinaryIO, *, count: int, dim: int):
+    """Pair npy rows with NDJSON lines batch by batch. File reads run off the event loop."""
+    batch_size = settings.VECTOR_BULK_BATCH_SIZE
+    seen = 0
+    while seen < count:
+        want = min(batch_size, count - seen)
+        rows = await asyncio.to_thread(bulk.read_npy_rows, vectors, dim, want)
+        metas = await asyncio.to_thread(bulk.read_meta_lines, meta, want)
+        if len(rows) != want or len(metas) != want:
+            raise ValueError(f"export files disagree on row count at row {seen}")
+        for m, v in zip(metas, rows):
+            yield bulk.to_import_record(m, v)
+        seen += want
+
+async def import_embeddings(*, client_id: str, archive: BinaryIO) -> Optional[int]:
+    """
+    Import an export produced by export_archive into this tenant.
+    Returns the number of rows written, or None if the archive is invalid or the copy failed.
+    """
+    try:
+        zf, vectors, meta = await asyncio.to_thread(bulk.open_archive, archive)
+    except (ValueError, zipfile.BadZipFile) as e:
+        logger.error(f"Invalid embeddings import: {e}")
+        return None
+    with zf, vectors, meta:
+        try:
+            count, dim = await asyncio.to_thread(bulk.read_npy_header, vectors)
+            header = bulk.parse_meta_header(await asyncio.to_thread(meta.readline))
+            if dim != settings.EMBEDDING_DIM or int(header["dim"]) != dim:
+                raise ValueError(f"dimension mismatch: file={dim} meta={header['dim']} db={settings.EMBEDDING_DIM}")
+            if int(header["count"]) != count:
+                raise ValueError(f"row count mismatch: vectors={count} meta={header['count']}")
+        except (ValueError, KeyError, SyntaxError, zipfile.BadZipFile) as e:
+            logger.error(f"Invalid embeddings import: {e}")
+            return None
+        repo = VectorRepo()
+        return await repo.copy_embeddings(
+            client_id,
+            records=_import_records(vectors, meta, count=count, dim=dim)
+        )
@@ -0,0 +1,92 @@
+"""
+Memory per conversation of the chat history encodings: legacy JSON entries vs msgpack
+(version 1) with and without zstd for long contents.
+
+Builds synthetic conversations (short user messages, longer assistant replies) and
+reports the encoded payload per conversation. With --redis the conversations are also
+written to the Redis from .env and measured with MEMORY USAGE, which includes the list
+overhead. Run from project root:
+  uv run python -m benchmarks.chat_history_bench [--conversations N] [--turns T] [--redis]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+from config import settings
+from app.chat import codec
+
+WORDS = (
+    "the order size shipping delivery return refund store product price discount color "
+    "available stock week days customer support help please thanks you we our your can "
+    "will would like need item cart checkout payment card address tracking number email "
+    "policy warranty exchange small medium large black white blue cotton leather new "
+    "sale offer code free standard express business within after before about also and "
+    "or but if when which that this these those have has had is are was were be been"
+).split()
+# (name, CHAT_HISTORY_FORMAT, CHAT_HISTORY_COMPRESS_MIN_BYTES)
+VARIANTS = [
+    ("json (legacy)", "json", 0),
+    ("msgpack", "msgpack", 0),
+    ("msgpack+zstd", "msgpack", 512),
+]
+
+
+def _text(rng: random.Random, min_chars: int, max_chars: int) -> str:
+    target = rng.randint(min_chars, max_chars)
+    words: list[str] = []
+    length = 0
+    while length < target:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words).capitalize() + "."
+
+def build_conversations(count: int, turns: int) -> list[list[tuple[str, str]]]:
+    rng = random.Random(7)
+    system = _text(rng, 800, 1200)
+    conversations = []
+    for _ in range(count):
+        messages = [("system", system)]
+        for _ in range(turns):
+            messages.append(("user", _text(rng, 20, 300)))
+            messages.append(("assistant", _text(rng, 200, 1500)))
+        conversations.append(messages)
+    return conversations
+
+def encode(conversation: list[tuple[str, str]], format: str, min_bytes: int) -> list[bytes]:
+    settings.CHAT_HISTORY_COMPRESS_MIN_BYTES = min_bytes
+    return [codec.encode_entry(role, content, format=format) for role, content in conversation]
+
+async def redis_usage(conversations: list[list[bytes]], label: str) -> float:
+    from app.infrastructure.redis_client import redis_binary as r
+    keys = [f"bench:chat:{label}:{i}" for i in range(len(conversations))]
+    async with r.pipeline(transaction=False) as pipe:
+        for key, entries in zip(keys, conversations):
+            pipe.delete(key)
+            pipe.rpush(key, *entries)
+        await pipe.execute()
+    usage = [await r.memory_usage(key, samples=0) for key in keys]
+    await r.delete(*keys)
+    return statistics.mean(usage)
+
+async def main(count: int, turns: int, use_redis: bool) -> None:
+    conversations = build_conversations(count, turns)
+    text_kb = statistics.mean(sum(len(c.encode()) for _, c in conv) for conv in conversations) / 1024
+    print(f"conversations={count} turns={turns} (~{text_kb:.1f} KiB of text each)")
+    baseline = None
+    for name, format, min_bytes in VARIANTS:
+        encoded = [encode(conv, format, min_bytes) for conv in conversations]
+        payload = statistics.mean(sum(len(e) for e in entries) for entries in encoded) / 1024
+        baseline = baseline or payload
+        line = f"{name:<14} payload={payload:8.1f} KiB/conversation ({(payload / baseline - 1) * 100:+.1f}%)"
+        if use_redis:
+            line += f"  redis={await redis_usage(encoded, format + str(min_bytes)) / 1024:8.1f} KiB"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20, help="user/assistant exchanges per conversation")
+    parser.add_argument("--redis", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.conversations, args.turns, args.redis))
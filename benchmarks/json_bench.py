@@ -0,0 +1,59 @@
+"""
+CPU spent on JSON per chat turn with the stdlib json module vs orjson.
+
+Replays what store_message does on a long conversation: encode the new user and
+assistant entries, decode the whole history read back from Redis, plus rendering the
+chat response (the history with the reply appended) as the HTTP body. No Redis or
+LLM needed. Run from project root:
+  uv run python -m benchmarks.json_bench [--turns N] [--chars C] [--iterations I]
+"""
+import argparse
+import random
+import string
+import time
+from app.infrastructure import json_codec
+
+
+def build_history(turns: int, chars: int) -> list[str]:
+    """Entries as redis-py returns them (decode_responses=True)."""
+    rng = random.Random(7)
+    alphabet = string.ascii_letters + string.digits + "      .,;!?'\"\\/çãéü€😀"
+    history = [json_codec.dumps({"role": "system", "content": "You are a helpful store assistant. " * 20})]
+    for i in range(turns * 2):
+        content = "".join(rng.choice(alphabet) for _ in range(chars))
+        history.append(json_codec.dumps({"role": "user" if i % 2 == 0 else "assistant", "content": content}))
+    return history
+
+def chat_turn(history: list[str]) -> None:
+    json_codec.dumps({"role": "user", "content": "Do you have this in a larger size?"})
+    parsed = [json_codec.loads(entry) for entry in history]
+    json_codec.dumps({"role": "assistant", "content": "Yes, sizes up to XXL are in stock."})
+    json_codec.FastJSONResponse({"message": "Message stored", "data": {"messages": parsed}})
+
+def measure(backend: str, history: list[str], iterations: int) -> float:
+    """Average CPU seconds per chat turn."""
+    json_codec.use_backend(backend)
+    for _ in range(max(1, iterations // 10)):  # warmup
+        chat_turn(history)
+    started = time.process_time()
+    for _ in range(iterations):
+        chat_turn(history)
+    return (time.process_time() - started) / iterations
+
+def main(turns: int, chars: int, iterations: int) -> None:
+    history = build_history(turns, chars)
+    size_kb = sum(len(entry.encode()) for entry in history) / 1024
+    print(f"history: {len(history)} entries, {size_kb:.0f} KiB  iterations={iterations}")
+    results = {backend: measure(backend, history, iterations) for backend in json_codec.BACKENDS}
+    for backend, seconds in results.items():
+        print(f"{backend:<8} {seconds * 1e6:10.1f} us CPU per turn")
+    before, after = results["stdlib"], results["orjson"]
+    print(f"orjson saves {(before - after) * 1e6:.1f} us per turn ({before / after:.1f}x faster)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200, help="user/assistant exchanges in the history")
+    parser.add_argument("--chars", type=int, default=600, help="characters per message")
+    parser.add_argument("--iterations", type=int, default=300)
+    args = parser.parse_args()
+    main(args.turns, args.chars, args.iterations)
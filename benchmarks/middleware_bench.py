@@ -0,0 +1,119 @@
+"""
+Throughput of the cheap endpoints (/, /health, GET /api/characters) behind the old
+BaseHTTPMiddleware rate limiter vs the pure ASGI one.
+
+Runs the app in-process through httpx's ASGITransport. Redis, Postgres and auth are
+stubbed so the numbers reflect framework + middleware overhead only; pass --redis to
+use the real limiter against the Redis from .env.
+  uv run python -m benchmarks.middleware_bench [--requests N] [--concurrency C] [--redis]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from httpx import ASGITransport, AsyncClient
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from config import settings
+from app.api import routes
+from app.auth.dependencies import verify_api_key
+from app.infrastructure import middleware
+from app.infrastructure.middleware import RateLimitMiddleware
+from app.infrastructure.rate_limit import RateLimitResult
+
+PATHS = ["/", "/health", "/api/characters"]
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """The pre-ASGI implementation (same limiter, INFO log on every request)."""
+    async def dispatch(self, request: Request, call_next):
+        ip = request.headers.get("x-forwarded-for") or request.client.host
+        middleware.logger.info(f"ip: {ip}")
+        key, limit = f"middleware:{ip}", settings.API_LIMIT
+        result = await middleware.limiter.hit(key, limit=limit)
+        if not result.allowed:
+            return JSONResponse(status_code=429, content={"detail": "Too many requests"})
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(limit)
+        response.headers["X-RateLimit-Remaining"] = str(result.remaining)
+        return response
+
+
+def _stub_dependencies(use_redis: bool) -> None:
+    class _Conn:
+        async def fetchrow(self, *args):
+            return {"?column?": 1}
+
+    class _Acquire:
+        async def __aenter__(self):
+            return _Conn()
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class _Pool:
+        def acquire(self):
+            return _Acquire()
+
+    async def fake_init_db():
+        return _Pool()
+
+    async def fake_ping():
+        return True
+
+    async def fake_characters(store_id, *, limit, cursor=None):
+        return [{"id": str(uuid.uuid4()), "agent_role": "You are a botanist.", "ttl": None}], None
+
+    routes.init_db = fake_init_db
+    routes.redis_client.ping = fake_ping
+    routes.character_service.get_character_page = fake_characters
+    if not use_redis:
+        async def allow(key, *, limit=None, window_s=None):
+            return RateLimitResult(True, 1_000_000, 0)
+        middleware.limiter.hit = allow
+
+def build_app(middleware_cls) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware_cls)
+    app.include_router(routes.router)
+    app.dependency_overrides[verify_api_key] = lambda: {"id": uuid.uuid4(), "is_admin": False, "subscription": "free"}
+    return app
+
+async def run(app: FastAPI, path: str, requests: int, concurrency: int) -> float:
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as ac:
+        remaining = iter(range(requests))
+
+        async def worker(n: int):
+            headers = {"x-forwarded-for": f"10.1.{n}.1"}
+            for _ in remaining:
+                response = await ac.get(path, headers=headers)
+                assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        return requests / (time.perf_counter() - started)
+
+async def main(requests: int, concurrency: int, use_redis: bool) -> None:
+    _stub_dependencies(use_redis)
+    apps = {
+        "BaseHTTPMiddleware": build_app(LegacyRateLimitMiddleware),
+        "pure ASGI": build_app(RateLimitMiddleware),
+    }
+    print(f"requests={requests} concurrency={concurrency} redis={'real' if use_redis else 'stubbed'}")
+    for path in PATHS:
+        results = {}
+        for name, app in apps.items():
+            await run(app, path, min(requests, 200), concurrency)  # warmup
+            results[name] = await run(app, path, requests, concurrency)
+        before, after = results["BaseHTTPMiddleware"], results["pure ASGI"]
+        print(f"{path:<16} before={before:9.0f} req/s  after={after:9.0f} req/s  ({(after / before - 1) * 100:+.1f}%)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--redis", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.redis))
@@ -0,0 +1,86 @@
+"""
+Per-request overhead of the rate limiter: old fixed window (INCR + EXPIRE) vs the
+Lua sliding window (one EVALSHA) vs HybridLimiter, which decides in process and
+syncs to Redis in the background (its sync cost is the "hybrid sync" line).
+
+Needs a reachable Redis (REDIS_HOST/REDIS_PORT from .env). Run from project root:
+  uv run python -m benchmarks.rate_limit_bench [iterations] [distinct_keys]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from redis.asyncio import Redis
+from config import settings
+from app.infrastructure.rate_limit import HybridLimiter, SlidingWindowLimiter
+
+
+async def fixed_window(r: Redis, ip: str) -> None:
+    # Baseline: the pre-Lua middleware body
+    bucket = int(time.time()) // settings.API_WINDOW
+    attempts = await r.incr(f"bench:fixed:{ip}:{bucket}")
+    if attempts == 1:
+        await r.expire(f"bench:fixed:{ip}:{bucket}", settings.API_WINDOW)
+
+async def measure(name: str, fn, iterations: int, keys: int) -> None:
+    samples: list[float] = []
+    for i in range(iterations):
+        k = i % keys
+        started = time.perf_counter()
+        await fn(f"10.0.{k // 256}.{k % 256}")
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    samples.sort()
+    p = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    print(
+        f"{name:<16} mean={statistics.fmean(samples):8.1f}us  p50={p(0.50):8.1f}us  "
+        f"p99={p(0.99):8.1f}us  max={samples[-1]:8.1f}us"
+    )
+
+async def main(iterations: int, keys: int) -> None:
+    r = Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        username=settings.REDIS_USER,
+        password=settings.REDIS_USER_PW,
+        decode_responses=True
+    )
+    # Limit high enough that every hit is recorded: we measure the cost, not the rejections
+    limiter = SlidingWindowLimiter(r, limit=iterations + 1, window_s=settings.API_WINDOW)
+
+    async def sliding(ip: str) -> None:
+        await limiter.hit(f"bench:sliding:{ip}")
+
+    await sliding("warmup")  # loads the script so the loop measures EVALSHA only
+    print(f"iterations={iterations} distinct_keys={keys}")
+    await measure("fixed INCR+EXPIRE", lambda ip: fixed_window(r, ip), iterations, keys)
+    await measure("sliding Lua", sliding, iterations, keys)
+
+    hybrid = HybridLimiter(
+        limiter,
+        timeout_s=settings.RATE_LIMIT_REDIS_TIMEOUT,
+        cooldown_s=settings.RATE_LIMIT_REDIS_COOLDOWN
+    )
+
+    async def local(ip: str) -> None:
+        await hybrid.hit(f"bench:hybrid:{ip}")
+        # Let the background sync run as it would between requests
+        await asyncio.sleep(0)
+
+    await measure("hybrid hit", local, iterations, keys)
+    started = time.perf_counter()
+    syncs = 0
+    while hybrid._pending or hybrid._inflight:
+        await hybrid.flush()
+        await asyncio.sleep(0)
+        syncs += 1
+    print(f"hybrid sync      {(time.perf_counter() - started) * 1000:8.1f}ms to drain the rest ({syncs} flushes)")
+
+    for pattern in ("bench:fixed:*", "bench:sliding:*", "bench:hybrid:*"):
+        async for key in r.scan_iter(pattern):
+            await r.delete(key)
+    await r.aclose()
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    asyncio.run(main(n, k))
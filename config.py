@@ -6,10 +6,49 @@ class Settings(BaseSettings):
     FASTWRAP_API_KEY: str = "1234"
     API_LIMIT: int = 100
     API_WINDOW: int = 10
+    API_LIMIT_KEYED: int = 1000
+    RATE_LIMIT_REDIS_TIMEOUT: float = 1.0
+    RATE_LIMIT_REDIS_COOLDOWN: float = 5.0
+    RATE_LIMIT_LOCAL_SHARE: float = 1.0
+    RATE_LIMIT_SYNC_INTERVAL: float = 1.0
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = 100000
+    RATE_LIMIT_IP_LOG_SAMPLE_RATE: float = 0.01
+    TIER_CACHE_TTL: int = 60
+    LLM_SLOT_LEASE_SECONDS: int = 120
+    LLM_GLOBAL_CONCURRENCY: int = 32
+    LLM_QUEUE_MAX_PER_TENANT: int = 50
+    LLM_QUEUE_TIMEOUT: float = 30.0
+    AUTH_CACHE_LOCAL_TTL: float = 5.0
+    AUTH_CACHE_REDIS_TTL: int = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_CACHE_TOMBSTONE_TTL: int = 10
+    BCRYPT_ROUNDS: int = 12
+    BCRYPT_WORKERS: int = 4
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""
+    LOG_FORMAT: str = "json"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_RATE: float = 0.01
     REDIS_USER: str = "default"
     REDIS_USER_PW: str = "dummy"
     REDIS_HOST: str = "redis"
     REDIS_PORT: int = 6379
+    REDIS_MODE: str = "standalone"
+    REDIS_NODES: str = ""
+    REDIS_SENTINEL_MASTER: str = "mymaster"
+    REDIS_SENTINEL_PW: Optional[str] = None
+    REDIS_MAX_CONNECTIONS: int = 100
+    REDIS_POOL_TIMEOUT: float = 2.0
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_CONNECT_TIMEOUT: float = 2.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    REDIS_RETRY_ATTEMPTS: int = 3
+    REDIS_RETRY_BACKOFF_BASE: float = 0.05
+    REDIS_RETRY_BACKOFF_CAP: float = 1.0
+    REDIS_CLIENT_CACHE: bool = False
+    REDIS_CLIENT_CACHE_PREFIXES: str = "auth:key:"
+    REDIS_CLIENT_CACHE_MAX_KEYS: int = 10000
+    REDIS_CLIENT_CACHE_TTL: float = 60.0
     PORT: int = 8555
     HOST: str = "0.0.0.0"
     MODEL: str = "gpt-4o-mini"
@@ -23,6 +62,19 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PW: str 
     DATABASE_URL: str
+    DB_POOL_MIN_SIZE: int = 2
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_ACQUIRE_TIMEOUT: float = 5.0
+    DB_STATEMENT_TIMEOUT_MS: int = 5000
+    DB_VECTOR_POOL_MIN_SIZE: int = 1
+    DB_VECTOR_POOL_MAX_SIZE: int = 5
+    DB_VECTOR_STATEMENT_TIMEOUT_MS: int = 30000
+    DATABASE_REPLICA_URLS: str = ""
+    DB_REPLICA_HEALTH_INTERVAL: float = 5.0
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_READ_YOUR_WRITES_SECONDS: float = 10.0
+    DB_STATEMENT_CACHE_SIZE: int = 1024
+    DB_MAX_INACTIVE_LIFETIME: float = 300.0
     EMBEDDING_MODEL: str = 'text-embedding-3-small'
     EMBEDDING_DIM: int = 1536
     VECTOR_CHAT_STORE_ENABLED: bool = True
@@ -31,6 +83,25 @@ class Settings(BaseSettings):
     VECTOR_CHAT_MEMORY_TOP_K_CHAT: int = 4
     VECTOR_CHAT_MEMORY_TOP_K_KB: int = 4
     VECTOR_CHAT_MEMORY_MAX_CHARS: int = 2400
+    VECTOR_BULK_BATCH_SIZE: int = 500
+    LIST_STREAM_BATCH_SIZE: int = 500
+    JSON_BACKEND: str = "orjson"
+    CHAT_HISTORY_FORMAT: str = "json"
+    CHAT_HISTORY_COMPRESS_MIN_BYTES: int = 512
+    CHAT_HISTORY_ZSTD_LEVEL: int = 3
+    CHAT_TTL_SECONDS: int = 1200
+    CHAT_ARCHIVE_ENABLED: bool = True
+    CHAT_ARCHIVE_DELAY: float = 30.0
+    CHAT_ARCHIVE_INTERVAL: float = 5.0
+    CHAT_ARCHIVE_BATCH_SIZE: int = 200
+    CHAT_ARCHIVE_LEASE: float = 60.0
+    CHAT_REHYDRATE_MAX_MESSAGES: int = 100
+    CHARACTER_EXPIRY_SWEEP_INTERVAL: float = 60.0
+    CHARACTER_EXPIRY_BATCH_SIZE: int = 500
+    PURGE_MODE: str = "archive"
+    PURGE_RETENTION_DAYS: int = 30
+    PURGE_BATCH_SIZE: int = 200
+    PURGE_INTERVAL: float = 3600.0
     model_config = ConfigDict(env_file=".env")
 
 settings = Settings()
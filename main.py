@@ -1,37 +1,35 @@
-from fastapi import FastAPI, status
+from fastapi import FastAPI, Request, status
 from config import settings
 from contextlib import asynccontextmanager
 from app.api.routes import router
-from app.infrastructure.redis_client import redis_client
-from app.infrastructure.middleware import RateLimitMiddleware
-from app.database.init import init_db, close_db
+from app.infrastructure.redis_client import redis_client, client_cache
+from app.infrastructure.middleware import RateLimitMiddleware, limiter as ip_limiter
+from app.auth.limits import request_limiter as client_limiter
+from app.database.init import init_db, open_pools, close_db
+from app.database.pool import PoolAcquireTimeout
+from app.database.replicas import run_health_checks as replica_health_checks, close_replicas
+from app.database.purge import run_purge
+from app.auth.cache import InvalidationFailed, listen_for_invalidations
+from app.characters.expiry import run_expiry_sweeper
+from app.chat.archive import run_archiver
+from app.auth import passwords
+from app.infrastructure.logging_config import setup_logging
+from app.infrastructure.json_codec import FastJSONResponse
 from pathlib import Path
-import sys
+import asyncio
 import os
 import logging
 
-# Logging (terminal and logfile)
+# Logging (terminal and logfile), written from a background thread
 PROJECT_ROOT = Path(__file__).parent
-if os.path.isdir('logs') is False:
-    os.mkdir(f'{PROJECT_ROOT}/logs')
-
-file_handler = logging.FileHandler('logs/logfile.log')
-console_handler = logging.StreamHandler(sys.stderr)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-console_handler.setFormatter(formatter)
+setup_logging(f'{PROJECT_ROOT}/logs')
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-
-if not logger.handlers:
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> None:
     try:
         logger.info("Initializing database...")
-        await init_db()
+        await open_pools()
         logger.info("Database ready!")
         logger.info ("Pinging redis...")
         await redis_client.ping()
@@ -39,8 +37,22 @@ async def lifespan(app: FastAPI) -> None:
     except Exception as e:
         logger.error(f"failed to initialize dependencies: {e}")
         raise
+    background = [
+        asyncio.create_task(listen_for_invalidations()),
+        asyncio.create_task(client_cache.run()),
+        asyncio.create_task(ip_limiter.run_sync()),
+        asyncio.create_task(client_limiter.run_sync()),
+        asyncio.create_task(replica_health_checks()),
+        asyncio.create_task(run_expiry_sweeper()),
+        asyncio.create_task(run_purge()),
+        asyncio.create_task(run_archiver()),
+    ]
     yield
     logger.info("Shutting down application...")
+    for task in background:
+        task.cancel()
+    passwords.shutdown()
+    await close_replicas()
     await close_db()
 
 app = FastAPI(
@@ -48,8 +60,27 @@ app = FastAPI(
     description="Wrapper for chatbots",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
+@app.exception_handler(PoolAcquireTimeout)
+async def pool_exhausted(request: Request, exc: PoolAcquireTimeout) -> FastJSONResponse:
+    # Saturation, not a missing key or row: repositories let it through instead of returning None
+    return FastJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database busy, retry shortly"},
+        headers={"Retry-After": "1"}
+    )
+
+@app.exception_handler(InvalidationFailed)
+async def invalidation_failed(request: Request, exc: InvalidationFailed) -> FastJSONResponse:
+    # The change was rolled back: committing it would leave stale API keys cached
+    return FastJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Auth cache unavailable, change not applied"},
+        headers={"Retry-After": "1"}
+    )
+
 app.add_middleware(RateLimitMiddleware)
 app.include_router(router)
 
@@ -13,7 +13,7 @@ async def test_character_creation_with_ttl(authenticated_user: MockUser):
             headers={ "x-api-key": authenticated_user.api_key },
             json={
                 "agent_role": "You are a standup comedian.",
-                "ttl": 1000
+                "TTL": 1000
             }
         )
 
@@ -23,7 +23,8 @@ async def test_character_creation_with_ttl(authenticated_user: MockUser):
     assert "data" in response_data, f"'data' field is missing from payload: {response_data}"
     assert "agent_role" in response_data["data"], f"'agent_role' field is missing from payload: {response_data}"
     assert "id" in response_data["data"], f"'id' field is missing from payload: {response_data}"
-    assert "ttl" in response_data["data"], f"'TTL' field is missing from payload: {response_data}"
+    assert response_data["data"].get("ttl") == 1000, f"'TTL' not stored: {response_data}"
+    assert response_data["data"].get("expires_at") is not None, f"'expires_at' not set from TTL: {response_data}"
 
 @pytest.mark.asyncio(loop_scope="session")
 async def test_character_creation_no_ttl(authenticated_user: MockUser):
@@ -43,6 +44,8 @@ async def test_character_creation_no_ttl(authenticated_user: MockUser):
     assert "agent_role" in response_data["data"], f"'agent_role' field is missing from payload: {response_data}"
     assert response_data["data"]["agent_role"] == authenticated_user.character
     assert "id" in response_data["data"], f"'id' field is missing from payload: {response_data}"
+    assert "expires_at" in response_data["data"], f"'expires_at' field is missing from payload: {response_data}"
+    assert response_data["data"]["expires_at"] is None
 
 @pytest.mark.asyncio(loop_scope="session")
 async def test_character_get(authenticated_user: MockUser):
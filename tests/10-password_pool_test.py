@@ -0,0 +1,44 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.auth import passwords
+from app.infrastructure import metrics
+
+
+@pytest.fixture(autouse=True)
+def _cheap_bcrypt(monkeypatch):
+    # Minimum cost keeps the test fast; behaviour is identical
+    monkeypatch.setattr(passwords.settings, "BCRYPT_ROUNDS", 4)
+    metrics.reset()
+    yield
+    passwords.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_roundtrip():
+    hashed = await passwords.hash_password("Secret123!x")
+
+    assert hashed.startswith("$2b$04$")
+    assert await passwords.verify_password("Secret123!x", hashed) is True
+    assert await passwords.verify_password("wrong", hashed) is False
+
+
+@pytest.mark.asyncio
+async def test_bcrypt_runs_off_the_event_loop(monkeypatch):
+    loop_thread = threading.get_ident()
+    seen = []
+    original = passwords._hash
+
+    def spy(password):
+        seen.append(threading.get_ident())
+        return original(password)
+
+    monkeypatch.setattr(passwords, "_hash", spy)
+    await asyncio.gather(*(passwords.hash_password("Secret123!x") for _ in range(3)))
+
+    assert seen and all(t != loop_thread for t in seen)
+    snap = metrics.snapshot()
+    assert snap["gauges"]["bcrypt_queue_depth"] == 0
+    assert snap["timers_ms"]["bcrypt_run{op=hash}"]["count"] == 3
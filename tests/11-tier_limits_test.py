@@ -0,0 +1,103 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException, Request
+
+from app.auth import dependencies, limits
+from app.clients import tiers
+from app.infrastructure.rate_limit import RateLimitResult
+from config import settings
+
+
+@pytest.fixture(autouse=True)
+def _fresh_tiers(monkeypatch):
+    calls = []
+
+    async def fake_select_tiers():
+        calls.append(1)
+        return [
+            {"name": "free", "request_limit": 2, "window_seconds": 60, "max_concurrent_llm": 1},
+            {"name": "pro", "request_limit": 20, "window_seconds": 60, "max_concurrent_llm": 5},
+        ]
+
+    monkeypatch.setattr(tiers.crud, "db_select_tiers", fake_select_tiers)
+    tiers.clear()
+    yield calls
+    tiers.clear()
+
+
+@pytest.mark.asyncio
+async def test_tier_table_is_cached(_fresh_tiers):
+    pro = await tiers.get_tier("pro")
+    again = await tiers.get_tier("pro")
+
+    assert pro.request_limit == 20 and again == pro
+    assert len(_fresh_tiers) == 1, "tier table must not be queried per request"
+
+
+@pytest.mark.asyncio
+async def test_unknown_subscription_falls_back_to_free():
+    tier = await tiers.get_tier("does-not-exist")
+    assert tier.name == "free"
+
+
+@pytest.mark.asyncio
+async def test_check_request_uses_client_key_and_tier(monkeypatch):
+    seen = {}
+
+    async def fake_hit(key, *, limit=None, window_s=None):
+        seen.update(key=key, limit=limit, window_s=window_s)
+        return RateLimitResult(allowed=False, remaining=0, retry_after_ms=1500)
+
+    monkeypatch.setattr(limits.request_limiter, "hit", fake_hit)
+    client_id = uuid.uuid4()
+
+    with pytest.raises(HTTPException) as exc:
+        await limits.check_request({"id": client_id, "subscription": "pro"})
+
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "2"
+    assert seen == {"key": f"ratelimit:client:{client_id}", "limit": 20, "window_s": 60}
+
+
+@pytest.mark.asyncio
+async def test_unverified_keys_count_against_the_anonymous_ip_window(monkeypatch):
+    seen, lookups = [], []
+
+    async def exhausted(key, *, limit=None, window_s=None):
+        seen.append((key, limit))
+        return RateLimitResult(allowed=False, remaining=0, retry_after_ms=1000)
+
+    async def not_cached(api_key):
+        return None
+
+    async def lookup(api_key):
+        lookups.append(api_key)
+        return None
+
+    monkeypatch.setattr(limits.ip_limiter, "hit", exhausted)
+    monkeypatch.setattr(dependencies.auth_cache, "lookup", not_cached)
+    monkeypatch.setattr(dependencies.crud, "db_select_client_by_key", lookup)
+    request = Request({"type": "http", "state": {"client_ip": "10.0.0.1"}})
+
+    with pytest.raises(HTTPException) as exc:
+        await dependencies.verify_api_key(request, "fn_made_up")
+
+    assert exc.value.status_code == 429
+    assert seen == [("middleware:{10.0.0.1}", settings.API_LIMIT)]
+    # Over the limit, the key is not even looked up
+    assert lookups == []
+
+
+@pytest.mark.asyncio
+async def test_llm_slot_rejects_when_tier_cap_reached(monkeypatch):
+    async def full(key, *, cap):
+        assert cap == 1
+        return None
+
+    monkeypatch.setattr(limits.llm_limiter, "acquire", full)
+
+    with pytest.raises(HTTPException) as exc:
+        async with limits.llm_slot({"id": uuid.uuid4(), "subscription": "free"}):
+            pass
+    assert exc.value.status_code == 429
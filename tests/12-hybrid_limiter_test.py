@@ -0,0 +1,141 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+
+from app.infrastructure import redis_client
+from app.infrastructure.rate_limit import HybridLimiter, SlidingWindowLimiter
+
+
+class FakePipe:
+    def __init__(self, remote):
+        self.remote = remote
+        self.queued = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self):
+        await asyncio.sleep(self.remote.delay)
+        if self.remote.fail:
+            raise ConnectionError("redis down")
+        return [await self.remote.record(key, hits) for key, hits in self.queued]
+
+
+class FakeRemote:
+    """Records synced hits; `shared` is what other processes already put in each window."""
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.limit = 3
+        self.window_s = 60
+        self.delay = delay
+        self.fail = fail
+        self.shared = {}
+        self.recorded = {}
+        self.redis = type("R", (), {"pipeline": lambda _, transaction=False: FakePipe(self)})()
+
+    async def hit(self, key, *, limit=None, window_s=None):
+        raise AssertionError("requests must not wait on Redis")
+
+    async def record(self, key, hits, *, window_s=None, age_ms=0, client=None):
+        if client is not None:
+            client.queued.append((key, hits))
+            return client
+        self.recorded[key] = self.recorded.get(key, 0) + hits
+        return [self.shared.get(key, 0) + self.recorded[key], 30_000]
+
+
+def _limiter(remote):
+    return HybridLimiter(remote, timeout_s=0.01, cooldown_s=60, max_keys=10)
+
+
+@pytest.mark.asyncio
+async def test_hits_never_wait_on_redis():
+    remote = FakeRemote(delay=1.0)
+    limiter = _limiter(remote)
+
+    start = time.monotonic()
+    results = [await limiter.hit("k") for _ in range(4)]
+
+    assert time.monotonic() - start < 0.1
+    assert [r.allowed for r in results] == [True, True, True, False]
+    # The background sync timed out, so Redis is skipped during the cooldown
+    await limiter._flushing
+    assert limiter._remote_down_until > time.monotonic()
+
+
+@pytest.mark.asyncio
+async def test_synced_shared_window_denies_locally():
+    remote = FakeRemote()
+    remote.shared = {"k": 2}
+    limiter = _limiter(remote)
+
+    assert (await limiter.hit("k")).allowed
+    await limiter._flushing
+    # Other processes filled the window: denied without asking Redis again
+    result = await limiter.hit("k")
+    assert not result.allowed and 29_000 < result.retry_after_ms <= 30_000
+    assert remote.recorded == {"k": 1}
+
+
+@pytest.mark.asyncio
+async def test_locally_admitted_hits_are_synced_in_batches():
+    remote = FakeRemote(fail=True)
+    limiter = _limiter(remote)
+    await limiter.hit("a")
+    await limiter._flushing
+    # Redis is skipped during the cooldown; these hits wait for the next sync
+    await limiter.hit("a")
+    await limiter.hit("b")
+    assert limiter._flushing.done() and limiter._pending == {("a", 60): 1, ("b", 60): 1}
+
+    # Redis is back once the cooldown elapses
+    limiter._remote_down_until = 0.0
+    remote.fail = False
+    await limiter.flush()
+
+    assert remote.recorded == {"a": 1, "b": 1}
+    assert limiter._pending == {} and limiter._inflight == {} and limiter._unsynced_since == {}
+    assert limiter._shared[("a", 60)][0] == 1
+
+
+@pytest.mark.asyncio
+async def test_unsynced_hits_count_until_they_leave_the_window():
+    remote = FakeRemote(fail=True)
+    limiter = _limiter(remote)
+    limiter._remote_down_until = time.monotonic() + 60
+    limiter.local_share = 10.0  # the bucket alone would admit more
+
+    assert [(await limiter.hit("k")).allowed for _ in range(4)] == [True, True, True, False]
+
+    # Redis stayed down for a whole window: those hits no longer count
+    limiter._unsynced_since[("k", 60)] -= 60
+    assert (await limiter.hit("k")).allowed
+
+
+@pytest.mark.asyncio
+async def test_record_script_reports_the_shared_window():
+    """Needs a reachable Redis (REDIS_HOST/REDIS_PORT); runs the Lua script for real."""
+    client = await redis_client.node_client(decode_responses=True)
+    try:
+        await client.ping()
+    except Exception:
+        await client.aclose()
+        pytest.skip("Redis not reachable")
+    key = f"test:{uuid.uuid4()}"
+    remote = SlidingWindowLimiter(client, limit=3, window_s=60)
+    try:
+        count, expires_ms = await remote.record(key, 2)
+        assert count == 2 and 59_000 < expires_ms <= 60_000
+        # Synced late: stamped when admitted, so they leave the window sooner
+        count, expires_ms = await remote.record(key, 1, age_ms=30_000)
+        assert count == 3 and 29_000 < expires_ms <= 30_000
+        # Admitted a whole window ago: nothing to add
+        count, _ = await remote.record(key, 5, age_ms=60_000)
+        assert count == 3 and await client.zcard(key) == 3
+    finally:
+        await client.delete(key)
+        await client.aclose()
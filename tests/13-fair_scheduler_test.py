@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from app.agents.scheduler import FairScheduler, SchedulerBusy
+from app.infrastructure import metrics
+
+
+@pytest.mark.asyncio
+async def test_weighted_share_under_contention():
+    scheduler = FairScheduler(1, max_queue_per_tenant=100, queue_timeout_s=5)
+    order: list[str] = []
+
+    async def call(tenant: str, weight: float):
+        async with scheduler.slot(tenant, weight=weight):
+            order.append(tenant)
+            await asyncio.sleep(0)
+
+    async with scheduler.slot("warmup"):
+        tasks = [asyncio.create_task(call("noisy", 1)) for _ in range(20)]
+        tasks += [asyncio.create_task(call("paying", 4)) for _ in range(20)]
+        await asyncio.sleep(0)
+
+    await asyncio.gather(*tasks)
+
+    first = order[:15]
+    assert first.count("paying") == 12 and first.count("noisy") == 3
+    assert len(order) == 40
+
+
+@pytest.mark.asyncio
+async def test_busy_tenant_does_not_starve_a_newcomer():
+    scheduler = FairScheduler(1, max_queue_per_tenant=100, queue_timeout_s=5)
+    order: list[str] = []
+
+    async def call(tenant: str):
+        async with scheduler.slot(tenant):
+            order.append(tenant)
+            await asyncio.sleep(0)
+
+    async with scheduler.slot("warmup"):
+        tasks = [asyncio.create_task(call("noisy")) for _ in range(30)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call("quiet")))
+        await asyncio.sleep(0)
+
+    await asyncio.gather(*tasks)
+
+    assert order.index("quiet") <= 2
+
+
+@pytest.mark.asyncio
+async def test_full_tenant_queue_is_rejected():
+    scheduler = FairScheduler(1, max_queue_per_tenant=2, queue_timeout_s=5)
+
+    async def call(tenant: str):
+        async with scheduler.slot(tenant):
+            await asyncio.sleep(0)
+
+    async with scheduler.slot("t"):
+        queued = [asyncio.create_task(call("t")) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerBusy):
+            async with scheduler.slot("t"):
+                pass
+        # Other tenants still queue normally
+        other = asyncio.create_task(call("other"))
+        await asyncio.sleep(0)
+
+    await asyncio.gather(*queued, other)
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_frees_the_place_and_records_wait():
+    metrics.reset()
+    scheduler = FairScheduler(1, max_queue_per_tenant=10, queue_timeout_s=0.05)
+
+    async with scheduler.slot("t", label="free"):
+        with pytest.raises(SchedulerBusy):
+            async with scheduler.slot("t", label="free"):
+                pass
+
+    assert scheduler._queued == 0 and scheduler._in_flight == 0
+    async with scheduler.slot("t", label="free"):
+        pass
+
+    snap = metrics.snapshot()
+    assert snap["timers_ms"]["llm_queue_wait{tier=free}"]["count"] == 2
+    assert snap["counters"]["llm_queue_rejected{reason=timeout}"] == 1
@@ -0,0 +1,57 @@
+import json
+import logging
+import queue
+
+from app.infrastructure import metrics
+from app.infrastructure.logging_config import (
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    SamplingFilter,
+    parse_levels,
+)
+
+
+def _record(msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    line = JsonFormatter().format(_record(store_id="abc"))
+    entry = json.loads(line)
+
+    assert entry["msg"] == "hello world"
+    assert entry["level"] == "INFO" and entry["logger"] == "app.test"
+    assert entry["store_id"] == "abc"
+    assert "sample_rate" not in entry and "args" not in entry
+
+
+def test_sampling_filter():
+    f = SamplingFilter()
+    assert f.filter(_record())
+    assert f.filter(_record(sample_rate=1.0))
+    assert not f.filter(_record(sample_rate=0.0))
+    kept = sum(f.filter(_record(sample_rate=0.1)) for _ in range(5000))
+    assert 300 < kept < 700
+
+
+def test_queue_handler_never_blocks_and_counts_drops():
+    metrics.reset()
+    q = queue.Queue(maxsize=1)
+    handler = NonBlockingQueueHandler(q)
+
+    handler.handle(_record())
+    handler.handle(_record())
+
+    queued = q.get_nowait()
+    assert queued.msg == "hello world" and queued.args is None
+    assert metrics.snapshot()["counters"]["log_records_dropped"] == 1
+
+
+def test_parse_levels():
+    assert parse_levels("") == {}
+    assert parse_levels("app.chat=debug, uvicorn.access = WARNING") == {
+        "app.chat": "DEBUG",
+        "uvicorn.access": "WARNING",
+    }
@@ -0,0 +1,108 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.database.pool import InstrumentedPool, PoolAcquireTimeout
+from app.infrastructure import metrics
+from .conftest import FakeConnection, FakePool
+
+
+def _asyncpg_pool(size):
+    return FakePool(*(FakeConnection() for _ in range(size)))
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.mark.asyncio
+async def test_acquire_records_wait_and_saturation():
+    pool = InstrumentedPool(_asyncpg_pool(2), name="oltp", acquire_timeout_s=1)
+
+    async with pool.acquire() as conn:
+        assert isinstance(conn, FakeConnection)
+        gauges = metrics.snapshot()["gauges"]
+        assert gauges["db_pool_in_use{pool=oltp}"] == 1
+        assert gauges["db_pool_saturation{pool=oltp}"] == 0.5
+
+    snap = metrics.snapshot()
+    assert snap["gauges"]["db_pool_in_use{pool=oltp}"] == 0
+    assert snap["timers_ms"]["db_pool_wait{pool=oltp}"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_exhausted_pool_times_out_instead_of_queueing_forever():
+    pool = InstrumentedPool(_asyncpg_pool(1), name="oltp", acquire_timeout_s=0.05)
+
+    async with pool.acquire():
+        with pytest.raises(PoolAcquireTimeout):
+            async with pool.acquire():
+                pass
+        assert metrics.snapshot()["gauges"]["db_pool_waiting{pool=oltp}"] == 0
+
+    assert metrics.snapshot()["counters"]["db_pool_acquire_timeouts{pool=oltp}"] == 1
+    # The held connection went back to the pool
+    async with pool.acquire():
+        pass
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_saturated_pool_is_a_503_not_an_invalid_key(monkeypatch):
+    from httpx import ASGITransport, AsyncClient
+    from app.auth import dependencies
+    from app.clients import repository
+    from main import app
+
+    exhausted = InstrumentedPool(_asyncpg_pool(0), name="oltp", acquire_timeout_s=0.01)
+
+    async def saturated(*args, **kwargs):
+        return exhausted
+
+    async def unlimited(ip):
+        pass
+
+    monkeypatch.setattr(repository, "init_db", saturated)
+    monkeypatch.setattr(repository, "read_db", saturated)
+    monkeypatch.setattr(dependencies, "check_unverified", unlimited)
+
+    with pytest.raises(PoolAcquireTimeout):
+        await repository.crud_management().db_select_client_by_key(f"fw_{uuid.uuid4().hex}")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        resp = await ac.get("/api/characters", headers={"x-api-key": f"fw_{uuid.uuid4().hex}"})
+
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_callers_share_one_pool_per_name(monkeypatch):
+    from app.database import init
+
+    created: list[str] = []
+    schema_runs: list[str] = []
+
+    async def fake_create(dsn, name, attempts=30, delay_s=1.0):
+        created.append(name)
+        await asyncio.sleep(0.01)
+        return InstrumentedPool(_asyncpg_pool(2), name=name, acquire_timeout_s=1)
+
+    async def fake_ensure_schema(pool):
+        schema_runs.append(pool.name)
+
+    monkeypatch.setattr(init, "_pools", {})
+    monkeypatch.setattr(init, "_schema_ready", False)
+    monkeypatch.setattr(init, "_lock", asyncio.Lock())
+    monkeypatch.setattr(init, "_create_pool_with_retry", fake_create)
+    monkeypatch.setattr(init, "_ensure_schema", fake_ensure_schema)
+
+    pools = await asyncio.gather(*(init.init_db() for _ in range(5)), init.init_db(init.VECTOR))
+
+    assert created == ["oltp", "vector"]
+    assert len({id(p) for p in pools[:5]}) == 1
+    assert pools[5].name == "vector" and pools[5] is not pools[0]
+    assert schema_runs == ["oltp"]
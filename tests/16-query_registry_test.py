@@ -0,0 +1,67 @@
+import pytest
+
+from app.database import queries
+from app.database.init import init_db
+from app.infrastructure import metrics
+from .conftest import FakeConnection
+
+NAME = "tests.echo"
+SQL = "SELECT $1::int"
+
+
+class FakeConn(FakeConnection):
+    def __init__(self):
+        super().__init__()
+        self.cached = []
+        self.queries = []
+
+    async def prepare_cached(self, sql):
+        self.cached.append(sql)
+
+    async def fetchval(self, sql, *args):
+        self.queries.append(sql)
+        return args[0]
+
+
+@pytest.fixture(autouse=True)
+def _registered(monkeypatch):
+    # Restored afterwards, so real pools never prepare the test statement
+    monkeypatch.setitem(queries.QUERIES, NAME, SQL)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.mark.asyncio
+async def test_prepare_all_covers_the_registry():
+    conn = FakeConn()
+    await queries.prepare_all(conn)
+
+    assert conn.cached == list(queries.QUERIES.values())
+    assert metrics.snapshot()["counters"]["db_statements_prepared{query=tests.echo}"] == 1
+
+
+@pytest.mark.asyncio
+async def test_calls_run_the_registered_sql_and_are_timed():
+    conn = FakeConn()
+
+    assert await queries.fetchval(conn, NAME, 1) == 1
+    assert await queries.fetchval(conn, NAME, 2) == 2
+
+    assert conn.queries == [SQL, SQL]
+    assert metrics.snapshot()["timers_ms"]["db_query{query=tests.echo}"]["count"] == 2
+
+
+def test_names_cannot_be_reused_for_other_sql():
+    assert queries.register(NAME, SQL) == NAME
+    with pytest.raises(ValueError):
+        queries.register(NAME, "SELECT 2")
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_statements_outlive_pool_acquisitions():
+    pool = await init_db()
+    for i in range(3):
+        async with pool.acquire() as conn:
+            await conn.prepare_cached(SQL)
+            assert await queries.fetchval(conn, NAME, i) == i
@@ -0,0 +1,113 @@
+import pytest
+
+from app.database import replicas
+from app.database.replicas import _Replica
+from .conftest import FakeConnection, FakePool
+
+
+class ReplicaConn(FakeConnection):
+    def __init__(self, lag, streaming):
+        super().__init__()
+        self.lag = lag
+        self.streaming = streaming
+
+    async def fetchrow(self, sql, timeout=None):
+        if isinstance(self.lag, Exception):
+            raise self.lag
+        return {"streaming": self.streaming, "lag": self.lag}
+
+
+class ReplicaPool(FakePool):
+    def __init__(self, label, conn, in_use=0):
+        super().__init__(conn)
+        self.label = label
+        self.in_use = in_use
+
+
+def _replica(index, *, healthy=True, in_use=0, lag=0.0, streaming=True):
+    replica = _Replica(index, f"postgres://replica{index}")
+    replica.healthy = healthy
+    pool = ReplicaPool(replica.label, ReplicaConn(lag, streaming), in_use=in_use)
+    replica.pools = {"oltp": pool, "vector": pool}
+    return replica
+
+
+@pytest.fixture
+def primary(monkeypatch):
+    async def fake_init_db(name="oltp"):
+        return "primary"
+
+    monkeypatch.setattr(replicas, "init_db", fake_init_db)
+    monkeypatch.setattr(replicas, "_recent_writes", {})
+
+
+@pytest.mark.asyncio
+async def test_without_replicas_reads_use_the_primary(monkeypatch, primary):
+    monkeypatch.setattr(replicas, "_replicas", [])
+    assert await replicas.read_db() == "primary"
+
+
+@pytest.mark.asyncio
+async def test_reads_skip_unhealthy_replicas(monkeypatch, primary):
+    monkeypatch.setattr(replicas, "_replicas", [_replica(0, healthy=False), _replica(1)])
+    for _ in range(4):
+        pool = await replicas.read_db("vector")
+        assert pool.label == "replica1"
+
+    monkeypatch.setattr(replicas, "_replicas", [_replica(0, healthy=False)])
+    assert await replicas.read_db() == "primary"
+
+
+@pytest.mark.asyncio
+async def test_least_busy_replica_wins(monkeypatch, primary):
+    monkeypatch.setattr(replicas, "_replicas", [_replica(0, in_use=3), _replica(1, in_use=1), _replica(2, in_use=2)])
+    for _ in range(3):
+        assert (await replicas.read_db()).label == "replica1"
+
+
+@pytest.mark.asyncio
+async def test_read_your_writes(monkeypatch, primary):
+    monkeypatch.setattr(replicas, "_replicas", [_replica(0)])
+
+    replicas.mark_write("client-a")
+
+    assert await replicas.read_db(scope="client-a") == "primary"
+    assert (await replicas.read_db(scope="client-b")).label == "replica0"
+    with replicas.primary_reads():
+        assert await replicas.read_db(scope="client-b") == "primary"
+    assert (await replicas.read_db(scope="client-b")).label == "replica0"
+
+
+@pytest.mark.asyncio
+async def test_health_check_tracks_lag_and_errors(monkeypatch):
+    monkeypatch.setattr(replicas.settings, "DB_REPLICA_MAX_LAG_SECONDS", 5.0)
+    caught_up, lagging, down = _replica(0, healthy=False), _replica(1, lag=30.0), _replica(2, lag=OSError("refused"))
+    monkeypatch.setattr(replicas, "_replicas", [caught_up, lagging, down])
+
+    await replicas.check_replicas()
+
+    assert caught_up.healthy is True
+    assert lagging.healthy is False and lagging.lag_s == 30.0
+    assert down.healthy is False
+
+
+@pytest.mark.asyncio
+async def test_replica_that_stopped_streaming_is_unhealthy(monkeypatch):
+    # Its WAL receiver is gone: it has replayed everything it received, so lag reads 0
+    disconnected = _replica(0, lag=0, streaming=False)
+    monkeypatch.setattr(replicas, "_replicas", [disconnected])
+
+    await replicas.check_replicas()
+
+    assert disconnected.healthy is False and disconnected.lag_s == 0.0
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_lag_query_runs_on_a_server_that_is_not_a_standby():
+    from app.database.init import init_db
+
+    pool = await init_db()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(replicas.LAG_SQL)
+
+    assert row["streaming"] is True and row["lag"] is None
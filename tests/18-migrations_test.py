@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from app.database import migrate
+from .conftest import FakeConnection, FakePool
+
+
+class SharedLock:
+    """The advisory lock, as seen by every process."""
+    holder = None
+
+
+class FakeConn(FakeConnection):
+    def __init__(self, version, lock=None):
+        super().__init__()
+        self.version = version
+        self.lock = lock or SharedLock()
+        self.executed: list[str] = []
+        self.transactional: list[bool] = []
+
+    async def fetchval(self, sql, *args):
+        if "pg_try_advisory_lock" in sql:
+            self.executed.append(sql)
+            self.transactional.append(self.in_transaction)
+            if self.lock.holder in (None, self):
+                self.lock.holder = self
+                return True
+            return False
+        if "to_regclass" in sql:
+            return "app_schema" if self.version else None
+        return self.version
+
+    async def execute(self, sql, *args):
+        self.executed.append(sql.strip())
+        self.transactional.append(self.in_transaction)
+        if "pg_advisory_unlock" in sql:
+            self.lock.holder = None
+        elif sql.startswith("INSERT INTO app_schema"):
+            self.version = args[0]
+        elif "pg_advisory" not in sql and "statement_timeout" not in sql and "CREATE TABLE" in sql:
+            self.version = max(self.version, migrate.BASELINE_VERSION)
+
+
+@pytest.fixture
+def migrations_dir(tmp_path):
+    (tmp_path / "0010_add_column.sql").write_text("ALTER TABLE t ADD COLUMN c INT;\nUPDATE t SET c = 1;\n")
+    (tmp_path / "0011_index.sql").write_text(
+        "-- migrate: no-transaction\n"
+        "-- rebuild without blocking writes\n"
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_t_c;\n"
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_t_c\n    ON t (c);\n"
+    )
+    return tmp_path
+
+
+def test_discover_orders_and_validates(tmp_path, migrations_dir):
+    assert [m.version for m in migrate.discover(migrations_dir)] == [10, 11]
+    assert migrate.latest_version(migrate.discover(migrations_dir)) == 11
+
+    (tmp_path / "0010_again.sql").write_text("SELECT 1;")
+    with pytest.raises(ValueError):
+        migrate.discover(tmp_path)
+
+
+def test_shipped_migrations_are_valid():
+    migrations = migrate.discover()
+    assert migrations and migrations[0].version == migrate.BASELINE_VERSION + 1
+
+
+def test_split_statements_for_no_transaction_files(migrations_dir):
+    sql = (migrations_dir / "0011_index.sql").read_text()
+    assert migrate.split_statements(sql) == [
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_t_c",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_t_c\n    ON t (c)",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_pending_migrations_run_under_the_advisory_lock(migrations_dir):
+    conn = FakeConn(version=10)
+
+    assert await migrate.migrate(FakePool(conn), migrations_dir) == 11
+
+    assert conn.executed[1] == "SELECT pg_try_advisory_lock($1)"
+    assert conn.executed[-2] == "SELECT pg_advisory_unlock($1)"
+    assert conn.lock.holder is None
+    concurrent = [i for i, sql in enumerate(conn.executed) if "CONCURRENTLY" in sql]
+    assert len(concurrent) == 2
+    assert not any(conn.transactional[i] for i in concurrent), "CONCURRENTLY must run outside a transaction"
+    assert not any("ADD COLUMN" in sql for sql in conn.executed), "applied migrations must not run again"
+
+
+@pytest.mark.asyncio
+async def test_second_runner_polls_for_the_lock(migrations_dir, monkeypatch):
+    monkeypatch.setattr(migrate, "LOCK_RETRY_INTERVAL", 0.01)
+    lock = SharedLock()
+    # Another process is migrating (e.g. building an index CONCURRENTLY)
+    lock.holder = FakeConn(version=10, lock=lock)
+    conn = FakeConn(version=10, lock=lock)
+
+    waiting = asyncio.create_task(migrate.migrate(FakePool(conn), migrations_dir))
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+    # It never blocks inside Postgres, where it would hold a snapshot the index build waits for
+    assert "SELECT pg_advisory_lock($1)" not in conn.executed
+    assert conn.executed.count("SELECT pg_try_advisory_lock($1)") > 1
+
+    # The other process finishes and releases the lock
+    conn.version = 11
+    lock.holder = None
+    assert await asyncio.wait_for(waiting, timeout=1) == 11
+    assert not any("ADD COLUMN" in sql or "CONCURRENTLY" in sql for sql in conn.executed)
+    assert lock.holder is None
+
+
+@pytest.mark.asyncio
+async def test_fresh_database_gets_baseline_then_migrations(migrations_dir):
+    conn = FakeConn(version=0)
+
+    assert await migrate.migrate(FakePool(conn), migrations_dir) == 11
+
+    baseline = next(i for i, sql in enumerate(conn.executed) if "CREATE TABLE IF NOT EXISTS app_schema" in sql)
+    add_column = next(i for i, sql in enumerate(conn.executed) if "ADD COLUMN c" in sql)
+    assert baseline < add_column
+    assert conn.transactional[baseline] and conn.transactional[add_column]
+
+
+@pytest.mark.asyncio
+async def test_up_to_date_database_skips_the_lock(migrations_dir):
+    conn = FakeConn(version=11)
+
+    assert await migrate.migrate(FakePool(conn), migrations_dir) == 11
+    assert conn.executed == []
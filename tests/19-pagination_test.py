@@ -0,0 +1,64 @@
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.database import pagination
+
+
+def _rows(n):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [{"id": uuid.uuid4(), "created_at": start + timedelta(seconds=i), "n": i} for i in range(n)]
+
+
+def test_cursor_round_trip():
+    row = _rows(1)[0]
+    assert pagination.decode_cursor(pagination.encode_cursor(row)) == (row["created_at"], row["id"])
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "W1060", pagination.encode_cursor(_rows(1)[0])[:-4]])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        pagination.decode_cursor(cursor)
+
+
+def test_split_page_uses_the_extra_row():
+    rows = _rows(4)
+
+    page, cursor = pagination.split_page(rows, 3)
+    assert page == rows[:3]
+    assert pagination.decode_cursor(cursor) == (rows[2]["created_at"], rows[2]["id"])
+
+    assert pagination.split_page(rows, 4) == (rows, None)
+
+
+@pytest.mark.asyncio
+async def test_stream_ndjson_walks_every_page():
+    rows = _rows(7)
+    calls = []
+
+    async def fetch_page(after, limit):
+        calls.append(after)
+        remaining = [r for r in rows if after is None or (r["created_at"], r["id"]) > after]
+        return remaining[:limit]
+
+    body = b"".join([chunk async for chunk in pagination.stream_ndjson(fetch_page, batch_size=3)])
+
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    assert [line["n"] for line in lines] == list(range(7))
+    assert lines[0]["id"] == str(rows[0]["id"])
+    assert calls[0] is None and len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_ndjson_aborts_when_a_page_fails():
+    pages = [_rows(2), None]
+
+    async def fetch_page(after, limit):
+        return pages.pop(0)
+
+    stream = pagination.stream_ndjson(fetch_page, batch_size=2)
+    assert await stream.__anext__()
+    with pytest.raises(RuntimeError):
+        await stream.__anext__()
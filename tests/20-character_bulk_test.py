@@ -0,0 +1,128 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from app.characters import repository as repo_mod
+from app.models import schemas
+from .conftest import FakeConnection, FakePool
+
+CLIENT_ID = str(uuid.uuid4())
+
+
+class FakeConn(FakeConnection):
+    def __init__(self, existing=(), fail=False):
+        super().__init__()
+        self.existing = set(existing)
+        self.fail = fail
+        self.calls: list[str] = []
+        self.ids: list[list] = []
+
+    async def fetch(self, sql, client_id, ids, *columns):
+        assert self.in_transaction, "bulk statements must share one transaction"
+        verb = sql.split()[0]
+        self.calls.append(verb)
+        self.ids.append(list(ids))
+        if self.fail and verb == "UPDATE":
+            raise repo_mod.asyncpg.PostgresError("boom")
+        now = datetime.now(timezone.utc)
+        if verb == "INSERT":
+            roles, ttls = columns
+            return [
+                {"id": i, "client_id": client_id, "agent_role": r, "ttl": t, "created_at": now, "deleted_at": None}
+                for i, r, t in zip(ids, roles, ttls)
+            ]
+        if "deleted_at = now()" in sql:
+            return [{"id": i} for i in ids if i in self.existing]
+        roles, ttls = columns
+        return [
+            {"id": i, "client_id": client_id, "agent_role": r, "ttl": t, "created_at": now, "deleted_at": None}
+            for i, r, t in zip(ids, roles, ttls) if i in self.existing
+        ]
+
+
+@pytest.fixture
+def use_conn(monkeypatch):
+    writes = []
+    monkeypatch.setattr(repo_mod, "mark_write", writes.append)
+
+    def _use(conn):
+        async def fake_init_db(name="oltp"):
+            return FakePool(conn)
+
+        monkeypatch.setattr(repo_mod, "init_db", fake_init_db)
+        return writes
+
+    return _use
+
+
+def test_request_requires_between_one_and_1000_items():
+    with pytest.raises(ValidationError):
+        schemas.CharacterBulkRequest()
+    with pytest.raises(ValidationError):
+        schemas.CharacterBulkRequest(delete=[str(uuid.uuid4()) for _ in range(1001)])
+
+
+@pytest.mark.asyncio
+async def test_bulk_reports_per_item_results(use_conn):
+    existing, missing, doomed = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    conn = FakeConn(existing=[existing, doomed])
+    writes = use_conn(conn)
+
+    results = await repo_mod.crud_management().db_bulk_characters(
+        CLIENT_ID,
+        [schemas.ServiceRole(agent_role="a"), schemas.ServiceRole(agent_role="b", TTL=60)],
+        [
+            schemas.CharacterBulkUpdate(id=str(existing), agent_role="c"),
+            schemas.CharacterBulkUpdate(id=str(missing), agent_role="d"),
+            schemas.CharacterBulkUpdate(id=str(existing), agent_role="e"),
+            schemas.CharacterBulkUpdate(id="x" * 36, agent_role="f"),
+        ],
+        [str(doomed), str(uuid.uuid4())],
+    )
+
+    assert conn.calls == ["INSERT", "UPDATE", "UPDATE"], "one statement per kind of mutation"
+    assert [r["status"] for r in results["create"]] == [201, 201]
+    assert [r["data"]["agent_role"] for r in results["create"]] == ["a", "b"]
+    assert [r["status"] for r in results["update"]] == [200, 404, 409, 400]
+    assert results["update"][0]["data"]["agent_role"] == "c"
+    assert [r["status"] for r in results["delete"]] == [204, 404]
+    assert writes == [uuid.UUID(CLIENT_ID)]
+
+
+@pytest.mark.asyncio
+async def test_database_error_fails_the_whole_batch(use_conn):
+    writes = use_conn(FakeConn(fail=True))
+
+    results = await repo_mod.crud_management().db_bulk_characters(
+        CLIENT_ID,
+        [schemas.ServiceRole(agent_role="a")],
+        [],
+        [str(uuid.uuid4())],
+    )
+
+    assert results is None
+    assert writes == []
+
+
+@pytest.mark.asyncio
+async def test_repeated_and_contradicting_ids_conflict(use_conn):
+    kept, both, twice = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    conn = FakeConn(existing=[kept, both, twice])
+    use_conn(conn)
+
+    results = await repo_mod.crud_management().db_bulk_characters(
+        CLIENT_ID,
+        [],
+        [
+            schemas.CharacterBulkUpdate(id=str(kept), agent_role="a"),
+            schemas.CharacterBulkUpdate(id=str(both), agent_role="b"),
+        ],
+        [str(twice), str(both), str(twice)],
+    )
+
+    assert [r["status"] for r in results["update"]] == [200, 409]
+    assert [r["status"] for r in results["delete"]] == [204, 409, 409]
+    # Neither the update nor the delete of `both` reached the database
+    assert conn.ids == [[kept], [twice]]
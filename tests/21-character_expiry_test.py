@@ -0,0 +1,80 @@
+import uuid
+
+import pytest
+
+from app.characters import expiry
+
+
+class FakeCrud:
+    def __init__(self, expired):
+        self.expired = expired
+        self.limits = []
+
+    async def db_expire_characters(self, limit):
+        self.limits.append(limit)
+        batch, self.expired = self.expired[:limit], self.expired[limit:]
+        return batch
+
+
+class FakeRedis:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.deleted = []
+
+    async def delete(self, *keys):
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.deleted.extend(keys)
+
+
+def _rows(n):
+    client_id = uuid.uuid4()
+    return [{"id": uuid.uuid4(), "client_id": client_id} for _ in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_sweep_runs_batches_until_one_comes_back_short(monkeypatch):
+    rows = _rows(5)
+    crud, redis = FakeCrud(rows), FakeRedis()
+    monkeypatch.setattr(expiry, "crud", crud)
+    monkeypatch.setattr(expiry, "r", redis)
+
+    assert await expiry.sweep_expired(batch_size=2) == 5
+
+    assert crud.limits == [2, 2, 2]
+    # The conversation buffer and its archive bookkeeping
+    assert redis.deleted == [
+        key
+        for row in rows
+        for key in (f"chat:{{{row['client_id']}:{row['id']}}}", f"chat:{{{row['client_id']}:{row['id']}}}:archive")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sweep_with_full_last_batch_checks_once_more(monkeypatch):
+    crud = FakeCrud(_rows(4))
+    monkeypatch.setattr(expiry, "crud", crud)
+    monkeypatch.setattr(expiry, "r", FakeRedis())
+
+    assert await expiry.sweep_expired(batch_size=2) == 4
+    assert crud.limits == [2, 2, 2]
+
+
+@pytest.mark.asyncio
+async def test_redis_failure_does_not_stop_the_sweep(monkeypatch):
+    crud = FakeCrud(_rows(3))
+    monkeypatch.setattr(expiry, "crud", crud)
+    monkeypatch.setattr(expiry, "r", FakeRedis(fail=True))
+
+    assert await expiry.sweep_expired(batch_size=2) == 3
+    assert crud.expired == []
+
+
+@pytest.mark.asyncio
+async def test_database_error_ends_the_sweep(monkeypatch):
+    class FailingCrud:
+        async def db_expire_characters(self, limit):
+            return None
+
+    monkeypatch.setattr(expiry, "crud", FailingCrud())
+    assert await expiry.sweep_expired(batch_size=2) == 0
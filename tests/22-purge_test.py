@@ -0,0 +1,87 @@
+import re
+import uuid
+
+import pytest
+
+from app.database import purge
+from .conftest import FakeConnection, FakePool
+
+
+class FakeConn(FakeConnection):
+    """Counts per table stand in for the rows matching each move statement."""
+    def __init__(self, remaining, candidates=None, locked=False):
+        super().__init__()
+        self.remaining = dict(remaining)
+        self.candidates = candidates or {}
+        self.locked = locked
+        self.moves: list[str] = []
+        self.executed: list[str] = []
+
+    async def fetch(self, sql, cutoff, limit):
+        table = re.search(r"FROM (\w+)", sql).group(1)
+        rows, self.candidates[table] = self.candidates.get(table, [])[:limit], self.candidates.get(table, [])[limit:]
+        return rows
+
+    async def fetchval(self, sql, *args):
+        if "pg_try_advisory_lock" in sql:
+            return not self.locked
+        assert self.in_transaction, "each batch runs in its own transaction"
+        table = re.search(r"SELECT [\w, ]+ FROM (\w+)", sql).group(1)
+        moved = min(args[0], self.remaining.get(table, 0))
+        self.remaining[table] = self.remaining.get(table, 0) - moved
+        self.moves.append(table)
+        return moved
+
+    async def execute(self, sql, *args):
+        self.executed.append(sql)
+
+
+def test_move_sql_archives_only_in_archive_mode():
+    archive = purge.move_sql("clients", "id = ANY($2::uuid[])", archive=True)
+    assert "INSERT INTO clients_archive" in archive
+    assert "- 'password'" in archive and "- 'api_key_hash'" in archive
+    assert "- 'embedding'" in purge.move_sql("embeddings", "client_id = ANY($2::uuid[])", archive=True)
+    assert "_archive" not in purge.move_sql("characters", "id = ANY($2::uuid[])", archive=False)
+    chats = purge.move_sql("chat_messages", "client_id = ANY($2::uuid[])", archive=False)
+    assert "SELECT client_id, character_id, seq FROM chat_messages" in chats
+    assert "t.seq = doomed.seq" in chats
+
+
+@pytest.mark.asyncio
+async def test_clients_are_purged_after_their_children_in_batches():
+    client_id = uuid.uuid4()
+    conn = FakeConn({"embeddings": 5, "characters": 2, "clients": 1}, {"clients": [{"id": client_id}]})
+
+    assert await purge.Purger(conn, mode="delete", batch_size=2).clients(cutoff=None) == 1
+
+    assert conn.moves == ["chat_messages"] + ["embeddings"] * 3 + ["characters"] * 2 + ["clients"]
+    assert conn.remaining == {"embeddings": 0, "characters": 0, "clients": 0, "chat_messages": 0}
+
+
+@pytest.mark.asyncio
+async def test_characters_take_their_embeddings_with_them():
+    rows = [{"id": uuid.uuid4(), "client_id": uuid.uuid4()} for _ in range(3)]
+    conn = FakeConn({"embeddings": 4, "characters": 3}, {"characters": rows})
+
+    assert await purge.Purger(conn, mode="archive", batch_size=2).characters(cutoff=None) == 3
+
+    assert conn.moves.index("characters") > conn.moves.index("embeddings")
+    assert conn.remaining == {"embeddings": 0, "characters": 0}
+    # Archive mode keeps the chat history
+    assert "chat_messages" not in conn.moves
+
+
+@pytest.mark.asyncio
+async def test_pass_is_skipped_while_another_process_purges(monkeypatch):
+    conn = FakeConn({}, locked=True)
+
+    async def fake_init_db(name="oltp"):
+        return FakePool(conn)
+
+    monkeypatch.setattr(purge, "init_db", fake_init_db)
+
+    assert await purge.purge_soft_deleted(mode="delete", retention_days=30, batch_size=10) is None
+    assert conn.moves == [] and conn.executed == []
+
+    with pytest.raises(ValueError):
+        await purge.purge_soft_deleted(mode="shred", retention_days=30, batch_size=10)
@@ -0,0 +1,56 @@
+import json
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from app.infrastructure import json_codec
+
+
+@pytest.fixture(params=json_codec.BACKENDS)
+def backend(request):
+    json_codec.use_backend(request.param)
+    yield request.param
+    json_codec.use_backend("orjson")
+
+
+def test_backends_encode_the_same_values(backend):
+    value = {
+        "id": uuid.UUID("9b2f6c1e-8a47-4f43-9d2c-3c5b7f1e0a11"),
+        "at": datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        "price": Decimal("9.90"),
+        "vector": np.array([0.5, 1.5], dtype=np.float32),
+        "text": "olá 😀",
+    }
+
+    assert json.loads(json_codec.dumps(value)) == {
+        "id": "9b2f6c1e-8a47-4f43-9d2c-3c5b7f1e0a11",
+        "at": "2026-01-02T03:04:05+00:00",
+        "price": "9.90",
+        "vector": [0.5, 1.5],
+        "text": "olá 😀",
+    }
+    assert json_codec.dumpb(value) == json_codec.dumps(value).encode("utf-8")
+
+
+def test_history_written_by_either_backend_is_readable(backend):
+    entry = {"role": "user", "content": "çà et là"}
+    legacy = json.dumps(entry)  # what store_message wrote before the codec existed
+
+    assert json_codec.loads(legacy) == entry
+    assert json_codec.loads(json_codec.dumpb(entry)) == entry
+    assert json_codec.loads(json_codec.dumps(entry)) == entry
+
+
+def test_response_renders_with_the_selected_backend(backend):
+    response = json_codec.FastJSONResponse({"data": [1, "two"]})
+
+    assert response.body == b'{"data":[1,"two"]}'
+    assert response.media_type == "application/json"
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        json_codec.use_backend("simplejson")
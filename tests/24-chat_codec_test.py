@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from app.chat import codec
+
+
+@pytest.fixture
+def compress_from(monkeypatch):
+    def _set(min_bytes):
+        monkeypatch.setattr(codec.settings, "CHAT_HISTORY_COMPRESS_MIN_BYTES", min_bytes)
+    return _set
+
+
+@pytest.mark.parametrize("role", ["system", "user", "assistant", "tool", "function"])
+def test_round_trip(role, compress_from):
+    compress_from(512)
+    for content in ["hi", "olá 😀 " * 200]:
+        raw = codec.encode_entry(role, content, format="msgpack")
+        assert raw[0] == codec.V1
+        assert codec.decode_entry(raw) == {"role": role, "content": content}
+
+
+def test_long_contents_are_compressed(compress_from):
+    content = "Your order ships within two business days. " * 50
+
+    compress_from(512)
+    compressed = codec.encode_entry("assistant", content, format="msgpack")
+    compress_from(0)
+    plain = codec.encode_entry("assistant", content, format="msgpack")
+
+    assert len(compressed) < len(plain) < len(json.dumps({"role": "assistant", "content": content}))
+    assert codec.decode_entry(compressed)["content"] == content
+
+
+def test_legacy_json_entries_are_still_read():
+    entry = {"role": "user", "content": "Hello"}
+
+    assert codec.decode_entry(json.dumps(entry)) == entry
+    assert codec.decode_entry(json.dumps(entry).encode()) == entry
+    assert codec.decode_entry(codec.encode_entry("user", "Hello", format="json")) == entry
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        codec.encode_entry("user", "Hello", format="xml")
@@ -0,0 +1,144 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.infrastructure import redis_client
+from app.infrastructure.client_cache import ClientCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.gets = 0
+        self.on_get = None
+
+    async def get(self, key):
+        self.gets += 1
+        value = self.data.get(key)
+        if self.on_get:
+            self.on_get(key)
+        return value
+
+
+def _cache(redis, **kwargs):
+    options = {"enabled": True, "prefixes": ["auth:key:"], "max_keys": 100, "ttl": 60.0}
+    options.update(kwargs)
+    cache = ClientCache(redis, connect=lambda: None, **options)
+    cache._active = True
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_repeated_reads_are_served_from_memory():
+    fake = FakeRedis()
+    fake.data["auth:key:a"] = "record"
+    cache = _cache(fake)
+
+    assert [await cache.get("auth:key:a") for _ in range(5)] == ["record"] * 5
+    assert fake.gets == 1
+
+    cache.invalidate(["auth:key:a"])
+    fake.data["auth:key:a"] = "new"
+    assert await cache.get("auth:key:a") == "new"
+    assert fake.gets == 2
+
+
+@pytest.mark.asyncio
+async def test_other_keys_and_inactive_tracking_read_through():
+    fake = FakeRedis()
+    fake.data.update({"chat:1": "x", "auth:key:a": "record"})
+    cache = _cache(fake)
+
+    await cache.get("chat:1")
+    await cache.get("chat:1")
+    assert fake.gets == 2
+
+    cache._deactivate()
+    await cache.get("auth:key:a")
+    await cache.get("auth:key:a")
+    assert fake.gets == 4
+
+
+@pytest.mark.asyncio
+async def test_invalidation_during_a_read_is_not_overwritten():
+    fake = FakeRedis()
+    fake.data["auth:key:a"] = "old"
+    cache = _cache(fake)
+    # The key changes while the GET is in flight; its invalidation arrives before the reply
+    fake.on_get = lambda key: cache.invalidate([key])
+
+    assert await cache.get("auth:key:a") == "old"
+    fake.on_get = None
+    fake.data["auth:key:a"] = "new"
+    assert await cache.get("auth:key:a") == "new"
+
+
+@pytest.mark.asyncio
+async def test_flush_ttl_and_size_bound():
+    fake = FakeRedis()
+    fake.data.update({f"auth:key:{i}": str(i) for i in range(3)})
+    cache = _cache(fake, max_keys=2)
+    for i in range(3):
+        await cache.get(f"auth:key:{i}")
+    assert list(cache._values) == ["auth:key:1", "auth:key:2"]
+
+    cache.invalidate(None)
+    assert cache._values == {}
+
+    cache.ttl = 0.0
+    await cache.get("auth:key:0")
+    await cache.get("auth:key:0")
+    assert fake.gets == 5
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache_task_returns_at_once():
+    cache = ClientCache(FakeRedis(), connect=lambda: None, enabled=False, prefixes=["auth:key:"], max_keys=10, ttl=1.0)
+    await asyncio.wait_for(cache.run(), timeout=1)
+    assert not cache.active
+
+
+@pytest.mark.asyncio
+async def test_tracking_invalidates_writes_from_other_clients():
+    """Needs a reachable Redis 6+ (REDIS_HOST/REDIS_PORT)."""
+    writer = await redis_client.node_client(decode_responses=True)
+    try:
+        await writer.ping()
+    except Exception:
+        await writer.aclose()
+        pytest.skip("Redis not reachable")
+    key = f"test:cc:{uuid.uuid4()}"
+    cache = ClientCache(
+        writer,
+        connect=lambda: redis_client.node_client(decode_responses=True, protocol=2, single_connection_client=True),
+        enabled=True,
+        prefixes=["test:cc:"],
+        max_keys=100,
+        ttl=60.0
+    )
+    task = asyncio.create_task(cache.run())
+    try:
+        for _ in range(50):
+            if cache.active:
+                break
+            await asyncio.sleep(0.05)
+        assert cache.active
+
+        await writer.set(key, "v1")
+        # Let the invalidation of our own write arrive, or the first read is not kept
+        await asyncio.sleep(0.2)
+        assert await cache.get(key) == "v1"
+        assert key in cache._values
+
+        await writer.set(key, "v2")
+        for _ in range(50):
+            if key not in cache._values:
+                break
+            await asyncio.sleep(0.02)
+        assert await cache.get(key) == "v2"
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await writer.delete(key)
+        await writer.aclose()
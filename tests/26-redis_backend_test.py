@@ -0,0 +1,127 @@
+import uuid
+
+import pytest
+from redis.asyncio import Redis
+from redis.asyncio.cluster import ClusterNode, RedisCluster
+from redis.asyncio.sentinel import SentinelConnectionPool
+from redis.crc import key_slot
+
+from app.chat import keys
+from app.infrastructure import redis_client
+from app.infrastructure.rate_limit import HybridLimiter, SlidingWindowLimiter
+from config import settings
+
+
+class FakeRemote:
+    def __init__(self, redis):
+        self.redis = redis
+        self.limit = 3
+        self.window_s = 60
+        self.recorded = []
+
+    async def record(self, key, hits, *, window_s=None, age_ms=0, client=None):
+        self.recorded.append((key, hits, client))
+        return [hits, 60_000]
+
+
+@pytest.fixture
+def mode(monkeypatch):
+    def _set(name, nodes=""):
+        monkeypatch.setattr(settings, "REDIS_MODE", name)
+        monkeypatch.setattr(settings, "REDIS_NODES", nodes)
+        monkeypatch.setattr(redis_client, "_sentinel", None)
+    return _set
+
+
+def test_keys_of_one_conversation_share_a_slot():
+    store_id, character_id = uuid.uuid4(), uuid.uuid4()
+    tag = keys.conversation_tag(store_id, character_id)
+    chat_key = keys.chat_key(store_id, character_id)
+
+    assert chat_key == f"chat:{{{store_id}:{character_id}}}"
+    assert key_slot(chat_key.encode()) == key_slot(f"other:{tag}:suffix".encode())
+    # A store's conversations are spread over the cluster, not pinned to one slot
+    slots = {key_slot(keys.chat_key(store_id, uuid.uuid4()).encode()) for _ in range(20)}
+    assert len(slots) > 1
+
+
+def test_nodes_fall_back_to_host_and_port(mode, monkeypatch):
+    mode("cluster", " n1:7001, n2:7002 ,")
+    assert redis_client.nodes() == [("n1", 7001), ("n2", 7002)]
+
+    mode("cluster", "")
+    monkeypatch.setattr(settings, "REDIS_HOST", "redis")
+    monkeypatch.setattr(settings, "REDIS_PORT", 6379)
+    assert redis_client.nodes() == [("redis", 6379)]
+
+
+@pytest.mark.asyncio
+async def test_create_client_per_mode(mode):
+    mode("standalone")
+    client = redis_client.create_client(decode_responses=True)
+    assert type(client) is Redis
+    assert client.connection_pool.max_connections == settings.REDIS_MAX_CONNECTIONS
+    assert client.connection_pool.connection_kwargs["socket_timeout"] == settings.REDIS_SOCKET_TIMEOUT
+
+    mode("cluster", "n1:7001,n2:7002")
+    client = redis_client.create_client(decode_responses=True)
+    assert isinstance(client, RedisCluster)
+    assert [(n.host, n.port) for n in client.nodes_manager.startup_nodes.values()] == [("n1", 7001), ("n2", 7002)]
+    with pytest.raises(ValueError):
+        await redis_client.node_client()
+
+    mode("sentinel", "s1:26379")
+    client = redis_client.create_client(decode_responses=False)
+    assert isinstance(client.connection_pool, SentinelConnectionPool)
+    assert client.connection_pool.service_name == settings.REDIS_SENTINEL_MASTER
+
+    mode("replicated")
+    with pytest.raises(ValueError):
+        redis_client.create_client(decode_responses=True)
+
+
+@pytest.mark.asyncio
+async def test_flush_on_a_cluster_does_not_pipeline_scripts():
+    remote = FakeRemote(RedisCluster(startup_nodes=[ClusterNode("n1", 7001)]))
+    limiter = HybridLimiter(remote, timeout_s=0.01, cooldown_s=60, max_keys=10)
+    limiter._pending = {("a", 60): 2, ("b", 60): 1}
+
+    await limiter.flush()
+
+    assert sorted(remote.recorded) == [("a", 2, None), ("b", 1, None)]
+    assert limiter._pending == {}
+    assert limiter._shared[("a", 60)][0] == 2 and limiter._remote_down_until == 0.0
+
+
+@pytest.mark.asyncio
+async def test_cluster_round_trip():
+    """Runs against a cluster with REDIS_MODE=cluster (see docker-compose.redis-cluster.yml)."""
+    if settings.REDIS_MODE != "cluster":
+        pytest.skip("REDIS_MODE is not cluster")
+    client = redis_client.create_client(decode_responses=True)
+    store_id, character_id = uuid.uuid4(), uuid.uuid4()
+    chat_key = keys.chat_key(store_id, character_id)
+    meta_key = f"test:{keys.conversation_tag(store_id, character_id)}"
+    ip_key = f"test:middleware:{{{uuid.uuid4()}}}"
+    synced = []
+    try:
+        # Keys of one conversation can be written in one transaction
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.rpush(chat_key, "a", "b")
+            pipe.set(meta_key, "1")
+            pipe.expire(chat_key, 60)
+            assert await pipe.execute() == [2, True, True]
+
+        limiter = SlidingWindowLimiter(client, limit=2, window_s=60)
+        assert [(await limiter.hit(ip_key)).allowed for _ in range(3)] == [True, True, False]
+
+        # Locally admitted hits on keys all over the cluster are synced
+        hybrid = HybridLimiter(limiter, timeout_s=1.0, cooldown_s=1.0)
+        synced = [f"test:{uuid.uuid4()}" for _ in range(10)]
+        hybrid._pending = {(key, 60): 1 for key in synced}
+        await hybrid.flush()
+        assert hybrid._remote_down_until == 0.0
+        assert [await client.zcard(key) for key in synced] == [1] * 10
+    finally:
+        await client.delete(chat_key, meta_key, ip_key, *synced)
+        await client.aclose()
@@ -0,0 +1,156 @@
+import uuid
+
+import pytest
+
+from app.chat import archive, codec, keys
+from app.infrastructure import redis_client
+from config import settings
+
+
+class FakeCrud:
+    """chat_messages in memory, keyed like its primary key."""
+    def __init__(self):
+        self.table = {}
+        self.fail = False
+
+    async def db_archive_messages(self, rows):
+        if self.fail:
+            return None
+        new = [row for row in rows if row[:3] not in self.table]
+        for row in new:
+            self.table[row[:3]] = {"seq": row[2], "role": row[3], "content": row[4]}
+        return len(new)
+
+    async def db_select_archived_tail(self, client_id, character_id, limit):
+        if self.fail:
+            return None
+        seqs = sorted(seq for c, ch, seq in self.table if (c, ch) == (client_id, character_id))
+        return [self.table[(client_id, character_id, seq)] for seq in seqs[-limit:]]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.deleted = []
+
+    async def delete(self, *names):
+        self.deleted.extend(names)
+
+
+def test_rows_number_entries_and_skip_what_cannot_be_archived():
+    store_id, character_id = uuid.uuid4(), uuid.uuid4()
+    unarchived = [b"4", codec.encode_entry("user", "hi"), b"\xffgarbage", codec.encode_entry("assistant", "hello")]
+
+    rows = archive._rows(str(store_id), str(character_id), unarchived)
+
+    assert rows == [
+        (store_id, character_id, 4, "user", "hi"),
+        (store_id, character_id, 6, "assistant", "hello"),
+    ]
+    assert archive._rows("not-a-uuid", str(character_id), unarchived) == []
+
+
+@pytest.mark.asyncio
+async def test_resume_fails_without_the_archive(monkeypatch):
+    crud, fake_r = FakeCrud(), FakeRedis()
+    crud.fail = True
+    monkeypatch.setattr(archive, "crud", crud)
+    monkeypatch.setattr(archive, "r", fake_r)
+    monkeypatch.setattr(settings, "CHAT_ARCHIVE_ENABLED", True)
+    store_id, character_id = uuid.uuid4(), uuid.uuid4()
+
+    with pytest.raises(RuntimeError):
+        await archive.start_buffer(store_id, character_id, "SYSTEM")
+    assert fake_r.deleted == [keys.chat_key(store_id, character_id)]
+
+
+@pytest.mark.asyncio
+async def test_write_behind_and_rehydration(monkeypatch):
+    """Needs a reachable Redis (REDIS_HOST/REDIS_PORT); runs the Lua scripts for real."""
+    client = await redis_client.node_client(decode_responses=False)
+    try:
+        await client.ping()
+    except Exception:
+        await client.aclose()
+        pytest.skip("Redis not reachable")
+    crud = FakeCrud()
+    queue = uuid.uuid4()
+    monkeypatch.setattr(archive, "crud", crud)
+    monkeypatch.setattr(archive, "r", client)
+    monkeypatch.setattr(archive, "_claim", client.register_script(archive.CLAIM_LUA))
+    monkeypatch.setattr(archive, "_read_unarchived", client.register_script(archive.READ_UNARCHIVED_LUA))
+    monkeypatch.setattr(archive, "_mark_archived", client.register_script(archive.MARK_ARCHIVED_LUA))
+    monkeypatch.setattr(keys, "ARCHIVE_PENDING", f"test:{{{queue}}}:pending")
+    monkeypatch.setattr(keys, "ARCHIVE_INFLIGHT", f"test:{{{queue}}}:inflight")
+    monkeypatch.setattr(settings, "CHAT_ARCHIVE_ENABLED", True)
+    monkeypatch.setattr(settings, "CHAT_ARCHIVE_DELAY", 0.0)
+    monkeypatch.setattr(settings, "CHAT_REHYDRATE_MAX_MESSAGES", 2)
+    store_id, character_id = uuid.uuid4(), uuid.uuid4()
+    chat_key = keys.chat_key(store_id, character_id)
+
+    async def turn(*contents):
+        for content in contents:
+            await client.rpush(chat_key, codec.encode_entry("user", content))
+        await client.expire(chat_key, settings.CHAT_TTL_SECONDS)
+        await archive.touch(store_id, character_id)
+
+    def archived():
+        return [m["content"] for _, m in sorted(crud.table.items(), key=lambda item: item[0][2])]
+
+    try:
+        assert await archive.start_buffer(store_id, character_id, "SYSTEM") == 0
+        await turn("m1", "m2")
+        assert await archive.archive_pending(10) == 1
+        assert archived() == ["m1", "m2"]
+        # Nothing left to claim until the next turn
+        assert await archive.archive_pending(10) == 0
+
+        await turn("m3")
+        crud.fail = True
+        assert await archive.archive_pending(10) == 0
+        # The failed claim is leased: it comes back once the lease runs out
+        await client.zadd(keys.ARCHIVE_INFLIGHT, {f"{store_id}:{character_id}": 0})
+        crud.fail = False
+        assert await archive.archive_pending(10) == 1
+        assert archived() == ["m1", "m2", "m3"]
+        assert sorted(seq for _, _, seq in crud.table) == [1, 2, 3]
+
+        # The buffer expires; the conversation is resumed from the tail of the archive
+        await client.delete(chat_key, keys.archive_key(store_id, character_id))
+        assert await archive.start_buffer(store_id, character_id, "NEW SYSTEM") == 2
+        buffer = [codec.decode_entry(raw)["content"] for raw in await client.lrange(chat_key, 0, -1)]
+        assert buffer == ["NEW SYSTEM", "m2", "m3"]
+
+        # Only new messages are archived, numbered after the old ones
+        await turn("m4")
+        assert await archive.archive_pending(10) == 1
+        assert archived() == ["m1", "m2", "m3", "m4"]
+        assert max(seq for _, _, seq in crud.table) == 4
+        assert await client.ttl(keys.archive_key(store_id, character_id)) > 0
+    finally:
+        await client.delete(
+            chat_key, keys.archive_key(store_id, character_id), keys.ARCHIVE_PENDING, keys.ARCHIVE_INFLIGHT
+        )
+        await client.aclose()
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_archived_tail_is_read_from_the_primary(monkeypatch):
+    from app.chat.repository import crud_management
+    from app.database import replicas
+    from app.database.replicas import _Replica
+
+    class LaggingPool:
+        def acquire(self):
+            raise AssertionError("the archived tail must not be read from a replica")
+
+    replica = _Replica(0, "postgres://replica0")
+    replica.healthy = True
+    replica.pools = {"oltp": LaggingPool()}
+    monkeypatch.setattr(replicas, "_replicas", [replica])
+    crud = crud_management()
+    store_id, character_id = uuid.uuid4(), uuid.uuid4()
+
+    assert await crud.db_archive_messages([(store_id, character_id, 1, "user", "hi")]) == 1
+    # Archived by another process: nothing in this process' read-your-writes window
+    monkeypatch.setattr(replicas, "_recent_writes", {})
+    assert await crud.db_select_archived_tail(store_id, character_id, 10) == [{"seq": 1, "role": "user", "content": "hi"}]
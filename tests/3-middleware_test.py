@@ -15,4 +15,13 @@ async def test_middleware_limit():
             assert response.status_code == 200, f"Request {i + 1} supposed to succeed"
         response = await ac.get("/")
         assert response.status_code == 429, f"Expected 429, got {response.status_code}"
+        assert int(response.headers["Retry-After"]) >= 1
         time.sleep(settings.API_WINDOW)
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_middleware_sets_rate_limit_headers():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/")
+    assert response.status_code == 200
+    assert response.headers["X-RateLimit-Limit"] == str(settings.API_LIMIT)
+    assert int(response.headers["X-RateLimit-Remaining"]) < settings.API_LIMIT
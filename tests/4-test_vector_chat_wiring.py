@@ -146,13 +146,14 @@ async def test_vector_repo_search_uses_metadata_filter_and_exclude_entity_type(m
 
     fake_conn = FakeConn()
 
-    async def fake_init_db():
+    async def fake_init_db(name="oltp", *, scope=None):
         return FakePool(fake_conn)
 
     # Patch init_db inside the repository module.
     import app.vectors.repository as repo_mod
 
     monkeypatch.setattr(repo_mod, "init_db", fake_init_db)
+    monkeypatch.setattr(repo_mod, "read_db", fake_init_db)
 
     repo = VectorRepo()
 
@@ -182,6 +183,68 @@ async def test_vector_repo_search_uses_metadata_filter_and_exclude_entity_type(m
     assert fake_conn.args[4] == "chat"
 
 
+@pytest.mark.asyncio
+async def test_vector_repo_explain_search_reports_hnsw_usage(monkeypatch):
+    import json
+    import app.vectors.repository as repo_mod
+
+    plan = [{
+        "Plan": {
+            "Node Type": "Limit",
+            "Plans": [{"Node Type": "Index Scan", "Index Name": repo_mod.HNSW_INDEX_NAME}],
+        },
+        "Planning Time": 0.1,
+        "Execution Time": 0.5,
+    }]
+
+    class FakeConn:
+        def __init__(self):
+            self.queries = []
+
+        async def fetch(self, query, *args):
+            self.queries.append(query)
+            return []
+
+        async def fetchval(self, query, *args):
+            self.queries.append(query)
+            return json.dumps(plan)
+
+    class _Acquire:
+        def __init__(self, conn):
+            self._conn = conn
+
+        async def __aenter__(self):
+            return self._conn
+
+        async def __aexit__(self, exc_type, exc, tb):
+            return False
+
+    class FakePool:
+        def __init__(self, conn):
+            self._conn = conn
+
+        def acquire(self):
+            return _Acquire(self._conn)
+
+    fake_conn = FakeConn()
+
+    async def fake_init_db(name="oltp", *, scope=None):
+        return FakePool(fake_conn)
+
+    monkeypatch.setattr(repo_mod, "init_db", fake_init_db)
+    monkeypatch.setattr(repo_mod, "read_db", fake_init_db)
+
+    report = await repo_mod.VectorRepo().explain_search(str(uuid.uuid4()), query_embed=[0.0] * 1536)
+
+    assert report is not None
+    assert report["hnsw_index_used"] is True
+    assert report["timings_ms"]["execution"] == 0.5
+    # The plan must be for the very statement search() runs, explained on its first (cold) run
+    assert fake_conn.queries[0].startswith("EXPLAIN (ANALYZE, BUFFERS")
+    assert fake_conn.queries[0].endswith(repo_mod.SEARCH_SQL)
+    assert fake_conn.queries[1] == repo_mod.SEARCH_SQL
+
+
 # ------------------------- chat/service.py wiring tests -------------------------
 
 SERVICE_COMPILES = _compiles(_path("app", "chat", "service.py"))
@@ -219,6 +282,9 @@ async def test_store_message_injects_retrieval_stores_assistant_and_upserts_turn
 
     fake_r = FakeRedis()
     monkeypatch.setattr(chat_service, "r", fake_r)
+    monkeypatch.setattr(chat_service.archive, "r", fake_r)
+    # Write-behind to Postgres is covered by tests/27-chat_archive_test.py
+    monkeypatch.setattr(chat_service.settings, "CHAT_ARCHIVE_ENABLED", False)
 
     # Fake ChatBot that records what messages were sent.
     class FakeChatBot:
@@ -254,11 +320,12 @@ async def test_store_message_injects_retrieval_stores_assistant_and_upserts_turn
     req = Completions(uuid=character_id, role="user", content="Hello")
     response = await chat_service.store_message(req, store_id)
     assert response
-    chat_key = f"chat:{store_id}:{character_id}"
+    chat_key = f"chat:{{{store_id}:{character_id}}}"
     # Redis should contain: system prompt + user + assistant
     assert await fake_r.llen(chat_key) == 3
+    assert fake_r.expires[chat_key] == chat_service.settings.CHAT_TTL_SECONDS
     # Assistant reply should have been stored
-    stored = await fake_r.lrange(chat_key, 0, -1)
+    stored = [chat_service.codec.decode_entry(s)["content"] for s in await fake_r.lrange(chat_key, 0, -1)]
     assert any("ASSISTANT REPLY" in s for s in stored)
     # Retrieval should NOT be persisted in Redis
     assert not any("RETRIEVED MEMORY" in s for s in stored)
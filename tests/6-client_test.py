@@ -20,6 +20,24 @@ async def test_signup_success():
     assert "api_key" in response.json()["data"]
 
 
+@pytest.mark.asyncio(loop_scope="session")
+async def test_api_key_is_stored_as_digest_only(authenticated_user: MockUser):
+    import uuid
+    from app.auth.keys import hash_api_key
+    from app.database.init import init_db
+
+    pool = await init_db()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(
+            "SELECT api_key, api_key_hash FROM clients WHERE id = $1",
+            uuid.UUID(authenticated_user.id),
+        )
+
+    assert row is not None
+    assert row["api_key"] is None, "Plaintext API key must not be stored"
+    assert row["api_key_hash"] == hash_api_key(authenticated_user.api_key)
+
+
 @pytest.mark.asyncio(loop_scope="session")
 async def test_non_admin_patch_email_forbidden(authenticated_user: MockUser):
     new_email = authenticated_user.generate_random_email()
@@ -74,6 +92,11 @@ async def test_client_regenerate_key_allowed(authenticated_user: MockUser):
     assert payload["api_key"] != old_key
     authenticated_user.api_key = payload["api_key"]
 
+    # The old key was cached by verify_api_key; regeneration must revoke it immediately
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        stale = await ac.get("/api/characters", headers={"x-api-key": old_key})
+    assert stale.status_code == 401, f"Old key still accepted: {stale.status_code}"
+
 # @pytest.mark.asyncio(loop_scope="session")
 # async def test_admin_can_delete_self_via_clients_me(admin_user: MockUser):
 #     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
@@ -0,0 +1,135 @@
+import io
+import json
+import uuid
+import zipfile
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.vectors import bulk
+from config import settings
+
+
+def test_npy_header_is_readable_by_numpy():
+    rows = np.arange(12, dtype="<f4").reshape(3, 4)
+    buf = io.BytesIO(bulk.npy_header(3, 4) + b"".join(bulk.encode_vector(r) for r in rows))
+
+    loaded = np.load(buf)
+    assert loaded.shape == (3, 4)
+    assert np.array_equal(loaded, rows)
+
+
+def test_npy_rows_are_read_in_batches():
+    rows = np.arange(20, dtype="<f4").reshape(5, 4)
+    buf = io.BytesIO(bulk.npy_header(5, 4) + rows.tobytes())
+
+    assert bulk.read_npy_header(buf) == (5, 4)
+    first = bulk.read_npy_rows(buf, 4, 2)
+    rest = bulk.read_npy_rows(buf, 4, 10)
+    assert first.shape == (2, 4)
+    assert rest.shape == (3, 4)
+    assert np.array_equal(np.vstack([first, rest]), rows)
+
+
+def test_truncated_vectors_are_rejected():
+    buf = io.BytesIO(bulk.npy_header(2, 4) + b"\x00" * 10)
+    bulk.read_npy_header(buf)
+    with pytest.raises(ValueError):
+        bulk.read_npy_rows(buf, 4, 2)
+
+
+def test_meta_roundtrip_to_import_record():
+    as_of = datetime.now(timezone.utc)
+    entity_id = uuid.uuid4()
+    row = {
+        "entity_type": "memory",
+        "entity_id": entity_id,
+        "content": "hello",
+        "metadata": {"source": "pytest"},
+        "created_at": as_of,
+        "updated_at": as_of,
+    }
+    buf = io.BytesIO(bulk.meta_header(count=1, dim=4, as_of=as_of) + bulk.encode_meta_line(row))
+
+    header = bulk.parse_meta_header(buf.readline())
+    assert header["count"] == 1 and header["dim"] == 4
+    metas = bulk.read_meta_lines(buf, 10)
+    assert len(metas) == 1
+
+    record = bulk.to_import_record(metas[0], np.zeros(4, dtype="<f4"))
+    assert record[0] == "memory"
+    assert record[1] == entity_id
+    assert json.loads(record[4]) == {"source": "pytest"}
+    assert record[5] == as_of
+
+
+def test_archive_is_streamed_member_by_member():
+    as_of = datetime.now(timezone.utc)
+    rows = np.arange(8, dtype="<f4").reshape(2, 4)
+    archive = bulk.ArchiveWriter(as_of)
+    out = []
+
+    archive.start(bulk.ARCHIVE_META, compress=True)
+    archive.add(bulk.meta_header(count=2, dim=4, as_of=as_of))
+    archive.end()
+    out.append(archive.drain())
+    archive.start(bulk.ARCHIVE_VECTORS, compress=False)
+    archive.add(bulk.npy_header(2, 4))
+    for r in rows:
+        archive.add(bulk.encode_vector(r))
+        out.append(archive.drain())
+    archive.end()
+    archive.close()
+    out.append(archive.drain())
+
+    zf, vectors, meta = bulk.open_archive(io.BytesIO(b"".join(out)))
+    with zf:
+        assert bulk.parse_meta_header(meta.readline())["count"] == 2
+        assert np.array_equal(np.load(io.BytesIO(vectors.read())), rows)
+
+
+def test_archive_without_both_files_is_rejected():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr(bulk.ARCHIVE_META, b"{}")
+    buf.seek(0)
+
+    with pytest.raises(ValueError):
+        bulk.open_archive(buf)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_export_archive_roundtrip(authenticated_user):
+    from httpx import ASGITransport, AsyncClient
+    from app.vectors.repository import VectorRepo
+    from main import app
+
+    headers = {"x-api-key": authenticated_user.api_key}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        repo = VectorRepo()
+        for i in range(3):
+            vector = np.zeros(settings.EMBEDDING_DIM, dtype="<f4")
+            vector[i] = 1.0
+            assert await repo.upsert_embedding(
+                authenticated_user.id, entity_type="export-test", entity_id=str(uuid.uuid4()),
+                content=f"row {i}", embedding=vector.tolist()
+            ) is not None
+
+        resp = await ac.get("/api/vectors/export", headers=headers)
+        assert resp.status_code == 200
+        zf, vectors, meta = bulk.open_archive(io.BytesIO(resp.content))
+        with zf:
+            header = bulk.parse_meta_header(meta.readline())
+            lines = bulk.read_meta_lines(meta, 100)
+            matrix = np.load(io.BytesIO(vectors.read()))
+        assert header["count"] == len(lines) == matrix.shape[0] >= 3
+        ours = [(line["content"], row) for line, row in zip(lines, matrix) if line["entity_type"] == "export-test"]
+        assert {content: int(np.argmax(row)) for content, row in ours} == {"row 0": 0, "row 1": 1, "row 2": 2}
+
+        imported = await ac.post(
+            "/api/vectors/import", headers=headers,
+            files={"archive": ("embeddings-export.zip", resp.content, "application/zip")}
+        )
+        assert imported.status_code == 201
+        assert imported.json()["data"]["imported"] == header["count"]
@@ -0,0 +1,181 @@
+import time
+import uuid
+
+import pytest
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    def __getattr__(self, name):
+        def _queue(*args, **kwargs):
+            self._ops.append((name, args, kwargs))
+        return _queue
+
+    async def execute(self):
+        return [await getattr(self._redis, name)(*args, **kwargs) for name, args, kwargs in self._ops]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.published = []
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def sadd(self, key, value):
+        self.data.setdefault(key, set()).add(value)
+
+    async def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    async def expire(self, key, seconds):
+        pass
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    from app.auth import cache as auth_cache
+
+    fake = FakeRedis()
+    monkeypatch.setattr(auth_cache, "r", fake)
+    monkeypatch.setattr(auth_cache.client_cache, "redis", fake)
+    auth_cache.clear_local()
+    yield auth_cache, fake
+    auth_cache.clear_local()
+
+
+@pytest.mark.asyncio
+async def test_store_then_lookup_hits_local_and_redis(cache):
+    auth_cache, fake = cache
+    record = {"id": uuid.uuid4(), "email": "a@example.com", "api_key": "fn_abc", "is_admin": False, "subscription": "pro"}
+
+    await auth_cache.store("fn_abc", record, read_at=time.monotonic())
+    assert await auth_cache.lookup("fn_abc") == record
+    # Raw key never appears in Redis
+    assert not any("fn_abc" in k for k in fake.data)
+
+    # A fresh process (empty local cache) is served from Redis
+    auth_cache.clear_local()
+    assert await auth_cache.lookup("fn_abc") == record
+
+
+@pytest.mark.asyncio
+async def test_invalidate_client_drops_every_layer(cache):
+    auth_cache, fake = cache
+    client_id = uuid.uuid4()
+    record = {"id": client_id, "email": "b@example.com", "api_key": "fn_def", "is_admin": True, "subscription": "free"}
+
+    await auth_cache.store("fn_def", record, read_at=time.monotonic())
+    await auth_cache.invalidate_client(client_id)
+
+    assert await auth_cache.lookup("fn_def") is None
+    assert (auth_cache.INVALIDATE_CHANNEL, str(client_id)) in fake.published
+
+
+@pytest.mark.asyncio
+async def test_lookup_survives_redis_outage(cache, monkeypatch):
+    auth_cache, fake = cache
+
+    async def broken_get(key):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(fake, "get", broken_get)
+    assert await auth_cache.lookup("fn_missing") is None
+
+
+@pytest.mark.asyncio
+async def test_record_read_before_an_invalidation_is_not_cached_after_it(cache):
+    auth_cache, fake = cache
+    client_id = uuid.uuid4()
+    record = {"id": client_id, "email": "c@example.com", "api_key": "fn_ghi", "is_admin": False, "subscription": "free"}
+
+    # verify_api_key reads the client, the client is changed and invalidated, then the stale read is stored
+    read_at = time.monotonic()
+    await auth_cache.invalidate_client(client_id)
+    await auth_cache.store("fn_ghi", record, read_at=read_at)
+
+    assert await auth_cache.lookup("fn_ghi") is None
+    # Other processes only have the Redis tombstone
+    auth_cache.clear_local()
+    await auth_cache.store("fn_ghi", record, read_at=read_at)
+    assert await auth_cache.lookup("fn_ghi") is None
+
+
+@pytest.mark.asyncio
+async def test_reads_older_than_the_tombstone_are_not_cached(cache, monkeypatch):
+    auth_cache, fake = cache
+    monkeypatch.setattr(auth_cache.settings, "AUTH_CACHE_TOMBSTONE_TTL", 10)
+    record = {"id": uuid.uuid4(), "email": "d@example.com", "api_key": "fn_jkl", "is_admin": False, "subscription": "free"}
+
+    await auth_cache.store("fn_jkl", record, read_at=time.monotonic() - 11)
+
+    assert await auth_cache.lookup("fn_jkl") is None
+    assert fake.data == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_invalidation_is_retried_then_raised(cache, monkeypatch):
+    auth_cache, fake = cache
+    calls = []
+
+    async def flaky_smembers(key):
+        calls.append(key)
+        if len(calls) < 3:
+            raise ConnectionError("redis down")
+        return set()
+
+    monkeypatch.setattr(fake, "smembers", flaky_smembers)
+    await auth_cache.invalidate_client(uuid.uuid4())
+    assert len(calls) == 3
+
+    calls.clear()
+    monkeypatch.setattr(auth_cache, "INVALIDATE_ATTEMPTS", 2)
+    with pytest.raises(auth_cache.InvalidationFailed):
+        await auth_cache.invalidate_client(uuid.uuid4())
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_change_rolls_back_when_the_cache_cannot_be_invalidated(monkeypatch):
+    from app.auth import cache as auth_cache
+    from app.clients.repository import crud_management
+
+    crud = crud_management()
+    client = await crud.db_insert_client(f"rollback-{uuid.uuid4().hex}@example.com", "password123")
+
+    async def broken_set(*args, **kwargs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(auth_cache, "INVALIDATE_ATTEMPTS", 1)
+    monkeypatch.setattr(auth_cache.r, "set", broken_set)
+    with pytest.raises(auth_cache.InvalidationFailed):
+        await crud.db_regenerate_key(client["id"])
+
+    # The old key still works: the regeneration was not committed
+    assert (await crud.db_select_client_by_key(client["api_key"]))["id"] == client["id"]
+    monkeypatch.undo()
+    await crud.db_delete_client(client["id"])
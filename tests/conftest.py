@@ -1,11 +1,77 @@
+import asyncio
+
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 from app.database.init import init_db, close_db
+from app.clients.repository import crud_management
 from main import app
 from .MockUser import MockUser
 from config import settings
 
 
+class FakeConnection:
+    """Base of the fake asyncpg connections in unit tests; subclasses add the queries they need."""
+    def __init__(self):
+        self.in_transaction = False
+
+    def transaction(self, **options):
+        return _FakeTransaction(self)
+
+
+class _FakeTransaction:
+    def __init__(self, conn):
+        self._conn = conn
+
+    async def __aenter__(self):
+        self._conn.in_transaction = True
+
+    async def __aexit__(self, *exc):
+        self._conn.in_transaction = False
+        return False
+
+
+class FakePool:
+    """
+    Just enough of asyncpg.Pool around fixed connections, handed out in order. Like asyncpg,
+    acquire() can be awaited (then release() the connection) or used with `async with`.
+    """
+    def __init__(self, *conns):
+        self._free: asyncio.Queue = asyncio.Queue()
+        for conn in conns:
+            self._free.put_nowait(conn)
+        self._size = len(conns)
+
+    def acquire(self, timeout=None):
+        return _FakeAcquire(self, timeout)
+
+    async def release(self, conn):
+        self._free.put_nowait(conn)
+
+    def get_size(self):
+        return self._size
+
+    def get_max_size(self):
+        return self._size
+
+
+class _FakeAcquire:
+    def __init__(self, pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._conn = None
+
+    def __await__(self):
+        return asyncio.wait_for(self._pool._free.get(), self._timeout).__await__()
+
+    async def __aenter__(self):
+        self._conn = await self
+        return self._conn
+
+    async def __aexit__(self, *exc):
+        await self._pool.release(self._conn)
+        return False
+
+
 @pytest_asyncio.fixture(scope="session", loop_scope="session", autouse=True)
 async def setup_database():
     """Initialize database pool once per test session."""
@@ -36,7 +102,7 @@ async def admin_user(setup_database):
         async with pool.acquire() as conn:
             row = await conn.fetchrow(
                 """
-                SELECT id, email, api_key
+                SELECT id, email
                 FROM clients
                 WHERE is_admin = TRUE
                   AND deleted_at IS NULL
@@ -47,7 +113,9 @@ async def admin_user(setup_database):
         assert row is not None, "Bootstrap returned 409 but DB has no admin"
         admin.id = str(row["id"])
         admin.email = row["email"]
-        admin.api_key = row["api_key"]
+        # Only key digests are stored, so mint a fresh key for the existing admin
+        admin.api_key = await crud_management().db_regenerate_key(admin.id)
+        assert admin.api_key is not None, "Could not regenerate key for existing admin"
         return admin
 
     raise AssertionError(f"Bootstrap admin failed: {resp.status_code} {resp.text}")